@@ -1,13 +1,29 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash,current_app, abort, g, Response
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash,current_app, abort, g, Response, stream_with_context
 from datetime import datetime
 from utils.genetic_algorithm import *
+from utils.ga_engine import ENGINES, PROGRESS_INTERVAL, STOP_CANCELLED, STOP_PAUSED, get_engine, plan_jobs, resolve_workers, run_ga_jobs, time_slice
+from utils.parallel_evaluation import DEFAULT_MIN_POPULATION
+from utils.job_queue import (FINISHED_STATES, JOB_CANCELLED, JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING,
+                             JobQueue, QueueFullError, UserLimitError)
+from utils.progress import (BEST_COMMUNE, GALLERY_FINISHED, GALLERY_STARTED, GENERATION, RUN_CANCELLED,
+                            RUN_FAILED, RUN_FINISHED, RUN_PAUSED, RUN_QUEUED, RUN_STARTED, STATE_PAUSED,
+                            VERBOSITY_INFO,
+                            Event, LevelLog, parse_verbosity, render)
+from utils.run_store import create_run_store
+from utils.write_behind import WriteBehindWriter
 from extensions import db
 from models import *
-from sqlalchemy import text, func, cast, Integer
+from sqlalchemy import text, func, insert, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.orm import load_only, noload
 from dotenv import load_dotenv
+from contextlib import contextmanager
 from functools import wraps
 import uuid
 import traceback
+import atexit
+import tempfile
 import numpy as np
 import random
 import threading
@@ -15,6 +31,7 @@ import time
 import os
 import io
 import csv
+import json
 
 load_dotenv()
 
@@ -46,10 +63,153 @@ app.config['SQLALCHEMY_DATABASE_URI'] = db_url or "sqlite:///local.db"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config["ENVIRONMENT"] = ENVIRONMENT
 app.config["LOG_LEVEL"] = os.environ.get("LOG_LEVEL", "INFO")
+# Tamaño máximo de la caché de aptitud por corrida del GA (0 la desactiva)
+app.config["FITNESS_CACHE_SIZE"] = int(os.environ.get("FITNESS_CACHE_SIZE", "20000"))
+# Procesos para correr en paralelo el GA de cada comuna (0 = automático: 1 en
+# SYNC_MODE, si no tantos como núcleos hasta el número de galerías; 1 = secuencial).
+# También fija el tamaño del pool compartido por las corridas (0 = núcleos)
+app.config["GA_WORKERS"] = int(os.environ.get("GA_WORKERS", "0"))
+# Evaluación de aptitud en procesos con memoria compartida para poblaciones grandes
+# (0 = desactivada). Solo aplica cuando las galerías corren de forma secuencial.
+app.config["GA_EVAL_WORKERS"] = int(os.environ.get("GA_EVAL_WORKERS", "0"))
+app.config["GA_PARALLEL_EVAL_MIN"] = int(os.environ.get("GA_PARALLEL_EVAL_MIN", str(DEFAULT_MIN_POPULATION)))
+# Motor del GA por defecto ('generacional' o 'islas'); se puede elegir por corrida
+app.config["GA_ENGINE"] = os.environ.get("GA_ENGINE", "generacional")
+# Modelo de islas: número de islas, generaciones entre migraciones, migrantes por
+# isla y topología ('ring' o 'random')
+app.config["GA_ISLANDS"] = int(os.environ.get("GA_ISLANDS", "4"))
+app.config["GA_MIGRATION_INTERVAL"] = int(os.environ.get("GA_MIGRATION_INTERVAL", "10"))
+app.config["GA_MIGRANTS"] = int(os.environ.get("GA_MIGRANTS", "2"))
+app.config["GA_MIGRATION_TOPOLOGY"] = os.environ.get("GA_MIGRATION_TOPOLOGY", "ring")
+# Parada por convergencia: generaciones sin mejora (0 = solo con plazo de tiempo,
+# donde se usa DEADLINE_CONVERGENCE_WINDOW)
+app.config["GA_CONVERGENCE_WINDOW"] = int(os.environ.get("GA_CONVERGENCE_WINDOW", "0"))
+# Segundos de cómputo por petición en SYNC_MODE; debe quedar por debajo del
+# límite de duración de la función serverless
+app.config["SYNC_TIME_BUDGET"] = float(os.environ.get("SYNC_TIME_BUDGET", "25"))
+DEADLINE_CONVERGENCE_WINDOW = 50
+# Corridas reanudables (motor generacional): el estado del GA se guarda en BD cada
+# GA_CHECKPOINT_EVERY generaciones y, al agotar el plazo de la petición, la corrida
+# queda en pausa para continuarla con /api/continuar/<run_id>
+app.config["GA_CHECKPOINTS"] = os.environ.get("GA_CHECKPOINTS", "1" if SYNC_MODE else "0") == "1"
+app.config["GA_CHECKPOINT_EVERY"] = int(os.environ.get("GA_CHECKPOINT_EVERY", "25"))
+# Corridas asíncronas: cuántas se ejecutan a la vez y cuántas pueden esperar en
+# cola; con la cola llena las rutas responden 429 con Retry-After
+app.config["GA_MAX_CONCURRENT_RUNS"] = int(os.environ.get("GA_MAX_CONCURRENT_RUNS", "2"))
+app.config["GA_MAX_QUEUED_RUNS"] = int(os.environ.get("GA_MAX_QUEUED_RUNS", "8"))
+# Al lanzar una corrida nueva, cancelar las que el mismo usuario tenga en curso
+app.config["GA_CANCEL_PREVIOUS"] = os.environ.get("GA_CANCEL_PREVIOUS", "1") == "1"
+# Límites por usuario (cookie user_key; 0 = sin límite): corridas ejecutándose a
+# la vez, corridas esperando en la cola y presupuesto por hora de población ×
+# generaciones (sumado sobre las galerías de cada corrida)
+app.config["GA_USER_MAX_RUNNING"] = int(os.environ.get("GA_USER_MAX_RUNNING", "1"))
+app.config["GA_USER_MAX_QUEUED"] = int(os.environ.get("GA_USER_MAX_QUEUED", "2"))
+app.config["GA_USER_HOURLY_BUDGET"] = int(os.environ.get("GA_USER_HOURLY_BUDGET", "0"))
+# Logs, progreso y resultados de las corridas para la UI. RUN_STORE_BACKEND:
+# 'memory' (solo los ve el proceso que ejecuta la corrida), 'database' (tablas en
+# DATABASE_URL, compartido entre workers web) u otra URL de SQLAlchemy, p. ej.
+# sqlite:///runs.db para probar varios workers en local. Además: líneas por
+# corrida, segundos que se conservan las corridas terminadas (y las
+# abandonadas) y tope global en MB (solo en memoria)
+app.config["RUN_STORE_BACKEND"] = os.environ.get("RUN_STORE_BACKEND", "memory")
+app.config["RUN_LOG_MAX_LINES"] = int(os.environ.get("RUN_LOG_MAX_LINES", "2000"))
+app.config["RUN_STORE_TTL"] = int(os.environ.get("RUN_STORE_TTL", "3600"))
+app.config["RUN_STORE_IDLE_TTL"] = int(os.environ.get("RUN_STORE_IDLE_TTL", "86400"))
+app.config["RUN_STORE_MAX_MB"] = int(os.environ.get("RUN_STORE_MAX_MB", "64"))
+# Detalle de los logs de texto ('events', 'info' o 'debug'; ver utils.progress):
+# en producción solo eventos numéricos. A los logs va una de cada
+# GA_PROGRESS_EVERY generaciones (el avance en vivo se actualiza en todas)
+app.config["GA_LOG_VERBOSITY"] = parse_verbosity(
+    os.environ.get("GA_LOG_VERBOSITY", "events" if ENVIRONMENT == "production" else "info"))
+app.config["GA_PROGRESS_EVERY"] = int(os.environ.get("GA_PROGRESS_EVERY", "10"))
+# Escritura en BD de los resultados y checkpoints de las corridas en segundo
+# plano (write-behind): el hilo del GA los entrega y sigue con la siguiente
+# galería. Si la BD no responde se reintenta y, si sigue sin responder, quedan en
+# GA_WRITE_JOURNAL hasta poder escribirlos. En SYNC_MODE se escribe en la petición
+app.config["GA_WRITE_BEHIND"] = os.environ.get("GA_WRITE_BEHIND", "0" if SYNC_MODE else "1") == "1"
+app.config["GA_WRITE_JOURNAL"] = os.environ.get(
+    "GA_WRITE_JOURNAL", os.path.join(tempfile.gettempdir(), "galer_comer_pendientes.jsonl"))
+# Flujo de progreso (/api/stream): segundos entre revisiones del progreso y
+# duración máxima de cada conexión (el navegador reconecta solo). Cada conexión
+# abierta ocupa un worker del servidor mientras dura, así que requiere un
+# servidor con hilos o asíncrono (p. ej. gunicorn --threads o gevent); con
+# workers síncronos, unos pocos modales de progreso los bloquean a todos.
+# SSE_MAX_CONNECTIONS acota las conexiones por proceso: por encima, /api/stream
+# responde 503 y el navegador pasa a consultar /api/logs?since= (0 = sin flujo)
+app.config["SSE_INTERVAL"] = float(os.environ.get("SSE_INTERVAL", "1"))
+app.config["SSE_MAX_SECONDS"] = int(os.environ.get("SSE_MAX_SECONDS", "30"))
+app.config["SSE_MAX_CONNECTIONS"] = int(os.environ.get("SSE_MAX_CONNECTIONS", "8"))
+SSE_HEARTBEAT = 15
 
 db.init_app(app)
 
-app.config['EXECUTION_LOGS'] = {}
+# Cola de corridas del GA (modo asíncrono); los trabajos se identifican con _ns(user_key, thread_id)
+job_queue = JobQueue(
+    app.config["GA_MAX_CONCURRENT_RUNS"],
+    app.config["GA_MAX_QUEUED_RUNS"],
+    max_running_per_user=app.config["GA_USER_MAX_RUNNING"],
+    max_queued_per_user=app.config["GA_USER_MAX_QUEUED"],
+    budget_per_hour=app.config["GA_USER_HOURLY_BUDGET"],
+)
+
+# Corridas ejecutándose en este proceso: _ns(user_key, thread_id) -> (run_id, token de cancelación)
+_CORRIDAS_EN_CURSO = {}
+_corridas_lock = threading.Lock()
+
+# Logs y resultados de las corridas para la UI, por _ns(user_key, thread_id)
+run_store = create_run_store(
+    app.config["RUN_STORE_BACKEND"],
+    database_url=app.config['SQLALCHEMY_DATABASE_URI'],
+    max_lines=app.config["RUN_LOG_MAX_LINES"],
+    ttl=app.config["RUN_STORE_TTL"],
+    idle_ttl=app.config["RUN_STORE_IDLE_TTL"],
+    max_bytes=app.config["RUN_STORE_MAX_MB"] * 1024 * 1024,
+)
+
+
+@contextmanager
+def _corrida_en_curso(nskey, run_id):
+    """Registra la corrida mientras se ejecuta y entrega su token de cancelación."""
+    cancel = threading.Event()
+    with _corridas_lock:
+        _CORRIDAS_EN_CURSO[nskey] = (run_id, cancel)
+    try:
+        yield cancel
+    finally:
+        with _corridas_lock:
+            if _CORRIDAS_EN_CURSO.get(nskey, (None, None))[1] is cancel:
+                del _CORRIDAS_EN_CURSO[nskey]
+
+
+def cancelar_corridas(user_key, ident=None, excepto=None):
+    """
+    Cancela las corridas de un usuario (en cola o en ejecución en este proceso).
+
+    Args:
+        user_key (str): Usuario dueño de las corridas.
+        ident (str): thread_id o run_id de una corrida; None cancela todas.
+        excepto (str): nskey de una corrida que no se cancela (la que las reemplaza).
+
+    Returns:
+        int: Corridas canceladas.
+    """
+    prefijo = f"{user_key}:"
+    canceladas = set()
+    with _corridas_lock:
+        for nskey, (run_id, cancel) in _CORRIDAS_EN_CURSO.items():
+            if nskey != excepto and nskey.startswith(prefijo) and ident in (None, nskey[len(prefijo):], run_id):
+                cancel.set()
+                canceladas.add(nskey)
+    for job in job_queue.active_jobs(user_key):
+        if job.job_id == excepto:
+            continue
+        if ident in (None, job.job_id[len(prefijo):], job.run_id) and job_queue.cancel(job.job_id):
+            canceladas.add(job.job_id)
+            if job.state == JOB_CANCELLED:
+                # Se sacó de la cola sin llegar a ejecutarse
+                run_store.emit(job.job_id, RUN_CANCELLED, run_id=job.run_id)
+    return len(canceladas)
+
 
 def only_dev(f):
     @wraps(f)
@@ -82,68 +242,85 @@ def _set_user_cookie(resp):
 def _ns(user_key: str, thread_id: str) -> str:
     return f"{user_key}:{thread_id}"
 
+
+def _costo_corrida(population_size, max_generations, galerias):
+    """Costo de una corrida para el presupuesto por usuario: población × generaciones por galería."""
+    return int(population_size) * int(max_generations) * len(galerias)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
-def guardar_resumen_run(run_id: str, user_key: str):
-    # Agregados básicos de las 7 filas del run
-    agg = (db.session.query(
-            func.count(Ejecucion.id),
-            func.sum(Ejecucion.inv_inicial_usd),
-            func.sum(Ejecucion.utilidad_neta_usd),
-            func.avg(Ejecucion.roi),
-            func.avg(Ejecucion.margen_utilidad),
-            func.avg(Ejecucion.mejor_fitness),
-            func.avg(Ejecucion.beneficio_social),
-        )
-        .filter(Ejecucion.run_id == run_id, Ejecucion.user_key == user_key)
-        .one()
+def _fila_resumen(run_id, user_key, resultados):
+    """
+    Valores de la fila ResumenRun de una corrida a partir de los resultados de
+    sus galerías, con los mismos valores que van a sus filas Ejecucion (ver
+    `_fila_ejecucion`).
+
+    Args:
+        resultados (dict): {comuna: (métricas, aptitud)} de las galerías.
+    """
+    def promedio(valores):
+        valores = [float(v) for v in valores if v is not None]
+        return sum(valores) / len(valores) if valores else 0.0
+
+    def suma(clave, convertir=float):
+        # Como al guardar: locales_* se truncan con int() y las columnas enteras
+        # de EjecucionDetalle redondean
+        return sum(convertir(float(m.get(clave) or 0)) for m in metricas.values())
+
+    metricas = {comuna: m for comuna, (m, _) in resultados.items()}
+    base = [(comuna, m.get('u_ROIGal', 0.0)) for comuna, m in metricas.items()
+            if comuna <= 6 and m.get('u_ROIGal', 0.0) is not None]
+    mejor_comuna_base, mejor_roi_base = max(base, key=lambda par: par[1]) if base else (None, None)
+    return dict(
+        user_key=user_key,
+        run_id=run_id,
+        total_inversion=float(sum(m.get('i_InvIni', 0.0) or 0 for m in metricas.values())),
+        total_utilidad=float(sum(m.get('u_UtNeGa', 0.0) or 0 for m in metricas.values())),
+        prom_roi=promedio(m.get('u_ROIGal', 0.0) for m in metricas.values()),
+        prom_margen=promedio(m.get('u_MarUtN', 0.0) for m in metricas.values()),
+        prom_fitness=promedio(aptitud for _, aptitud in resultados.values()),
+        prom_ben_social=promedio(m.get('u_BenSoc', 0.0) for m in metricas.values()),
+        mejor_comuna_base=mejor_comuna_base,
+        mejor_roi_base=float(mejor_roi_base or 0),
+        sum_l12=suma('l_CLTi12', int),
+        sum_l16=suma('l_CLTi16', int),
+        sum_l20=suma('l_CLTi20', int),
+        sum_l25=suma('l_CLTi25', int),
+        sum_ar_af=suma('y_CLoAlF', round),
+        sum_ar_cp=suma('y_CLoCoP', round),
+        sum_ar_nal=suma('y_CLoNAl', round),
+        sum_ar_sc=suma('y_CLoSeC', round),
+        sum_ing_total=suma('u_IngGal'),
+        sum_egr_total=suma('u_EgrGal'),
     )
 
-    filas, sum_inv, sum_ut, avg_roi, avg_margen, avg_fit, avg_ben = agg
-
-    # Mejor comuna base (1..6) por ROI
-    best_base = (Ejecucion.query
-                 .filter(Ejecucion.user_key == user_key,
-                         Ejecucion.run_id == run_id,
-                         Ejecucion.comuna <= 6)
-                 .order_by(Ejecucion.roi.desc())
-                 .first())
-
-    mejor_comuna_base = best_base.comuna if best_base else None
-    mejor_roi_base    = best_base.roi if best_base else None
-
-    # UPSERT (create or update)
-    resumen = (ResumenRun.query
-               .filter_by(user_key=user_key, run_id=run_id)
-               .first())
-    if not resumen:
-        resumen = ResumenRun(
-            user_key=user_key,
-            run_id=run_id,
-            total_inversion = float(sum_inv or 0),
-            total_utilidad  = float(sum_ut  or 0),
-            prom_roi        = float(avg_roi or 0),
-            prom_margen     = float(avg_margen or 0),
-            prom_fitness    = float(avg_fit or 0),
-            prom_ben_social = float(avg_ben or 0),
-            mejor_comuna_base = mejor_comuna_base,
-            mejor_roi_base    = float(mejor_roi_base or 0),
-        )
-        db.session.add(resumen)
-    else:
-        resumen.total_inversion = float(sum_inv or 0)
-        resumen.total_utilidad  = float(sum_ut  or 0)
-        resumen.prom_roi        = float(avg_roi or 0)
-        resumen.prom_margen     = float(avg_margen or 0)
-        resumen.prom_fitness    = float(avg_fit or 0)
-        resumen.prom_ben_social = float(avg_ben or 0)
-        resumen.mejor_comuna_base = mejor_comuna_base
-        resumen.mejor_roi_base    = float(mejor_roi_base or 0)
-
-    db.session.commit()
-    return resumen
+def _guardar_resumen(fila):
+    """UPSERT (sin commit) de la fila ResumenRun de `_fila_resumen`."""
+    valores = {k: v for k, v in fila.items() if k not in ('user_key', 'run_id')}
+    db.session.execute(pg_insert(ResumenRun)
+                       .values(fila)
+                       .on_conflict_do_update(constraint='uq_resumen_user_run', set_=valores))
+
+def guardar_resumen_run(run_id: str, user_key: str, commit=True):
+    """
+    Calcula el resumen de una corrida desde sus filas Ejecucion en BD.
+
+    Las corridas nuevas guardan su resumen al terminar, junto con sus galerías
+    (ver `_insertar_corrida`); esto queda para las anteriores (ver
+    backfill_resumen.py).
+    """
+    ejecuciones = Ejecucion.query.filter_by(run_id=run_id, user_key=user_key).all()
+    resultados = {}
+    for ejecucion in ejecuciones:
+        _, metricas, aptitud = _resultado_guardado(ejecucion)
+        resultados[ejecucion.comuna] = (metricas, aptitud)
+    fila = _fila_resumen(run_id, user_key, resultados)
+    _guardar_resumen(fila)
+    if commit:
+        db.session.commit()
+    return fila
 
 @app.route('/api/debug/database')
 @only_dev
@@ -266,6 +443,8 @@ def parametrizacion():
         session.setdefault('mutation_rate', 0.05)
         session.setdefault('sigma_factor', 0.1)
         session.setdefault('crossover_rate', 0.7)
+        motor = request.form.get('motor_ga') or app.config['GA_ENGINE']
+        session['ga_engine'] = motor if motor in ENGINES else 'generacional'
         
         # Iniciar ejecucion en segundo plano
         thread_id = str(time.time())
@@ -273,11 +452,22 @@ def parametrizacion():
 
         uk = get_or_create_user_key()
         nskey = _ns(uk, thread_id)
-
-        # Inicializar logs si no existen
-        if 'EXECUTION_LOGS' not in app.config:
-            app.config['EXECUTION_LOGS'] = {}
-        app.config['EXECUTION_LOGS'][nskey] = []
+        # La corrida en curso se cancela solo si la nueva es admitida: una
+        # rechazada no la reemplaza (en modo asíncrono la cola descuenta el
+        # presupuesto al encolar)
+        costo = _costo_corrida(session['population_size'], session['max_generations'], galerias_existentes)
+        reemplazar = app.config['GA_CANCEL_PREVIOUS']
+        if SYNC_MODE:
+            try:
+                job_queue.charge(uk, costo)
+            except UserLimitError as e:
+                return (render_template('parametrizacion.html', show_progress_modal=False, error=str(e)),
+                        429, {'Retry-After': str(e.retry_after)})
+            if reemplazar:
+                cancelar_corridas(uk)
+
+        # Inicializar los logs de la corrida
+        run_store.reset_log(nskey)
         
         run_id = str(uuid.uuid4())
         session['last_run_id'] = run_id
@@ -285,34 +475,46 @@ def parametrizacion():
         # ✅ En Vercel (SYNC_MODE=1) ejecuta SIN hilo y redirige a resultados
         if SYNC_MODE:
             try:
-                procesar_todas_galerias(
+                completada = procesar_todas_galerias(
                     app, thread_id, galerias_existentes,
                     session['population_size'], session['max_generations'],
                     session['elite_percentage'], session['mutation_rate'],
                     session['sigma_factor'], session['crossover_rate'],
                     (peso_be, peso_bs, peso_mun),
-                    run_id,uk
+                    run_id,uk, session['ga_engine'],
+                    deadline=time.time() + app.config['SYNC_TIME_BUDGET']
                 )
             except Exception as e:
-                app.config['EXECUTION_LOGS'][nskey].append(f"ERROR: {e}")
+                run_store.emit(nskey, RUN_FAILED, error=str(e))
                 flash("Ocurrió un error durante el procesamiento.", "danger")
                 return render_template('parametrizacion.html', show_progress_modal=False)
+            if not completada:
+                flash("La corrida quedó en pausa por el límite de tiempo; continúela desde Resultados.", "info")
 
             # Terminado: ir directo a /resultados con el run_id
             return redirect(url_for('resultados', run_id=run_id))
-        # 🧵 Modo local/asíncrono (cuando SYNC_MODE=0): conserva tu hilo + modal
-        thread = threading.Thread(
-            target=procesar_todas_galerias,
-            args=(app, thread_id, galerias_existentes,
-                  session['population_size'], session['max_generations'],
-                  session['elite_percentage'], session['mutation_rate'],
-                  session['sigma_factor'], session['crossover_rate'],
-                  (peso_be, peso_bs, peso_mun),
-                  run_id,uk)
-        )
-        thread.daemon = True
-        thread.start()
-        print(f"Thread {thread_id} iniciado para procesar 7 galerías (run_id={run_id})")
+        # 🧵 Modo local/asíncrono (cuando SYNC_MODE=0): se encola la corrida + modal
+        # (el estado 'en_cola' se registra antes, para que el worker no lo pise)
+        run_store.emit(nskey, RUN_QUEUED, record=False, run_id=run_id)
+        try:
+            job_queue.submit(
+                nskey, procesar_todas_galerias,
+                app, thread_id, galerias_existentes,
+                session['population_size'], session['max_generations'],
+                session['elite_percentage'], session['mutation_rate'],
+                session['sigma_factor'], session['crossover_rate'],
+                (peso_be, peso_bs, peso_mun),
+                run_id, uk, session['ga_engine'],
+                run_id=run_id, user_key=uk, cost=costo, replace=reemplazar
+            )
+        except QueueFullError as e:
+            run_store.discard(nskey)
+            return (render_template('parametrizacion.html', show_progress_modal=False, error=str(e)),
+                    429, {'Retry-After': str(e.retry_after)})
+        if reemplazar:
+            # Una corrida nueva reemplaza a la que el usuario tenía en curso
+            cancelar_corridas(uk, excepto=nskey)
+        print(f"Corrida {thread_id} encolada para procesar 7 galerías (run_id={run_id})")
 
         return render_template('parametrizacion.html',
                                show_progress_modal=True,
@@ -341,6 +543,7 @@ def procesar_todas_galerias_route():
         mutation_rate = float(session.get('mutation_rate', 0.05))
         sigma_factor = float(session.get('sigma_factor', 0.1))
         crossover_rate = float(session.get('crossover_rate', 0.7))
+        engine = session.get('ga_engine') or app.config['GA_ENGINE']
     except Exception:
         return jsonify({
             "status": "error",
@@ -355,43 +558,61 @@ def procesar_todas_galerias_route():
     uk = get_or_create_user_key()
     nskey = _ns(uk, thread_id)
 
-    if 'EXECUTION_LOGS' not in app.config:
-        app.config['EXECUTION_LOGS'] = {}
-    app.config['EXECUTION_LOGS'][nskey] = []
-    session['last_run_id'] = run_id
-
-
-    # 4) En producción y modo demo, limitar carga para no exceder timeouts serverless
+    # 4) En producción y modo demo, limitar la población para no exceder la memoria
+    #    serverless; las generaciones quedan acotadas por el plazo de tiempo
     if ENVIRONMENT == "production" and SYNC_MODE:
         population_size = min(population_size, 100)
-        max_generations = min(max_generations, 500)
+
+    # La corrida en curso se cancela solo si la nueva es admitida (ver parametrizacion)
+    costo = _costo_corrida(population_size, max_generations, galerias_existentes)
+    reemplazar = app.config['GA_CANCEL_PREVIOUS']
+    if SYNC_MODE:
+        try:
+            job_queue.charge(uk, costo)
+        except UserLimitError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e),
+                "retry_after": e.retry_after
+            }), 429, {'Retry-After': str(e.retry_after)}
+        if reemplazar:
+            cancelar_corridas(uk)
+
+    run_store.reset_log(nskey)
+    session['last_run_id'] = run_id
 
     # 5) Rama según SYNC_MODE
     if SYNC_MODE:
         # --- SÍNCRONO: ejecutar directamente dentro de la petición ---
+        # Cada GA se detiene al agotar su parte del plazo y devuelve su mejor solución
         try:
-            procesar_todas_galerias(
+            completada = procesar_todas_galerias(
                 app, thread_id, galerias_existentes,
                 population_size, max_generations,
                 elite_percentage, mutation_rate,
                 sigma_factor, crossover_rate, weights,
-                run_id, uk
+                run_id, uk, engine,
+                deadline=time.time() + app.config['SYNC_TIME_BUDGET']
             )
         except Exception as e:
             # Registra el error en logs del thread para trazabilidad
-            app.config['EXECUTION_LOGS'][nskey].append(f"ERROR: {e}")
+            run_store.emit(nskey, RUN_FAILED, error=str(e))
             return jsonify({
                 "status": "error",
                 "message": "Error durante el procesamiento (modo síncrono)."
             }), 500
 
-        # Terminado: el front puede redirigir a /resultados usando run_id
-        return jsonify({
+        # Terminado: el front puede redirigir a /resultados usando run_id; si quedó
+        # en pausa, se continúa con POST a la URL de "continue"
+        respuesta = {
             "status": "ok",
             "thread_id": thread_id,
             "run_id": run_id,
-            "completed": True
-        })
+            "completed": completada
+        }
+        if not completada:
+            respuesta["continue"] = url_for('continuar_corrida', run_id=run_id)
+        return jsonify(respuesta)
     else:
         # --- ASÍNCRONO: comportamiento actual con thread ---
         def _target():
@@ -401,14 +622,25 @@ def procesar_todas_galerias_route():
                     population_size, max_generations,
                     elite_percentage, mutation_rate,
                     sigma_factor, crossover_rate, weights,
-                    run_id, uk
+                    run_id, uk, engine
                 )
             except Exception as e:
                 # Guarda el error en los logs de ejecución
-                app.config['EXECUTION_LOGS'][nskey].append(f"ERROR: {e}")
+                run_store.emit(nskey, RUN_FAILED, error=str(e))
 
-        thread = threading.Thread(target=_target, daemon=True)
-        thread.start()
+        run_store.emit(nskey, RUN_QUEUED, record=False, run_id=run_id)
+        try:
+            job_queue.submit(nskey, _target, run_id=run_id, user_key=uk, cost=costo, replace=reemplazar)
+        except QueueFullError as e:
+            run_store.discard(nskey)
+            return jsonify({
+                "status": "error",
+                "message": str(e),
+                "retry_after": e.retry_after
+            }), 429, {'Retry-After': str(e.retry_after)}
+        if reemplazar:
+            # Una corrida nueva reemplaza a la que el usuario tenía en curso
+            cancelar_corridas(uk, excepto=nskey)
 
         # Respuesta inmediata; el front puede hacer polling de logs si lo usas
         return jsonify({
@@ -445,183 +677,619 @@ def calcular_roi_seguro(metrics):
     except Exception:
         return 0.0
 
+def _entradas_galeria(galeria):
+    """
+    Entradas de usuario y constantes del GA para una galería de la parametrización.
+
+    Returns:
+        tuple: (user_inputs, constants).
+    """
+    g_TamPar_const = galeria['tam_lote'] - (galeria['tam_lote'] * 0.6)
+    g_TaUtPa_const = g_TamPar_const - (g_TamPar_const * 0.3)
+
+    user_inputs = {
+        'g_TamLot': galeria['tam_lote'],
+        'b_CanPri': galeria['can_pri'],
+        'b_CanSec': galeria['can_sec'],
+        'comuna': galeria['numero']
+    }
+
+    constants = {
+        'g_TamPar': g_TamPar_const,
+        'g_TaUtPa': g_TaUtPa_const,
+    }
+    return user_inputs, constants
+
+def _copiar_resultado(result):
+    """Copia independiente de (cromosoma, métricas, aptitud) para repartirla a otra galería."""
+    if result is None:
+        return None
+    best_chromosome, best_metrics, best_fitness = result
+    return (list(best_chromosome) if best_chromosome is not None else None,
+            dict(best_metrics or {}), best_fitness)
+
+def _fila_ejecucion(comuna, user_inputs, result, weights, ga_params, run_id, user_key, info=None):
+    """
+    Valores de la fila Ejecucion de una galería (ver `_insertar_corrida`).
+    `info` es el que completa el motor del GA (criterio de parada y generaciones).
+    """
+    best_chromosome, best_metrics, best_fitness = result
+    info = info or {}
+    return dict(
+        comuna=comuna,
+        tam_lote_m2=user_inputs['g_TamLot'],
+        can_pri_unidades=user_inputs['b_CanPri'],
+        can_sec_unidades=user_inputs['b_CanSec'],
+
+        peso_bs=weights[1],
+        peso_be=weights[0],
+        peso_mun=weights[2],
+
+        poblacion_inicial=ga_params['population_size'],
+        generaciones=ga_params['max_generations'],
+        tasa_mutacion=ga_params['mutation_rate'],
+        porcentaje_elite=ga_params['elite_percentage'],
+        fuerza_sigma=ga_params['sigma_factor'],
+        tasa_cruzamiento=ga_params['crossover_rate'],
+
+        mejor_fitness=best_fitness,
+        inv_inicial_usd=best_metrics.get('i_InvIni', 0.0),
+        roi=best_metrics.get('u_ROIGal', 0.0),
+        utilidad_neta_usd=best_metrics.get('u_UtNeGa', 0.0),
+        margen_utilidad=best_metrics.get('u_MarUtN', 0.0),
+        empleos_directos=best_metrics.get('x_Empleo', 0.0),
+        beneficio_social=best_metrics.get('u_BenSoc', 0.0),
+        cromosoma_optimo=best_chromosome,
+
+        locales_12 = int(best_metrics.get('l_CLTi12', 0) or 0),
+        locales_16 = int(best_metrics.get('l_CLTi16', 0) or 0),
+        locales_20 = int(best_metrics.get('l_CLTi20', 0) or 0),
+        locales_25 = int(best_metrics.get('l_CLTi25', 0) or 0),
+
+        criterio_parada=info.get('stop_reason'),
+        generaciones_ejecutadas=info.get('generations'),
+
+        run_id=run_id,
+        user_key = user_key
+    )
+
+def _fila_detalle(best_metrics):
+    """Valores de la fila EjecucionDetalle de una galería (sin `ejecucion_id`)."""
+    return dict(
+        inv_total=best_metrics.get('i_InvIni'),
+        inv_loc=best_metrics.get('l_CTCLo'),
+        inv_parq=best_metrics.get('p_SCTPar'),
+        inv_zonas=best_metrics.get('z_CTZcAv'),
+        ing_total=best_metrics.get('u_IngGal'),
+        ing_arr=best_metrics.get('a_ToArGa'),
+        ing_adm=best_metrics.get('d_ToAdGa'),
+        ing_parq=best_metrics.get('q_ToPaGa'),
+        egr_total=best_metrics.get('u_EgrGal'),
+        egr_mant=best_metrics.get('m_ToEgGa'),
+        egr_servpub=best_metrics.get('s_ToSPGa'),
+        egr_salarios=best_metrics.get('o_ToSaGa'),
+        egr_operativos=best_metrics.get('v_ToSOGa'),
+        egr_admin=best_metrics.get('n_ToGAGa'),
+        egr_legales=best_metrics.get('t_ToRMGa'),
+        egr_impuestos=best_metrics.get('u_ImpGas'),
+        bs_accesibilidad=best_metrics.get('e_Accesi', None),
+        bs_emp_dir=best_metrics.get('w_STEmDi'),
+        bs_emp_ind=best_metrics.get('x_STEmIn'),
+        bs_calidad_vida=best_metrics.get('k_CalVid', None),
+        ar_alimentos_frescos=best_metrics.get('y_CLoAlF'),
+        ar_comidas_preparadas=best_metrics.get('y_CLoCoP'),
+        ar_no_alimentarios=best_metrics.get('y_CLoNAl'),
+        ar_complementarios=best_metrics.get('y_CLoSeC'),
+    )
+
+def _actualizar_historial(run_id, user_key, filas):
+    """
+    UPSERT (sin commit) de la fila HistorialRun de la corrida con sus nuevas
+    filas Ejecucion y, si la corrida es nueva, del conteo del usuario.
+    """
+    rois = [fila['roi'] for fila in filas if fila.get('roi') is not None]
+    sentencia = pg_insert(HistorialRun).values(
+        user_key=user_key, run_id=run_id, filas=len(filas),
+        mejor_roi=max(rois) if rois else None, ultima_fecha=func.now())
+    sentencia = (sentencia
+                 .on_conflict_do_update(constraint='uq_historial_user_run', set_={
+                     'filas': HistorialRun.filas + sentencia.excluded.filas,
+                     'mejor_roi': func.greatest(HistorialRun.mejor_roi, sentencia.excluded.mejor_roi),
+                     'ultima_fecha': sentencia.excluded.ultima_fecha,
+                 })
+                 # xmax = 0 solo en las filas recién insertadas
+                 .returning(literal_column('xmax') == 0))
+    if db.session.execute(sentencia).scalar():
+        conteo = pg_insert(ConteoCorridas).values(user_key=user_key, corridas=1)
+        db.session.execute(conteo.on_conflict_do_update(
+            index_elements=[ConteoCorridas.user_key],
+            set_={'corridas': ConteoCorridas.corridas + 1}))
+
+def _insertar_corrida(run_id, user_key, galerias, resumen=None, checkpoints=False):
+    """
+    Inserta (sin commit) las galerías terminadas de una corrida.
+
+    Las Ejecucion se insertan en una sola sentencia con ON CONFLICT sobre
+    uq_ejec_run_comuna (las que ya estaban guardadas en este run_id, p. ej. al
+    retomar la corrida, se omiten) y sus EjecucionDetalle en otra. Con
+    `resumen` (al terminar la corrida) se guarda también su ResumenRun y, con
+    `checkpoints`, se cierran sus checkpoints.
+
+    Args:
+        galerias (list): Pares (fila Ejecucion de `_fila_ejecucion`, métricas).
+        resumen (dict): Fila ResumenRun de `_fila_resumen`.
+
+    Returns:
+        list: Comunas insertadas.
+    """
+    insertadas = {}
+    if galerias:
+        sentencia = (pg_insert(Ejecucion)
+                     .values([fila for fila, _ in galerias])
+                     .on_conflict_do_nothing(constraint='uq_ejec_run_comuna')
+                     .returning(Ejecucion.comuna, Ejecucion.id))
+        insertadas = dict(db.session.execute(sentencia).all())
+        detalles = [dict(ejecucion_id=insertadas[fila['comuna']], **_fila_detalle(metricas))
+                    for fila, metricas in galerias if fila['comuna'] in insertadas]
+        if detalles:
+            db.session.execute(insert(EjecucionDetalle), detalles)
+        if insertadas:
+            _actualizar_historial(run_id, user_key, [fila for fila, _ in galerias
+                                                     if fila['comuna'] in insertadas])
+    if resumen is not None:
+        _guardar_resumen(resumen)
+    if checkpoints:
+        _cerrar_checkpoints(run_id, user_key, commit=False)
+    return sorted(insertadas)
+
+def _resultado_guardado(ejecucion):
+    """
+    (cromosoma, métricas, aptitud) de una Ejecucion ya guardada en esta corrida.
+
+    Las métricas incluyen los locales y las columnas del detalle que usa
+    `_fila_resumen`, para que una corrida retomada sume también las galerías
+    guardadas en tramos anteriores.
+    """
+    best_metrics = {
+        'i_InvIni': ejecucion.inv_inicial_usd,
+        'u_ROIGal': ejecucion.roi,
+        'u_UtNeGa': ejecucion.utilidad_neta_usd,
+        'u_MarUtN': ejecucion.margen_utilidad,
+        'x_Empleo': ejecucion.empleos_directos,
+        'u_BenSoc': ejecucion.beneficio_social,
+        'l_CLTi12': ejecucion.locales_12,
+        'l_CLTi16': ejecucion.locales_16,
+        'l_CLTi20': ejecucion.locales_20,
+        'l_CLTi25': ejecucion.locales_25,
+    }
+    for detalle in ejecucion.detalles:
+        best_metrics.update(y_CLoAlF=detalle.ar_alimentos_frescos, y_CLoCoP=detalle.ar_comidas_preparadas,
+                            y_CLoNAl=detalle.ar_no_alimentarios, y_CLoSeC=detalle.ar_complementarios,
+                            u_IngGal=detalle.ing_total, u_EgrGal=detalle.egr_total)
+    return ejecucion.cromosoma_optimo, best_metrics, ejecucion.mejor_fitness
+
+def _guardar_checkpoint_run(run_id, user_key, thread_id, parametros):
+    """Registra una sola vez los parámetros de una corrida reanudable."""
+    if CheckpointRun.query.filter_by(user_key=user_key, run_id=run_id).first() is None:
+        db.session.add(CheckpointRun(user_key=user_key, run_id=run_id,
+                                     thread_id=thread_id, parametros=parametros))
+        db.session.commit()
+
+def _guardar_checkpoint(run_id, user_key, comuna, estado, commit=True):
+    """Guarda (o reemplaza) el último estado del GA de una galería."""
+    checkpoint = (CheckpointGaleria.query
+                  .filter_by(user_key=user_key, run_id=run_id, comuna=comuna)
+                  .first())
+    if checkpoint is None:
+        checkpoint = CheckpointGaleria(user_key=user_key, run_id=run_id, comuna=comuna)
+        db.session.add(checkpoint)
+    checkpoint.generacion = estado['generation']
+    checkpoint.estado = estado
+    if commit:
+        db.session.commit()
+
+def _cargar_checkpoint(run_id, user_key, comuna):
+    checkpoint = (CheckpointGaleria.query
+                  .filter_by(user_key=user_key, run_id=run_id, comuna=comuna)
+                  .first())
+    return checkpoint.estado if checkpoint else None
+
+def _cerrar_checkpoints(run_id, user_key, commit=True):
+    """Marca la corrida como terminada y borra los estados de sus galerías."""
+    CheckpointGaleria.query.filter_by(user_key=user_key, run_id=run_id).delete()
+    CheckpointRun.query.filter_by(user_key=user_key, run_id=run_id).update({'terminada': True})
+    if commit:
+        db.session.commit()
+
+# Escrituras de las corridas que se pueden diferir (ver `_persistir`), por 'tipo'
+_ESCRITURAS = {
+    'corrida': _insertar_corrida,
+    'checkpoint': lambda **datos: _guardar_checkpoint(commit=False, **datos),
+    'cerrar': lambda **datos: _cerrar_checkpoints(commit=False, **datos),
+}
+
+def _guardar_unidades(unidades):
+    """
+    Guarda en BD, en una sola transacción, unidades de escritura de las corridas:
+    dicts con 'tipo' ('corrida', 'checkpoint' o 'cerrar') y los argumentos de su
+    función en `_ESCRITURAS`. Todo o nada: si algo falla se hace rollback y la
+    excepción se propaga, sin dejar filas sueltas.
+    """
+    try:
+        for unidad in unidades:
+            datos = dict(unidad)
+            _ESCRITURAS[datos.pop('tipo')](**datos)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def _escribir_unidades(unidades):
+    # Escritura del hilo de `persistencia`, fuera de cualquier petición
+    with app.app_context():
+        _guardar_unidades(unidades)
+
+def _error_transitorio(exc):
+    """Errores de conexión con la BD, que vale la pena reintentar (el resto son de los datos)."""
+    return isinstance(exc, (OperationalError, InterfaceError)) or getattr(exc, 'connection_invalidated', False)
+
+# Escritor en segundo plano de las corridas (GA_WRITE_BEHIND); None = se escribe en el hilo que llama
+persistencia = None
+if app.config["GA_WRITE_BEHIND"]:
+    persistencia = WriteBehindWriter(_escribir_unidades,
+                                     journal_path=app.config["GA_WRITE_JOURNAL"],
+                                     is_transient=_error_transitorio,
+                                     name='ga-persistencia')
+    atexit.register(persistencia.close)
+
+def _persistir(unidad, on_done=None, on_error=None, on_spill=None):
+    """
+    Entrega una unidad de escritura (ver `_guardar_unidades`) y retorna.
+
+    Con `persistencia` se escribe en segundo plano y los callbacks se llaman
+    desde su hilo (`on_spill` si quedó en el journal por falta de BD); sin ella
+    se escribe ya, se llama `on_done` y los errores se propagan.
+    """
+    if persistencia is not None:
+        persistencia.submit(unidad, on_done=on_done, on_error=on_error, on_spill=on_spill)
+        return
+    _guardar_unidades([unidad])
+    if on_done is not None:
+        on_done()
+
 def procesar_todas_galerias(app, thread_id, galerias_a_procesar, 
                             population_size, max_generations, elite_percentage,
                             mutation_rate, sigma_factor, crossover_rate, weights,
-                            run_id, user_key):
+                            run_id, user_key, engine=None, deadline=None):
     """
     Nota: requiere que el modelo Ejecucion tenga la columna:
       run_id = db.Column(db.String(36), index=True, nullable=False)
+
+    Si se pasa `deadline` (marca `time.time()`), el tiempo restante se reparte
+    entre las galerías pendientes y cada GA se detiene en su parte devolviendo
+    el mejor resultado hasta ese momento.
+
+    Con GA_CHECKPOINTS (motor generacional) la corrida es reanudable: las galerías
+    corren una tras otra guardando su estado en BD y, al llegar a `deadline`, la
+    corrida queda en pausa. Volver a llamar con el mismo run_id (ver
+    /api/continuar/<run_id>) omite las galerías ya guardadas y retoma la pendiente
+    desde su checkpoint.
+
+    La corrida se puede cancelar con `cancelar_corridas`: el token se revisa entre
+    galerías y en cada generación del GA, y lo ya calculado no se guarda.
+
+    Las galerías y el resumen se guardan en BD al final, en una sola transacción
+    (ver `_insertar_corrida`); si falla, la corrida termina con error sin filas a
+    medias. Con GA_WRITE_BEHIND esa escritura y la de los checkpoints se hacen en
+    segundo plano (ver `_persistir`): el GA no espera a la BD y la corrida pasa a
+    completada (o en pausa) cuando sus filas quedaron guardadas.
+
+    Returns:
+        bool: False si la corrida quedó en pausa, True en otro caso.
     """
     nskey = _ns(user_key, thread_id)
+    if engine not in ENGINES:
+        engine = app.config.get('GA_ENGINE', 'generacional')
+    checkpoints = app.config.get('GA_CHECKPOINTS', False) and engine == 'generacional'
 
-    with app.app_context():
-        logs = app.config['EXECUTION_LOGS'].get(nskey, [])
-        
-        logs.append("=" * 60)
-        logs.append("PROCESANDO LAS 7 GALERiAS COMERCIALES")
-        logs.append("=" * 60)
+    with app.app_context(), _corrida_en_curso(nskey, run_id) as cancel:
+        # Los avisos y errores van siempre a los logs; el texto informativo según
+        # GA_LOG_VERBOSITY y el progreso como eventos (ver utils.progress)
+        logs = run_store.log(nskey)
+        say = LevelLog(logs.append, app.config['GA_LOG_VERBOSITY'])
+        run_store.emit(nskey, RUN_STARTED, run_id=run_id, engine=engine, galleries=len(galerias_a_procesar))
 
         # Dejar evidencia de que no se borra el historial
-        logs.append(f"[{datetime.utcnow().isoformat()}Z] Preservando historial (no se borra la tabla).")
-        logs.append(f"[{datetime.utcnow().isoformat()}Z] run_id={run_id} asignado a esta corrida.")
-        app.config['EXECUTION_LOGS'][nskey] = logs
+        say.info("[%sZ] Preservando historial (no se borra la tabla).", datetime.utcnow().isoformat())
 
         resultados_galerias = {}
+        # Filas de las galerías terminadas: se guardan en una sola transacción al
+        # final (o al pausar); si la corrida se cancela, no se guardan
+        por_guardar = {}
+        cada = max(1, app.config.get('GA_PROGRESS_EVERY', 10))
+        generacion_registrada = {}
+        ultimo_avance = {}
+
+        def progreso(galeria_num):
+            # Eventos del GA de la galería: actualizan su avance (ver /api/stream);
+            # a los logs van las mejoras y una generación de cada GA_PROGRESS_EVERY.
+            # Las demás generaciones se envían a lo sumo cada PROGRESS_INTERVAL
+            # segundos, como desde el pool: con RUN_STORE_BACKEND=database cada
+            # emit es una transacción en el hilo del GA
+            def on_event(kind, data):
+                registrar = True
+                if kind == GENERATION:
+                    registrar = data['generation'] - generacion_registrada.get(galeria_num, 0) >= cada
+                    if registrar:
+                        generacion_registrada[galeria_num] = data['generation']
+                    else:
+                        ahora = time.monotonic()
+                        if ahora - ultimo_avance.get(galeria_num, 0.0) < PROGRESS_INTERVAL:
+                            return
+                        ultimo_avance[galeria_num] = ahora
+                run_store.emit(nskey, kind, record=registrar, gallery=galeria_num,
+                               max_generations=max_generations, **data)
+            return on_event
+
+        def terminar_galeria(galeria_num, best_metrics, best_fitness, info=None):
+            info = info or {}
+            run_store.emit(nskey, GALLERY_FINISHED, gallery=galeria_num,
+                           roi=float(best_metrics.get('u_ROIGal', 0) or 0), best_fitness=float(best_fitness or 0),
+                           stop_reason=info.get('stop_reason'), generations=info.get('generations'))
+
+        def guardar_checkpoint(galeria_num):
+            # El estado del GA se entrega para guardarlo y la galería sigue
+            def on_checkpoint(estado):
+                _persistir({'tipo': 'checkpoint', 'run_id': run_id, 'user_key': user_key,
+                            'comuna': galeria_num, 'estado': estado},
+                           on_error=lambda e: logs.append(
+                               f"[WARN] No se pudo guardar el checkpoint de la Galeria {galeria_num}: {e}"))
+            return on_checkpoint
+
+        def pausar(galeria_num):
+            # Las galerías ya terminadas se guardan para omitirlas al continuar; la
+            # pausa se anuncia después, cuando ya se puede continuar desde la BD
+            def en_pausa():
+                run_store.emit(nskey, RUN_PAUSED, gallery=galeria_num, run_id=run_id)
+
+            def al_fallar(e):
+                logs.append(f"[WARN] No se pudieron guardar las galerías terminadas: {e}")
+                en_pausa()
+
+            try:
+                _persistir({'tipo': 'corrida', 'run_id': run_id, 'user_key': user_key,
+                            'galerias': list(por_guardar.values())},
+                           on_done=en_pausa, on_error=al_fallar)
+            except Exception as e:
+                al_fallar(e)
+            return False
+
+        def cancelar():
+            if checkpoints:
+                # Por el escritor, para que quede después de los checkpoints pendientes
+                try:
+                    _persistir({'tipo': 'cerrar', 'run_id': run_id, 'user_key': user_key},
+                               on_error=lambda e: logs.append(
+                                   f"[WARN] No se pudieron cerrar los checkpoints del run: {e}"))
+                except Exception as e:
+                    logs.append(f"[WARN] No se pudieron cerrar los checkpoints del run: {e}")
+            run_store.emit(nskey, RUN_CANCELLED, run_id=run_id)
+            return True
         
         try:
-            # Procesar cada una de las 7 galerías
+            ga_params = {
+                'population_size': population_size,
+                'max_generations': max_generations,
+                'elite_percentage': elite_percentage,
+                'mutation_rate': mutation_rate,
+                'sigma_factor': sigma_factor,
+                'crossover_rate': crossover_rate,
+            }
+            if checkpoints:
+                _guardar_checkpoint_run(run_id, user_key, thread_id, {
+                    'galerias': galerias_a_procesar,
+                    'ga_params': ga_params,
+                    'weights': list(weights),
+                    'engine': engine,
+                })
+
+            # Preparar las galerías a procesar (las 7, salvo las ya guardadas en este run_id)
+            guardadas = {e.comuna: e for e in
+                         Ejecucion.query.filter_by(user_key=user_key, run_id=run_id).all()}
+            pendientes = []
             for galeria in galerias_a_procesar:
                 galeria_num = galeria['numero']
 
                 # --- VERIFICACIÓN para evitar duplicar dentro del MISMO run_id ---
-                existing_execution = Ejecucion.query.filter_by(comuna=galeria_num, run_id=run_id).first()
+                existing_execution = guardadas.get(galeria_num)
                 if existing_execution:
-                    logs.append(f"GALERIA_{galeria_num} ya existe en este run_id={run_id}. Se omite la inserción duplicada.")
-                    app.config['EXECUTION_LOGS'][nskey] = logs
+                    say.info("GALERIA_%s ya existe en este run_id=%s. Se omite la inserción duplicada.", galeria_num, run_id)
+                    # Se conserva su resultado para elegir la mejor comuna al retomar la corrida
+                    best_chromosome, best_metrics, best_fitness = _resultado_guardado(existing_execution)
+                    user_inputs, constants = _entradas_galeria(galeria)
+                    resultados_galerias[galeria_num] = {
+                        'best_chromosome': best_chromosome,
+                        'best_metrics': best_metrics,
+                        'best_fitness': best_fitness,
+                        'user_inputs': user_inputs,
+                        'constants': constants,
+                        'info': {'stop_reason': existing_execution.criterio_parada,
+                                 'generations': existing_execution.generaciones_ejecutadas},
+                        'guardada': True
+                    }
+                    terminar_galeria(galeria_num, best_metrics, best_fitness, resultados_galerias[galeria_num]['info'])
                     continue
                 # -----------------------------------------------------------------
 
-                logs.append(f"Procesando Galeria {galeria_num}...")
-                app.config['EXECUTION_LOGS'][nskey] = logs
-                time.sleep(0.1)
-                
-                # Calcular constantes para esta galeria
-                g_TamPar_const = galeria['tam_lote'] - (galeria['tam_lote'] * 0.6)
-                g_TaUtPa_const = g_TamPar_const - (g_TamPar_const * 0.3)
-
-                user_inputs = {
-                    'g_TamLot': galeria['tam_lote'],
-                    'b_CanPri': galeria['can_pri'],
-                    'b_CanSec': galeria['can_sec'],
-                    'comuna': galeria_num
-                }
-
-                constants = {
-                    'g_TamPar': g_TamPar_const,
-                    'g_TaUtPa': g_TaUtPa_const,
-                }
-                
-                # Combinar constantes globales (si las usas dentro del GA)
-                from utils.genetic_algorithm import CONSTANTS as GLOBAL_CONSTANTS, gene_definitions
-                full_constants = {**GLOBAL_CONSTANTS, **constants}
-                
-                # EJECUTAR GA
-                result  = run_genetic_algorithm(
-                    app, 
-                    f"{thread_id}_galeria_{galeria_num}",
-                    user_inputs, 
-                    constants,  # Si tu GA necesita full_constants, cámbialo aquí
-                    population_size, 
-                    max_generations,
-                    elite_percentage,
-                    mutation_rate,
-                    sigma_factor,
-                    crossover_rate,
-                    weights,
-                    None,
-                    user_key
-                )
+                user_inputs, constants = _entradas_galeria(galeria)
+                pendientes.append((galeria_num, user_inputs, constants))
 
+            def registrar_resultado(galeria_num, user_inputs, constants, result, info=None):
                 # Verificar si el resultado es válido
                 if result is None:
                     logs.append(f"Error: run_genetic_algorithm retornó None para Galeria {galeria_num}")
                     # Crear valores por defecto
-                    best_chromosome = [0] * len(gene_definitions)
-                    best_metrics = {'u_ROIGal': 0.0, 'u_UtNeGa': 0.0}
-                    best_fitness = 0.0
-                else:
-                    best_chromosome, best_metrics, best_fitness = result
-                
+                    result = ([0] * len(gene_definitions), {'u_ROIGal': 0.0, 'u_UtNeGa': 0.0}, 0.0)
+                best_chromosome, best_metrics, best_fitness = result
+
                 # Guardar resultados en memoria
                 resultados_galerias[galeria_num] = {
                     'best_chromosome': best_chromosome,
                     'best_metrics': best_metrics,
                     'best_fitness': best_fitness,
                     'user_inputs': user_inputs,
-                    'constants': constants
+                    'constants': constants,
+                    'info': info or {}
                 }
+                if info and info.get('stop_reason'):
+                    say.info("Galeria %s: criterio de parada %s (%s generaciones)",
+                             galeria_num, info['stop_reason'], info.get('generations', 0))
 
-                # Guardar en BD solo las primeras 6 galerías
+                # Las primeras 6 galerías se guardan en BD al final, junto con la 7
                 if galeria_num <= 6:
-                    try:
-                        nueva_ejecucion = Ejecucion(
-                            comuna=galeria_num,  
-                            tam_lote_m2=user_inputs['g_TamLot'],
-                            can_pri_unidades=user_inputs['b_CanPri'],
-                            can_sec_unidades=user_inputs['b_CanSec'],
-
-                            peso_bs=weights[1],
-                            peso_be=weights[0],
-                            peso_mun=weights[2],
-
-                            poblacion_inicial=population_size,
-                            generaciones=max_generations,
-                            tasa_mutacion=mutation_rate,
-                            porcentaje_elite=elite_percentage,
-                            fuerza_sigma=sigma_factor,
-                            tasa_cruzamiento=crossover_rate,
-
-                            mejor_fitness=best_fitness,
-                            inv_inicial_usd=best_metrics.get('i_InvIni', 0.0),
-                            roi=best_metrics.get('u_ROIGal', 0.0),
-                            utilidad_neta_usd=best_metrics.get('u_UtNeGa', 0.0),
-                            margen_utilidad=best_metrics.get('u_MarUtN', 0.0),
-                            empleos_directos=best_metrics.get('x_Empleo', 0.0),
-                            beneficio_social=best_metrics.get('u_BenSoc', 0.0),
-                            cromosoma_optimo=best_chromosome,
-
-                            locales_12 = int(best_metrics.get('l_CLTi12', 0) or 0),
-                            locales_16 = int(best_metrics.get('l_CLTi16', 0) or 0),
-                            locales_20 = int(best_metrics.get('l_CLTi20', 0) or 0),
-                            locales_25 = int(best_metrics.get('l_CLTi25', 0) or 0),
-
-                            run_id=run_id,
-                            user_key = user_key  
-                        )
-                        db.session.add(nueva_ejecucion)
-                        db.session.commit()
-                        try:
-                            det = EjecucionDetalle(
-                                ejecucion_id=nueva_ejecucion.id,
-                                inv_total=best_metrics.get('i_InvIni'),
-                                inv_loc=best_metrics.get('l_CTCLo'),
-                                inv_parq=best_metrics.get('p_SCTPar'),
-                                inv_zonas=best_metrics.get('z_CTZcAv'),
-                                ing_total=best_metrics.get('u_IngGal'),
-                                ing_arr=best_metrics.get('a_ToArGa'),
-                                ing_adm=best_metrics.get('d_ToAdGa'),
-                                ing_parq=best_metrics.get('q_ToPaGa'),
-                                egr_total=best_metrics.get('u_EgrGal'),
-                                egr_mant=best_metrics.get('m_ToEgGa'),
-                                egr_servpub=best_metrics.get('s_CoToEA') and best_metrics.get('s_ToSPGa') or best_metrics.get('s_ToSPGa'),
-                                egr_salarios=best_metrics.get('o_ToSaGa'),
-                                egr_operativos=best_metrics.get('v_ToSOGa'),
-                                egr_admin=best_metrics.get('n_ToGAGa'),
-                                egr_legales=best_metrics.get('t_ToRMGa'),
-                                egr_impuestos=best_metrics.get('u_ImpGas'),
-                                bs_accesibilidad=best_metrics.get('e_Accesi', None),
-                                bs_emp_dir=best_metrics.get('w_STEmDi'),
-                                bs_emp_ind=best_metrics.get('x_STEmIn'),
-                                bs_calidad_vida=best_metrics.get('k_CalVid', None),
-                                ar_alimentos_frescos=best_metrics.get('y_CLoAlF'),
-                                ar_comidas_preparadas=best_metrics.get('y_CLoCoP'),
-                                ar_no_alimentarios=best_metrics.get('y_CLoNAl'),
-                                ar_complementarios=best_metrics.get('y_CLoSeC'),
-                            )
-                            db.session.add(det)
-                            db.session.commit()
-                        except Exception as det_e:
-                            db.session.rollback()
-                            logs.append(f"[WARN] No se pudo guardar detalle de la Galería {galeria_num}: {det_e}")
-                        logs.append(f"GALERIA_{galeria_num}_ROI:{best_metrics.get('u_ROIGal', 0):.2f}")
-                        logs.append(f"GALERIA_{galeria_num}_COMPLETADA (run_id={run_id})")
-                    except Exception as db_e:
-                        db.session.rollback()
-                        logs.append(f"Error al guardar Galeria {galeria_num}: {str(db_e)}")
-                
-                app.config['EXECUTION_LOGS'][nskey] = logs
-            
+                    por_guardar[galeria_num] = (
+                        _fila_ejecucion(galeria_num, user_inputs, result, weights, ga_params,
+                                        run_id, user_key, info),
+                        best_metrics)
+                terminar_galeria(galeria_num, best_metrics, best_fitness, info)
+
+
+            def ejecutar_en_hilo(galeria_num, user_inputs, constants, plazo=None):
+                info = {}
+                opciones_checkpoint = None
+                if checkpoints:
+                    opciones_checkpoint = {
+                        'checkpoint': _cargar_checkpoint(run_id, user_key, galeria_num),
+                        'checkpoint_every': app.config.get('GA_CHECKPOINT_EVERY', 0),
+                        'on_checkpoint': guardar_checkpoint(galeria_num),
+                    }
+                result = run_genetic_algorithm(
+                    app,
+                    f"{thread_id}_galeria_{galeria_num}",
+                    user_inputs,
+                    constants,
+                    population_size,
+                    max_generations,
+                    elite_percentage,
+                    mutation_rate,
+                    sigma_factor,
+                    crossover_rate,
+                    weights,
+                    None,
+                    user_key,
+                    engine=engine,
+                    deadline=plazo,
+                    info=info,
+                    checkpoint_opts=opciones_checkpoint,
+                    cancel=cancel,
+                    on_event=progreso(galeria_num)
+                )
+                return result, info
+
+            # Galerías con el mismo problema (la comuna no interviene en las métricas)
+            # se optimizan una sola vez y el resultado se reparte a cada una
+            grupos = plan_jobs(pendientes)
+            entradas = {num: (user_inputs, constants) for num, user_inputs, constants in pendientes}
+            if len(grupos) < len(pendientes):
+                say.info("%d galerías a procesar, %d problemas distintos a optimizar", len(pendientes), len(grupos))
+
+            def registrar_grupo(galeria_num, result, info=None):
+                for otra_num in grupos[galeria_num]:
+                    user_inputs, constants = entradas[otra_num]
+                    if otra_num == galeria_num:
+                        registrar_resultado(otra_num, user_inputs, constants, result, info)
+                        continue
+                    say.info("Galeria %s: mismo problema que la Galeria %s, se reutiliza su resultado", otra_num, galeria_num)
+                    copia = _copiar_resultado(result)
+                    if copia is not None:
+                        otra_nskey = _ns(user_key, f"{thread_id}_galeria_{otra_num}")
+                        run_store.reset_log(otra_nskey, [
+                            f"Resultado reutilizado de la Galeria {galeria_num} (mismo tamaño de lote y cantidades)"
+                        ])
+                        _almacenar_resultado_ga(app, otra_nskey, copia)
+                    registrar_resultado(otra_num, user_inputs, constants, copia, info)
+
+            workers = resolve_workers(app.config.get('GA_WORKERS', 0), SYNC_MODE, len(grupos))
+            if checkpoints and workers > 1:
+                # Los checkpoints se escriben desde el hilo de la corrida
+                say.info("Corrida reanudable: las galerías se procesan de forma secuencial")
+                workers = 1
+            if workers > 1 and len(grupos) > 1:
+                # Las galerías son independientes: se despachan al pool de procesos y
+                # se registran a medida que terminan
+                presupuesto = time_slice(deadline, len(grupos), workers)
+                jobs = []
+                for galeria_num in grupos:
+                    user_inputs, constants = entradas[galeria_num]
+                    run_store.emit(nskey, GALLERY_STARTED, gallery=galeria_num, max_generations=max_generations)
+                    sub_thread = f"{thread_id}_galeria_{galeria_num}"
+                    _iniciar_logs_ga(app, _ns(user_key, sub_thread), sub_thread, user_inputs, None)
+                    jobs.append({
+                        'key': galeria_num,
+                        'engine': engine,
+                        'time_budget': presupuesto,
+                        'kwargs': {
+                            'user_inputs': user_inputs,
+                            'constants': constants,
+                            'weights': weights,
+                            'deadline': deadline,
+                            **ga_params,
+                            **_opciones_motor(app, engine, en_pool=True, con_plazo=deadline is not None),
+                        },
+                    })
+                say.info("Ejecutando %d galerías en paralelo con %d procesos", len(jobs), workers)
+                if presupuesto is not None:
+                    say.info("Presupuesto de tiempo: %.1f s por galería", presupuesto)
+
+                def on_log(galeria_num, line):
+                    run_store.log(_ns(user_key, f"{thread_id}_galeria_{galeria_num}")).append(line)
+
+                def on_result(galeria_num, result, info):
+                    user_inputs, constants = entradas[galeria_num]
+                    if cancel.is_set():
+                        return
+                    if isinstance(result, Exception):
+                        # El proceso falló (p. ej. murió un proceso del pool): reintentar en este hilo
+                        logs.append(f"[WARN] Falló el proceso de la Galeria {galeria_num} ({result}); se reintenta en el hilo actual")
+                        result, info = ejecutar_en_hilo(galeria_num, user_inputs, constants, deadline)
+                    else:
+                        _almacenar_resultado_ga(app, _ns(user_key, f"{thread_id}_galeria_{galeria_num}"), result)
+                    registrar_grupo(galeria_num, result, info)
+
+                def on_event(galeria_num, kind, data):
+                    progreso(galeria_num)(kind, data)
+
+                run_ga_jobs(jobs, workers, on_log=on_log, on_result=on_result, cancel=cancel,
+                            on_event=on_event, pool_workers=app.config.get('GA_WORKERS', 0))
+                if cancel.is_set():
+                    return cancelar()
+            else:
+                for posicion, galeria_num in enumerate(grupos):
+                    user_inputs, constants = entradas[galeria_num]
+                    if cancel.is_set():
+                        return cancelar()
+                    if checkpoints and deadline is not None and time.time() >= deadline:
+                        return pausar(galeria_num)
+                    run_store.emit(nskey, GALLERY_STARTED, gallery=galeria_num, max_generations=max_generations)
+                    if checkpoints:
+                        # Reanudable: cada galería corre completa y se pausa al llegar al plazo
+                        plazo = deadline
+                    else:
+                        # Con plazo global, cada galería recibe su parte del tiempo que queda
+                        presupuesto = time_slice(deadline, len(grupos) - posicion)
+                        plazo = None
+                        if presupuesto is not None:
+                            plazo = time.time() + presupuesto
+                            say.info("Presupuesto de tiempo: %.1f s", presupuesto)
+
+                    # EJECUTAR GA
+                    result, info = ejecutar_en_hilo(galeria_num, user_inputs, constants, plazo)
+                    if info.get('stop_reason') == STOP_PAUSED:
+                        return pausar(galeria_num)
+                    if info.get('stop_reason') == STOP_CANCELLED:
+                        return cancelar()
+                    registrar_grupo(galeria_num, result, info)
+
             # Después de procesar las 6 galerías, encontrar la mejor
             mejores_roi = []
             for i in range(1, 7):
@@ -633,16 +1301,15 @@ def procesar_todas_galerias(app, thread_id, galerias_a_procesar,
                 # Selección de comuna óptima
                 mejor_par = max(mejores_roi, key=lambda x: x[1])
                 mejor_comuna = mejor_par[0]
-                logs.append(f"Mejor comuna encontrada: {mejor_comuna} con ROI: {mejor_par[1]:.2f}%")
+                run_store.emit(nskey, BEST_COMMUNE, comuna=mejor_comuna, roi=float(mejor_par[1] or 0))
                 
                 galeria_7 = resultados_galerias.get(7)
                 if galeria_7 is None:
                     # Si no se había calculado (no debería ocurrir), crear desde la configuración original
                     g7_cfg = next((g for g in galerias_a_procesar if g['numero'] == 7), None)
                     if g7_cfg is None:
-                        logs.append("No se encontró configuración para la Galería 7.")
-                        app.config['EXECUTION_LOGS'][nskey] = logs
-                        return
+                        run_store.emit(nskey, RUN_FAILED, error="No se encontró configuración para la Galería 7.")
+                        return True
                     galeria_7 = {
                         'user_inputs': {
                             'g_TamLot': g7_cfg['tam_lote'],
@@ -660,24 +1327,54 @@ def procesar_todas_galerias(app, thread_id, galerias_a_procesar,
                     galeria_7['user_inputs']['comuna'] = mejor_comuna
                     galeria_7['best_metrics']['comuna'] = mejor_comuna
 
-                logs.append(f"Optimizando Galeria 7 para la Comuna {mejor_comuna}...")
-                app.config['EXECUTION_LOGS'][nskey] = logs
-
-                result_final_7 = run_genetic_algorithm(
-                    app,
-                    f"{thread_id}_galeria_7_final",
-                    galeria_7['user_inputs'],
-                    galeria_7['constants'],
-                    population_size,
-                    max_generations,
-                    elite_percentage,
-                    mutation_rate,
-                    sigma_factor,
-                    crossover_rate,
-                    weights,
-                    None,
-                    user_key
-                )
+                if 'best_chromosome' in galeria_7:
+                    # La Galería 7 ya se optimizó en esta corrida y la comuna no cambia el
+                    # problema: volver a correr el GA solo daría otra muestra del mismo óptimo
+                    say.info("Galeria 7 para la Comuna %s: se reutiliza la optimización de esta corrida", mejor_comuna)
+                    result_final_7 = (galeria_7['best_chromosome'], galeria_7['best_metrics'], galeria_7['best_fitness'])
+                    info_7 = galeria_7.get('info', {})
+                else:
+                    if cancel.is_set():
+                        return cancelar()
+                    say.info("Optimizando Galeria 7 para la Comuna %s...", mejor_comuna)
+                    run_store.emit(nskey, GALLERY_STARTED, gallery=7, max_generations=max_generations)
+
+                    info_7 = {}
+                    opciones_checkpoint = None
+                    if checkpoints:
+                        opciones_checkpoint = {
+                            'checkpoint': _cargar_checkpoint(run_id, user_key, 7),
+                            'checkpoint_every': app.config.get('GA_CHECKPOINT_EVERY', 0),
+                            'on_checkpoint': guardar_checkpoint(7),
+                        }
+                    result_final_7 = run_genetic_algorithm(
+                        app,
+                        f"{thread_id}_galeria_7_final",
+                        galeria_7['user_inputs'],
+                        galeria_7['constants'],
+                        population_size,
+                        max_generations,
+                        elite_percentage,
+                        mutation_rate,
+                        sigma_factor,
+                        crossover_rate,
+                        weights,
+                        None,
+                        user_key,
+                        engine=engine,
+                        deadline=deadline,
+                        info=info_7,
+                        checkpoint_opts=opciones_checkpoint,
+                        cancel=cancel,
+                        on_event=progreso(7)
+                    )
+                    if info_7.get('stop_reason') == STOP_PAUSED:
+                        return pausar(7)
+                    if info_7.get('stop_reason') == STOP_CANCELLED:
+                        return cancelar()
+                    if result_final_7 is not None:
+                        galeria_7['best_chromosome'], galeria_7['best_metrics'], galeria_7['best_fitness'] = result_final_7
+                        terminar_galeria(7, result_final_7[1], result_final_7[2], info_7)
 
                 if result_final_7 is None:
                     logs.append("Error: run_genetic_algorithm retornó None para Galeria 7 (final). Se usarán valores por defecto.")
@@ -686,89 +1383,16 @@ def procesar_todas_galerias(app, thread_id, galerias_a_procesar,
                     best_fitness_7 = 0.0
                 else:
                     best_chromosome_7, best_metrics_7, best_fitness_7 = result_final_7
-                # GUARDAR EN BD LA GALERÍA 7
-                try:
-                    ejec_7 = Ejecucion(
-                        comuna=7,  # Identidad de "galería nueva"
-                        tam_lote_m2=galeria_7['user_inputs']['g_TamLot'],
-                        can_pri_unidades=galeria_7['user_inputs']['b_CanPri'],
-                        can_sec_unidades=galeria_7['user_inputs']['b_CanSec'],
-
-                        peso_bs=weights[1],
-                        peso_be=weights[0],
-                        peso_mun=weights[2],
-
-                        poblacion_inicial=population_size,
-                        generaciones=max_generations,
-                        tasa_mutacion=mutation_rate,
-                        porcentaje_elite=elite_percentage,
-                        fuerza_sigma=sigma_factor,
-                        tasa_cruzamiento=crossover_rate,
-
-                        mejor_fitness=best_fitness_7,
-                        inv_inicial_usd=best_metrics_7.get('i_InvIni', 0.0),
-                        roi=best_metrics_7.get('u_ROIGal', 0.0),
-                        utilidad_neta_usd=best_metrics_7.get('u_UtNeGa', 0.0),
-                        margen_utilidad=best_metrics_7.get('u_MarUtN', 0.0),
-                        empleos_directos=best_metrics_7.get('x_Empleo', 0.0),
-                        beneficio_social=best_metrics_7.get('u_BenSoc', 0.0),
-                        cromosoma_optimo=best_chromosome_7,
-                        
-                        locales_12 = int(best_metrics_7.get('l_CLTi12', 0) or 0),
-                        locales_16 = int(best_metrics_7.get('l_CLTi16', 0) or 0),
-                        locales_20 = int(best_metrics_7.get('l_CLTi20', 0) or 0),
-                        locales_25 = int(best_metrics_7.get('l_CLTi25', 0) or 0),
-
-                        user_key = user_key,
-                        run_id=run_id
-                    )
-                    db.session.add(ejec_7)
-                    db.session.commit()
-                    
-                    try:
-                        det7 = EjecucionDetalle(
-                            ejecucion_id=ejec_7.id,
-                            inv_total=best_metrics_7.get('i_InvIni'),
-                            inv_loc=best_metrics_7.get('l_CTCLo'),
-                            inv_parq=best_metrics_7.get('p_SCTPar'),
-                            inv_zonas=best_metrics_7.get('z_CTZcAv'),
-                            ing_total=best_metrics_7.get('u_IngGal'),
-                            ing_arr=best_metrics_7.get('a_ToArGa'),
-                            ing_adm=best_metrics_7.get('d_ToAdGa'),
-                            ing_parq=best_metrics_7.get('q_ToPaGa'),
-                            egr_total=best_metrics_7.get('u_EgrGal'),
-                            egr_mant=best_metrics_7.get('m_ToEgGa'),
-                            egr_servpub=best_metrics_7.get('s_ToSPGa'),
-                            egr_salarios=best_metrics_7.get('o_ToSaGa'),
-                            egr_operativos=best_metrics_7.get('v_ToSOGa'),
-                            egr_admin=best_metrics_7.get('n_ToGAGa'),
-                            egr_legales=best_metrics_7.get('t_ToRMGa'),
-                            egr_impuestos=best_metrics_7.get('u_ImpGas'),
-                            bs_accesibilidad=best_metrics_7.get('e_Accesi', None),
-                            bs_emp_dir=best_metrics_7.get('w_STEmDi'),
-                            bs_emp_ind=best_metrics_7.get('x_STEmIn'),
-                            bs_calidad_vida=best_metrics_7.get('k_CalVid', None),
-                            ar_alimentos_frescos=best_metrics_7.get('y_CLoAlF'),
-                            ar_comidas_preparadas=best_metrics_7.get('y_CLoCoP'),
-                            ar_no_alimentarios=best_metrics_7.get('y_CLoNAl'),
-                            ar_complementarios=best_metrics_7.get('y_CLoSeC'),
-                        )
-                        db.session.add(det7)
-                        db.session.commit()
-                    except Exception as det_e:
-                        db.session.rollback()
-                        logs.append(f"[WARN] No se pudo guardar detalle de la Galería 7: {det_e}")
-
-                    logs.append(f"GALERIA_7_GUARDADA (comuna óptima {mejor_comuna}) ROI:{best_metrics_7.get('u_ROIGal', 0):.2f} (run_id={run_id})")
-                except Exception as e:
-                    db.session.rollback()
-                    logs.append(f"Error al guardar Galeria 7: {str(e)}")
-
-                # Almacenar resultados finales para UI
-                if 'RESULTS' not in app.config:
-                    app.config['RESULTS'] = {}
-                
-                app.config['RESULTS'][nskey] = {
+                # GUARDAR EN BD las galerías, la 7 (si la corrida se retoma ya terminada,
+                # ya está guardada) y el resumen, en una transacción: si falla no queda
+                # nada a medias y la corrida termina con error
+                if not galeria_7.get('guardada'):
+                    por_guardar[7] = (
+                        _fila_ejecucion(7, galeria_7['user_inputs'],  # Identidad de "galería nueva"
+                                        (best_chromosome_7, best_metrics_7, best_fitness_7),
+                                        weights, ga_params, run_id, user_key, info_7),
+                        best_metrics_7)
+                resultado_ui = {
                     'best_chromosome': galeria_7.get('best_chromosome'),
                     'best_metrics': galeria_7.get('best_metrics'),
                     'best_fitness': galeria_7.get('best_fitness'),
@@ -776,56 +1400,309 @@ def procesar_todas_galerias(app, thread_id, galerias_a_procesar,
                     'resultados_galerias': resultados_galerias,
                     'run_id': run_id
                 }
-                
-                logs.append("PROCESAMIENTO COMPLETADO")
 
-                try:
-                    guardar_resumen_run(run_id, user_key)
-                    logs.append(f"[OK] Resumen guardado para run_id={run_id}")
-                except Exception as e:
-                    db.session.rollback()
-                    logs.append(f"[WARN] No se pudo guardar el resumen del run: {e}")
-                app.config['EXECUTION_LOGS'][nskey] = logs
+                def al_guardar():
+                    if 7 in por_guardar:
+                        say.info("GALERIA_7_GUARDADA (comuna óptima %s) ROI:%.2f (run_id=%s)",
+                                 mejor_comuna, best_metrics_7.get('u_ROIGal', 0), run_id)
+                    say.info("[OK] %d galerías y resumen guardados para run_id=%s", len(por_guardar), run_id)
+                    # Almacenar resultados finales para UI; con RUN_FINISHED el cliente
+                    # pasa a /resultados, así que va después de guardar todo en BD
+                    run_store.set_result(nskey, resultado_ui)
+                    run_store.emit(nskey, RUN_FINISHED, run_id=run_id)
+
+                def al_fallar(e):
+                    run_store.emit(nskey, RUN_FAILED, error=f"No se pudieron guardar los resultados: {e}")
+                    run_store.set_result(nskey, {'error': f"Error al guardar la corrida: {e}", 'run_id': run_id})
+
+                def en_journal(e):
+                    logs.append(f"[WARN] La BD no responde ({e}); los resultados se guardarán al reconectar")
+
+                # El resumen se calcula una sola vez, de los resultados en memoria
+                resultados_resumen = {n: (r['best_metrics'], r['best_fitness'])
+                                      for n, r in resultados_galerias.items() if n <= 6}
+                resultados_resumen[7] = (best_metrics_7, best_fitness_7)
+                _persistir({'tipo': 'corrida', 'run_id': run_id, 'user_key': user_key,
+                            'galerias': list(por_guardar.values()),
+                            'resumen': _fila_resumen(run_id, user_key, resultados_resumen),
+                            'checkpoints': checkpoints},
+                           on_done=al_guardar, on_error=al_fallar, on_spill=en_journal)
+            else:
+                run_store.emit(nskey, RUN_FAILED, error="Ninguna de las galerías 1 a 6 obtuvo resultado.")
 
         except Exception as e:
             error_msg = f"Error en el procesamiento: {str(e)}"
-            logs.append(error_msg)
+            run_store.emit(nskey, RUN_FAILED, error=str(e))
             traceback_str = traceback.format_exc()
             logs.append(traceback_str)
             
-            if 'RESULTS' not in app.config:
-                app.config['RESULTS'] = {}
-                
-            app.config['RESULTS'][nskey] = {
+            run_store.set_result(nskey, {
                 'error': error_msg,
                 'traceback': traceback_str,
                 'run_id': run_id
-            }
-            
-            app.config['EXECUTION_LOGS'][nskey] = logs
+            })
+        return True
+
+@app.route('/api/continuar/<run_id>', methods=['POST'])
+def continuar_corrida(run_id):
+    """
+    Continúa una corrida reanudable desde sus checkpoints (ver GA_CHECKPOINTS).
+
+    En SYNC_MODE procesa un tramo más dentro de la petición (hasta SYNC_TIME_BUDGET)
+    y responde si la corrida terminó; en modo asíncrono la retoma en un hilo, p. ej.
+    tras reiniciar el proceso.
+    """
+    uk = get_or_create_user_key()
+    corrida = CheckpointRun.query.filter_by(user_key=uk, run_id=run_id).first()
+    if corrida is None:
+        return jsonify({
+            "status": "error",
+            "message": "No hay una corrida reanudable con ese run_id."
+        }), 404
+
+    thread_id = corrida.thread_id
+    session['thread_id'] = thread_id
+    session['last_run_id'] = run_id
+    if corrida.terminada:
+        return jsonify({"status": "ok", "thread_id": thread_id, "run_id": run_id, "completed": True})
+
+    parametros = corrida.parametros
+    ga_params = parametros['ga_params']
+    args = (app, thread_id, parametros['galerias'],
+            ga_params['population_size'], ga_params['max_generations'],
+            ga_params['elite_percentage'], ga_params['mutation_rate'],
+            ga_params['sigma_factor'], ga_params['crossover_rate'],
+            tuple(parametros['weights']), run_id, uk, parametros['engine'])
+
+    nskey = _ns(uk, thread_id)
+    # El presupuesto por hora se descontó al iniciar la corrida; sus tramos no lo vuelven a cobrar
+    run_store.log(nskey)
+
+    if SYNC_MODE:
+        try:
+            completada = procesar_todas_galerias(
+                *args, deadline=time.time() + app.config['SYNC_TIME_BUDGET'])
+        except Exception as e:
+            run_store.emit(nskey, RUN_FAILED, error=str(e))
+            return jsonify({
+                "status": "error",
+                "message": "Error al continuar la corrida (modo síncrono)."
+            }), 500
+        respuesta = {"status": "ok", "thread_id": thread_id, "run_id": run_id, "completed": completada}
+        if not completada:
+            respuesta["continue"] = url_for('continuar_corrida', run_id=run_id)
+        return jsonify(respuesta)
+
+    run_store.emit(nskey, RUN_QUEUED, record=False, run_id=run_id)
+    try:
+        job_queue.submit(nskey, procesar_todas_galerias, *args, run_id=run_id, user_key=uk)
+    except QueueFullError as e:
+        run_store.emit(nskey, RUN_PAUSED, record=False, run_id=run_id)
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "retry_after": e.retry_after
+        }), 429, {'Retry-After': str(e.retry_after)}
+    return jsonify({"status": "ok", "thread_id": thread_id, "run_id": run_id, "completed": False})
+
+@app.route('/api/cancelar/<ident>', methods=['POST'])
+def cancelar_corrida(ident):
+    """
+    Cancela una corrida del usuario por thread_id o run_id.
+
+    Si espera en la cola se descarta; si se está ejecutando se detiene en la
+    siguiente generación del GA y no guarda más galerías.
+    """
+    uk = get_or_create_user_key()
+    canceladas = cancelar_corridas(uk, ident)
+    if not canceladas:
+        return jsonify({
+            "status": "error",
+            "message": "No hay una corrida en curso con ese identificador."
+        }), 404
+    return jsonify({"status": "ok", "cancelled": canceladas})
 
 @app.route('/ejecucion')
 def ejecucion():
     thread_id = request.args.get('thread_id', session.get('thread_id', ''))
     return render_template('ejecucion.html', thread_id=thread_id)
 
+# Estados en los que la corrida ya no produce más logs
+ESTADOS_FINALES = FINISHED_STATES + (STATE_PAUSED,)
+
+
+def _estado_corrida(nskey):
+    """
+    Estado de una corrida para la UI, según los eventos que emitió
+    (`utils.progress.next_state`) y, si se ejecuta en este proceso, su trabajo
+    en la cola.
+
+    Returns:
+        tuple: (estado, hay_resultados).
+    """
+    has_results = run_store.has_result(nskey)
+    status = run_store.state(nskey)
+    job = job_queue.get(nskey)
+    if job is not None and (job.state == JOB_QUEUED or
+                            (job.state in (JOB_FAILED, JOB_CANCELLED) and status not in ESTADOS_FINALES)):
+        # Aún no empieza, o el trabajo terminó sin llegar a emitir el fin de la corrida
+        status = job.state
+    elif status is None:
+        # Ejecución suelta del GA (sin eventos de corrida): basta con su resultado
+        status = JOB_DONE if has_results else JOB_RUNNING
+    return status, has_results
+
+
 @app.route('/api/logs/<thread_id>')
 def get_logs(thread_id):
+    """
+    Logs y estado de una corrida.
+
+    Con `?since=<n>` devuelve solo las líneas a partir de la n-ésima escrita (el
+    `total` de la respuesta anterior); sin él, todas las que se conservan.
+    `offset` es el índice de la primera línea devuelta (los logs en memoria
+    conservan solo las últimas RUN_LOG_MAX_LINES). Los eventos de progreso se
+    devuelven como texto, o como objetos con `?format=events`.
+    """
     uk = get_or_create_user_key()
     nskey = _ns(uk, thread_id)
-    logs = app.config.get('EXECUTION_LOGS', {}).get(nskey, [])
-    
-    # Verificar si hay resultados disponibles
-    has_results = 'RESULTS' in app.config and nskey in app.config['RESULTS']
-    
-    # Determinar el estado
-    status = "ejecutando"
-    if has_results:
-        status = "completado"
-    elif any("MEJOR SOLUCIoN ENCONTRADA" in log for log in logs):
-        status = "completado"
-    
-    return jsonify({"logs": logs, "status": status, "has_results": has_results})
+    since = request.args.get('since', type=int)
+    as_events = request.args.get('format') == 'events'
+    run_log = run_store.get_log(nskey)
+    logs, offset, total = [], 0, 0
+    if run_log is not None:
+        logs, offset, total = run_log.since(since or 0)
+        if as_events:
+            logs = [line.to_dict() if isinstance(line, Event) else {'kind': 'text', 'text': line}
+                    for line in logs]
+        else:
+            logs = [render(line) for line in logs]
+
+    status, has_results = _estado_corrida(nskey)
+    return jsonify({
+        "logs": logs,
+        "offset": offset,
+        "total": total,
+        "status": status,
+        "has_results": has_results,
+        "queue_position": job_queue.position(nskey),
+        "progress": run_store.get_progress(nskey)[1],
+    })
+
+
+def _evento_sse(event, data, event_id=None):
+    mensaje = f"event: {event}\n"
+    if event_id is not None:
+        mensaje += f"id: {event_id}\n"
+    return mensaje + f"data: {json.dumps(data)}\n\n"
+
+
+# Conexiones abiertas a /api/stream en este proceso (ver SSE_MAX_CONNECTIONS)
+_conexiones_sse = 0
+_conexiones_sse_lock = threading.Lock()
+
+def _abrir_conexion_sse():
+    """Reserva una conexión de flujo; False si ya hay SSE_MAX_CONNECTIONS."""
+    global _conexiones_sse
+    with _conexiones_sse_lock:
+        if _conexiones_sse >= app.config['SSE_MAX_CONNECTIONS']:
+            return False
+        _conexiones_sse += 1
+        return True
+
+def _cerrar_conexion_sse():
+    global _conexiones_sse
+    with _conexiones_sse_lock:
+        _conexiones_sse = max(0, _conexiones_sse - 1)
+
+@app.route('/api/stream/<thread_id>')
+def stream_corrida(thread_id):
+    """
+    Progreso de una corrida como Server-Sent Events.
+
+    Eventos:
+      - log: {"logs", "offset", "total"} con las líneas nuevas; su id es `total`,
+        así que al reconectar el navegador retoma desde ahí (Last-Event-ID).
+      - progress: {"galerias": {n: {generation, max_generations, best_fitness,
+        done, roi}}} cuando cambia el avance de alguna galería.
+      - status: {"status", "has_results", "queue_position"} cuando cambia; el
+        flujo se cierra al llegar a un estado final.
+
+    Cada conexión dura a lo sumo SSE_MAX_SECONDS; el cliente reconecta solo.
+    Con SSE_MAX_CONNECTIONS conexiones abiertas en el proceso responde 503 y el
+    cliente consulta /api/logs (polling) en su lugar.
+    """
+    uk = get_or_create_user_key()
+    nskey = _ns(uk, thread_id)
+    if not _abrir_conexion_sse():
+        return jsonify({
+            "status": "error",
+            "message": "Demasiados flujos de progreso abiertos; consulte /api/logs.",
+            "poll": url_for('get_logs', thread_id=thread_id),
+        }), 503, {'Retry-After': str(app.config['SSE_MAX_SECONDS'])}
+    # Al reconectar, el navegador envía el id del último evento recibido
+    cursor = request.headers.get('Last-Event-ID', request.args.get('since', 0))
+    try:
+        cursor = int(cursor)
+    except (TypeError, ValueError):
+        cursor = 0
+    intervalo = app.config['SSE_INTERVAL']
+    limite = time.time() + app.config['SSE_MAX_SECONDS']
+
+    def eventos():
+        nonlocal cursor
+        version = None
+        ultimo_estado = None
+        ultimo_envio = time.time()
+        yield "retry: 2000\n\n"
+        while True:
+            enviados = []
+            # El estado primero: si ya es final, las líneas que siguen incluyen la última
+            status, has_results = _estado_corrida(nskey)
+            run_log = run_store.get_log(nskey)
+            if run_log is not None:
+                lineas, offset, total = run_log.since(cursor)
+                if lineas:
+                    cursor = total
+                    lineas = [render(linea) for linea in lineas]
+                    enviados.append(_evento_sse('log', {'logs': lineas, 'offset': offset, 'total': total}, total))
+
+            nueva_version, progreso = run_store.get_progress(nskey)
+            if nueva_version != version:
+                version = nueva_version
+                enviados.append(_evento_sse('progress', {'galerias': progreso}))
+
+            estado = {'status': status, 'has_results': has_results,
+                      'queue_position': job_queue.position(nskey)}
+            if estado != ultimo_estado:
+                ultimo_estado = estado
+                enviados.append(_evento_sse('status', estado))
+
+            if enviados:
+                ultimo_envio = time.time()
+                yield ''.join(enviados)
+            elif time.time() - ultimo_envio >= SSE_HEARTBEAT:
+                # Comentario SSE para que proxies no cierren la conexión inactiva
+                ultimo_envio = time.time()
+                yield ": ping\n\n"
+
+            if status in ESTADOS_FINALES or time.time() >= limite:
+                return
+            if run_log is None:
+                time.sleep(intervalo)
+            else:
+                run_log.wait(cursor, intervalo)
+
+    respuesta = Response(stream_with_context(eventos()), mimetype='text/event-stream',
+                         headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Se libera al cerrar la respuesta (fin del flujo o desconexión del cliente)
+    respuesta.call_on_close(_cerrar_conexion_sse)
+    return respuesta
+
+# Columnas de Ejecucion que muestra /resultados
+_COLUMNAS_RESULTADOS = [Ejecucion.comuna, Ejecucion.roi, Ejecucion.utilidad_neta_usd, Ejecucion.inv_inicial_usd,
+                        Ejecucion.margen_utilidad, Ejecucion.mejor_fitness, Ejecucion.beneficio_social,
+                        Ejecucion.locales_12, Ejecucion.locales_16, Ejecucion.locales_20, Ejecucion.locales_25]
 
 @app.route('/resultados')
 def resultados():
@@ -858,8 +1735,10 @@ def resultados():
 
     uk = get_or_create_user_key()
 
-    # 1) Leer resultados persistidos (BD) por run_id
+    # 1) Leer resultados persistidos (BD) por run_id: solo las columnas que se
+    # muestran y sin sus detalles (el cromosoma se carga solo para la mejor fila)
     ejecuciones = (Ejecucion.query
+                   .options(load_only(*_COLUMNAS_RESULTADOS), noload(Ejecucion.detalles))
                    .filter_by(run_id=run_id, user_key=uk)
                    .order_by(Ejecucion.comuna.asc())
                    .all())
@@ -870,10 +1749,8 @@ def resultados():
 
     # 3) Progreso en vivo (logs) mientras corre
     logs = []
-    if thread_id and 'EXECUTION_LOGS' in app.config:
-        uk = get_or_create_user_key()
-        nskey = _ns(uk, thread_id)
-        logs = app.config['EXECUTION_LOGS'].get(nskey, [])
+    if thread_id:
+        logs = run_store.lines(_ns(uk, thread_id))
 
     # 4) KPIs de la mejor solución (desde BD, mejor ROI del run_id)
     resumen_worker = None
@@ -923,12 +1800,10 @@ def resultados():
         totales_locales["l20"] += fila["l20"]
         totales_locales["l25"] += fila["l25"]
 
-    if completa:
-        try:
-            guardar_resumen_run(run_id, uk)
-        except Exception as e:
-            current_app.logger.warning(f"No se pudo guardar resumen_run: {e}")
+    # Solo lectura: el resumen se guarda al terminar la corrida (ver _insertar_corrida)
     resumen_run = ResumenRun.query.filter_by(user_key=uk, run_id=run_id).first()
+    pausada = (not completa and CheckpointRun.query
+               .filter_by(user_key=uk, run_id=run_id, terminada=False).first() is not None)
     # 6) Render al template
     return render_template(
         'resultados.html',
@@ -942,358 +1817,168 @@ def resultados():
         mejor_roi=mejor_roi,
         resumen_run=resumen_run,
         locales_rows=locales_rows,
-        totales_locales=totales_locales
+        totales_locales=totales_locales,
+        pausada=pausada
     )
 
+def _iniciar_logs_ga(app, nskey, thread_id, user_inputs, galerias_existentes):
+    """
+    Escribe la cabecera de una ejecución del GA en sus logs. Se usa tanto en la
+    ejecución en el hilo actual como al despachar el trabajo al pool de procesos.
+    """
+    # Asegurate de que los logs existen
+    logs = run_store.log(nskey)
+    say = LevelLog(logs.append, app.config.get('GA_LOG_VERBOSITY', VERBOSITY_INFO))
+
+    # LOG INICIAL CRíTICO
+    say.info("=" * 60)
+    say.info("ALGORITMO GENÉTICO INICIADO")
+    say.info("=" * 60)
+
+    # Mostrar informacion de galerias existentes
+    say.info("ROI de galerias existentes:")
+    if galerias_existentes:
+        for galeria in galerias_existentes:
+            say.info("Galeria Comuna %s procesada - ROI: %.2f%%", galeria['comuna'], galeria.get('roi', 0))
+        mejor_galeria = max(galerias_existentes, key=lambda x: x.get('roi', 0))
+        say.info("Mejor ROI: Comuna %s", mejor_galeria['comuna'])
+    else:
+        # Para procesamiento individual
+        say.info("Procesamiento individual - sin galerias existentes para comparar")
+    say.info("=" * 60)
+
+    print(f"Logs iniciales configurados para thread {thread_id}")
+    return logs
+
+
 def run_genetic_algorithm(app, thread_id, user_inputs, constants, 
                          population_size, max_generations, elite_percentage,
                          mutation_rate, sigma_factor, crossover_rate, weights,
-                         galerias_existentes, user_key):
+                         galerias_existentes, user_key, engine=None, deadline=None, info=None,
+                         checkpoint_opts=None, cancel=None, on_event=None):
+    # `checkpoint_opts`: checkpoint, checkpoint_every y on_checkpoint de run_ga
+    # (solo motor generacional); con ellos el plazo pausa en lugar de cortar la corrida.
+    # `on_event(tipo, datos)` recibe los eventos de progreso del GA (utils.progress)
     with app.app_context():
         nskey = _ns(user_key, thread_id)
+        logs = _iniciar_logs_ga(app, nskey, thread_id, user_inputs, galerias_existentes)
+        if info is None:
+            info = {}
+
+        best_chromosome, best_metrics, best_fitness = get_engine(engine)(
+            user_inputs, constants, population_size, max_generations, elite_percentage,
+            mutation_rate, sigma_factor, crossover_rate, weights,
+            log=logs.append, deadline=deadline, info=info, cancel=cancel, on_event=on_event,
+            **(checkpoint_opts or {}),
+            **_opciones_motor(app, engine, con_plazo=deadline is not None and not checkpoint_opts)
+        )
+        if info.get('stop_reason') not in (STOP_PAUSED, STOP_CANCELLED):
+            _almacenar_resultado_ga(app, nskey, (best_chromosome, best_metrics, best_fitness))
 
-        # Asegurate de que el array de logs existe
-        if nskey not in app.config['EXECUTION_LOGS']:
-            app.config['EXECUTION_LOGS'][nskey] = []
-
-        logs = app.config['EXECUTION_LOGS'][nskey]
-
-        # LOG INICIAL CRíTICO
-        logs.append("=" * 60)
-        logs.append("ALGORITMO GENÉTICO INICIADO")
-        logs.append("=" * 60)
-        
-        # Inicializar valores por defecto para retorno
-        best_chromosome = None
-        best_metrics = {}
-        best_fitness = 0.0
-
-           # Mostrar informacion de galerias existentes
-        logs.append("ROI de galerias existentes:")
-        if galerias_existentes is not None:
-            for i, galeria in enumerate(galerias_existentes):
-                logs.append(f"Galeria Comuna {galeria['comuna']} procesada - ROI: {galeria.get('roi', 0):.2f}%")
-                app.config['EXECUTION_LOGS'][nskey] = logs
-                time.sleep(0.5)
-            
-            if galerias_existentes and len(galerias_existentes) > 0:
-                mejor_galeria = max(galerias_existentes, key=lambda x: x.get('roi', 0))
-                comuna_valor = mejor_galeria.get('comuna', 7)
-            else:
-                comuna_valor = user_inputs.get('comuna', 7)
-        else:
-            comuna_valor = user_inputs.get('comuna', 7)  # Para procesamiento individual
-            logs.append("Procesamiento individual - sin galerias existentes para comparar")
-
-        logs.append("=" * 60)
-
-        if galerias_existentes is not None:
-            for i, galeria in enumerate(galerias_existentes):
-                logs.append(f"Galeria Comuna {galeria['comuna']} procesada - ROI: {galeria.get('roi', 0):.2f}%")
-                app.config['EXECUTION_LOGS'][nskey] = logs
-                time.sleep(0.5)
-            
-            if galerias_existentes and len(galerias_existentes) > 0:
-                mejor_galeria = max(galerias_existentes, key=lambda x: x.get('roi', 0))
-                comuna_valor = mejor_galeria.get('comuna', 7)
-                logs.append(f"Mejor ROI: Comuna {mejor_galeria['comuna']}")
-            else:
-                comuna_valor = user_inputs.get('comuna', 7)
-        else:
-            comuna_valor = user_inputs.get('comuna', 7)  # Para procesamiento individual
-            logs.append("Procesamiento individual - sin galerias existentes para comparar")
-        logs.append("=" * 60)
-        
-        # ACTUALIZA INMEDIATAMENTE LOS LOGS
-        app.config['EXECUTION_LOGS'][nskey] = logs
-        print(f"Logs iniciales configurados para thread {thread_id}")
-
-        try:
-            # Combinar constantes globales con constantes especificas de esta ejecucion
-            from utils.genetic_algorithm import CONSTANTS as GLOBAL_CONSTANTS
-            full_constants = {**GLOBAL_CONSTANTS, **constants}
-
-            logs.append("Constantes combinadas correctamente")
-            app.config['EXECUTION_LOGS'][nskey] = logs
-
-             # Asegurarse de que todas las constantes necesarias esten presentes
-            required_constants = ['z_TaOfAd', 'z_TaBoAd', 'z_TaCaAd', 'z_TaBaCo']
-            for const in required_constants:
-                if const not in full_constants:
-                    logs.append(f"ADVERTENCIA: Constante {const} no encontrada, usando valor por defecto")
-                    # Establecer valores por defecto para constantes criticas
-                    if const == 'z_TaOfAd':
-                        full_constants[const] = 20
-                    elif const == 'z_TaBoAd':
-                        full_constants[const] = 20
-                    elif const == 'z_TaCaAd':
-                        full_constants[const] = 12
-                    elif const == 'z_TaBaCo':
-                        full_constants[const] = 68
-
-            app.config['EXECUTION_LOGS'][nskey] = logs
-            print(f" Constantes combinadas para thread {thread_id}")
-            
-            # Inicializar poblacion
-            population = create_initial_population(population_size, gene_definitions, user_inputs, full_constants)
-            
-            logs.append(f"Poblacion inicial creada con {len(population)} individuos")
-            app.config['EXECUTION_LOGS'][nskey] = logs
-
-            logs.append("Poblacion inicial generada:")
-            for i, chromosome in enumerate(population[:3]):
-                logs.append(f"Individuo {i+1}: {chromosome}")
-            logs.append("-" * 50)
-            
-            # Mostrar ejemplo de un cromosoma y sus metricas
-            sample_chromosome = population[0]
-            logs.append(f"Cromosoma de ejemplo: {sample_chromosome}")
-            
-            gallery_metrics = calculate_gallery_metrics(sample_chromosome, full_constants, GENE_INDEX_MAP)
-            
-            logs.append("Metricas calculadas para el cromosoma de ejemplo:")
-            logs.append(f"  Inversion Inicial (i_InvIni): {gallery_metrics.get('i_InvIni'):,.2f}")
-            logs.append(f"Ejemplo - ROI Porcentual: {gallery_metrics.get('u_ROIGal'):.2f}%")
-            logs.append(f"Ejemplo - Utilidad Neta: {gallery_metrics.get('u_UtNeGa'):,.2f}")
-            logs.append(f"Ejemplo - Empleo Generado: {gallery_metrics.get('x_Empleo')}")
-            logs.append(f"  Ingresos Galeria (u_IngGal): {gallery_metrics.get('u_IngGal'):,.2f}")
-            logs.append(f"  Egresos Galeria (u_EgrGal): {gallery_metrics.get('u_EgrGal'):,.2f}")
-            logs.append(f"  Utilidad Bruta (u_UtBrGa): {gallery_metrics.get('u_UtBrGa'):,.2f}")
-            logs.append(f"  Utilidad Neta (u_UtNeGa): {gallery_metrics.get('u_UtNeGa'):,.2f}")
-            logs.append(f"  Margen Utilidad Neta (u_MarUtN): {gallery_metrics.get('u_MarUtN'):.4f}")
-            logs.append(f"  ROI Porcentual (u_ROIGal): {gallery_metrics.get('u_ROIGal'):.4f}%")
-            logs.append(f"  Beneficio Social (u_BenSoc): {gallery_metrics.get('u_BenSoc'):.4f}")
-            logs.append(f"  Empleo Generado (x_Empleo): {gallery_metrics.get('x_Empleo')}")
-            logs.append(f"  Total Locales Comerciales (y_ToLoCo): {gallery_metrics.get('y_ToLoCo')}")
-            logs.append("-" * 50)
-            
-            # Calcular aptitud del cromosoma de ejemplo
-            fitness_score = calculate_fitness(gallery_metrics, weights)
-            logs.append(f"Puntuacion de Aptitud (Fitness) para el cromosoma de ejemplo: {fitness_score:.4f}")
-            logs.append("-" * 50)
-            
-            # Ejemplo de cruce
-            parent1 = random.choice(population)
-            parent2 = random.choice(population)
-            logs.append(f"Padre 1: {parent1}")
-            logs.append(f"Padre 2: {parent2}")
-            child = crossover_chromosomes(parent1, parent2, crossover_rate)
-            final_child = recalculate_dependent_genes(child, full_constants)
-            logs.append(f"Hijo despues del cruce: {final_child}")
-            
-            # Iniciar el algoritmo genetico principal
-            logs.append("Iniciando algoritmo genetico principal...")
-            
-            # Variables para seguimiento de estancamiento y mejora
-            best_fitness = -np.inf
-            stagnation_count = 0
-            improvement_count = 0
-            best_chromosome = None
-            best_metrics = None
-
-            for generation in range(1, max_generations + 1):
-                # Evaluar la aptitud de cada individuo en la poblacion
-                fitness_scores = []
-                all_metrics = []
-                for chromosome in population:
-                    metrics = calculate_gallery_metrics(chromosome, full_constants, GENE_INDEX_MAP)
-                    fitness = calculate_fitness(metrics, weights)
-                    fitness_scores.append(fitness)
-                    all_metrics.append(metrics)
-                
-                # Encontrar la mejor aptitud actual
-                current_best_fitness = max(fitness_scores)
-                current_best_index = fitness_scores.index(current_best_fitness)
-                
-                # Actualizar seguimiento de estancamiento y mejora
-                if current_best_fitness > best_fitness:
-                    improvement_count += 1
-                    stagnation_count = 0
-                    best_fitness = current_best_fitness
-                    best_chromosome = population[current_best_index].copy()
-                    best_metrics = all_metrics[current_best_index]
-                    logs.append(f"Nueva mejor fitness {best_fitness:.4f} en generacion {generation}")
-                else:
-                    stagnation_count += 1
-                    improvement_count = 0
-                
-                # Calcular diversidad
-                diversity = calculate_diversity(fitness_scores)
-                
-                # Seleccionar elites
-                elites = select_elites(population, fitness_scores, elite_percentage)
-                
-                # Verificar criterio de parada (aptitud promedio > 0.85 o maximo de generaciones)
-                average_fitness = np.mean(fitness_scores)
-                if average_fitness > 0.85 or generation == max_generations:
-                    logs.append(f"Criterio de parada alcanzado en la generacion {generation}.")
-                    logs.append(f"Mejor fitness: {best_fitness:.4f}, Fitness promedio: {average_fitness:.4f}")
-                    break
-                
-                # Ajustar parametros basandose en reglas heuristicas
-                params = {
-                    'mutation_rate': mutation_rate,
-                    'sigma_factor': sigma_factor,
-                    'elite_percentage': elite_percentage
-                }
-                new_params = adjust_parameters(params, diversity, stagnation_count, improvement_count)
-                mutation_rate = new_params['mutation_rate']
-                sigma_factor = new_params['sigma_factor']
-                elite_percentage = new_params['elite_percentage']
-                
-                # Crear nueva generacion
-                new_population = []
-                
-                # Agregar elites
-                new_population.extend(elites)
-                
-                # Agregar individuos aleatorios (5%)
-                num_random = int(0.05 * population_size)
-                while len(new_population) < len(elites) + num_random:
-                    random_individual = create_initial_population(1, gene_definitions, user_inputs, full_constants)[0]
-                    if random_individual not in new_population:
-                        new_population.append(random_individual)
-                
-                # Generar hijos mediante cruce y mutacion hasta completar la poblacion
-                while len(new_population) < population_size:
-                    # Seleccionar dos padres
-                    parent1 = select_parents(population, fitness_scores)
-                    parent2 = select_parents(population, fitness_scores)
-                    
-                    # Cruce
-                    child = crossover_chromosomes(parent1, parent2, crossover_rate)
-                    
-                    # Recalcular genes dependientes despues del cruce
-                    child = recalculate_dependent_genes(child, full_constants)
-                    
-                    # Mutacion
-                    child = mutate_chromosome(child, gene_definitions, mutation_rate, sigma_factor)
-                    
-                    # Recalcular genes dependientes despues de la mutacion
-                    child = recalculate_dependent_genes(child, full_constants)
-                    
-                    # Agregar hijo a la nueva poblacion
-                    new_population.append(child)
-                
-                # Reemplazar la poblacion antigua con la nueva
-                population = new_population
-                
-                # Imprimir progreso cada 10 generaciones
-                if generation % 10 == 0:
-                    logs.append(f"Progreso - Generacion {generation}/{max_generations}")
-                    logs.append(f"Mejor fitness: {best_fitness:.4f}")
-                    logs.append(f"Diversidad de poblacion: {diversity:.4f}")
-                    logs.append(f"Tasa de mutacion actual: {mutation_rate:.3f}")
-                            
-            # Mostrar el mejor resultado al finalizar
-            logs.append("\n" + "="*60)
-            logs.append("MEJOR SOLUCIoN ENCONTRADA")
-            logs.append("="*60)
-            
-            if best_chromosome is not None:
-                # Almacenar resultados en app.config
-                if 'RESULTS' not in app.config:
-                    app.config['RESULTS'] = {}
-                
-                app.config['RESULTS'][nskey] = {
-                    'best_chromosome': best_chromosome,
-                    'best_metrics': best_metrics,
-                    'best_fitness': best_fitness
-                }
+        # Retornar los resultados al final de la función
+        return best_chromosome, best_metrics, best_fitness
 
-                logs.append("\n" + "="*60)
-                logs.append("RESULTADOS ALMACENADOS CORRECTAMENTE EN app.config")
-                logs.append("="*60)
-                logs.append(f"Cromosoma optimo: {best_chromosome}")
-                logs.append(f"Fitness: {best_fitness:.4f}")
-            
-                
-                best_metrics = calculate_gallery_metrics(best_chromosome, full_constants, GENE_INDEX_MAP)
-                best_fitness = calculate_fitness(best_metrics, weights)
-                
-                logs.append(f"Cromosoma optimo: {best_chromosome}")
-                logs.append(f"Fitness: {best_fitness:.4f}")
-                
-                logs.append("Metricas clave de la mejor solucion:")
-                logs.append(f"  Inversion Inicial: {best_metrics.get('i_InvIni'):,.2f}")
-                logs.append(f"  Ingresos Anuales: {best_metrics.get('u_IngGal'):,.2f}")
-                logs.append(f"  Egresos Anuales: {best_metrics.get('u_EgrGal'):,.2f}")
-                logs.append(f"  Utilidad Neta: {best_metrics.get('u_UtNeGa'):,.2f}")
-                logs.append(f"  ROI: {best_metrics.get('u_ROIGal'):.2f}%")
-                logs.append(f"  Beneficio Social: {best_metrics.get('u_BenSoc'):.4f}")
-                logs.append(f"  Empleo Generado: {best_metrics.get('x_Empleo')}")
-                
-                if 'RESULTS' not in app.config:
-                    app.config['RESULTS'] = {}
 
-                app.config['RESULTS'][nskey] = {
-                    'best_chromosome': best_chromosome,
-                    'best_metrics': best_metrics,
-                    'best_fitness': best_fitness
-                }
+def _opciones_motor(app, engine, en_pool=False, con_plazo=False):
+    """
+    Argumentos adicionales del motor del GA según la configuración.
 
-                logs.append("Resultados almacenados correctamente en app.config")
-            else:
-                logs.append("No se encontro una solucion optima.")
-            
-            app.config['EXECUTION_LOGS'][nskey] = logs
+    Dentro del pool de galerías (`en_pool`) no se abren más procesos: las islas
+    evolucionan por turnos y la evaluación de aptitud se hace en el proceso.
+    Con plazo de tiempo (`con_plazo`) se activa también la parada por convergencia.
+    """
+    opciones = {'cache_size': app.config.get('FITNESS_CACHE_SIZE', 20000),
+                'verbosity': app.config.get('GA_LOG_VERBOSITY', VERBOSITY_INFO)}
+    ventana = app.config.get('GA_CONVERGENCE_WINDOW', 0)
+    if not ventana and con_plazo:
+        ventana = DEADLINE_CONVERGENCE_WINDOW
+    if ventana:
+        opciones['convergence_window'] = ventana
+    if engine == 'islas':
+        opciones.update(
+            islands=app.config.get('GA_ISLANDS', 4),
+            migration_interval=app.config.get('GA_MIGRATION_INTERVAL', 10),
+            migrants=app.config.get('GA_MIGRANTS', 2),
+            topology=app.config.get('GA_MIGRATION_TOPOLOGY', 'ring'),
+            processes=not (SYNC_MODE or en_pool),
+        )
+    elif not en_pool:
+        opciones.update(
+            eval_workers=app.config.get('GA_EVAL_WORKERS', 0),
+            eval_min_population=app.config.get('GA_PARALLEL_EVAL_MIN', DEFAULT_MIN_POPULATION),
+        )
+    return opciones
+
+
+def _almacenar_resultado_ga(app, nskey, result):
+    """Deja el resultado de una ejecución del GA en `run_store` para la UI."""
+    best_chromosome, best_metrics, best_fitness = result
+    if best_chromosome is None:
+        return
+    run_store.set_result(nskey, {
+        'best_chromosome': best_chromosome,
+        'best_metrics': best_metrics,
+        'best_fitness': best_fitness
+    })
+    run_store.log(nskey).append("Resultados almacenados correctamente en memoria")
 
-        except Exception as e:
-            error_msg = f"Error en el algoritmo genético: {str(e)}"
-            print(error_msg)
-            logs.append(error_msg)
-            traceback_str = traceback.format_exc()
-            print(traceback_str)
-            logs.append(traceback_str)
-            app.config['EXECUTION_LOGS'][nskey] = logs
-            
-            # Retornar valores por defecto en caso de error
-            return best_chromosome, best_metrics, best_fitness
-        
-        # Retornar los resultados al final de la función
-        return best_chromosome, best_metrics, best_fitness
+def _cursor_historial(valor):
+    """(ultima_fecha, id) de un cursor de /historial ('<fecha ISO>_<id>'), o None."""
+    try:
+        fecha, ident = (valor or "").rsplit("_", 1)
+        return datetime.fromisoformat(fecha), int(ident)
+    except ValueError:
+        return None
 
 @app.route("/historial")
 def historial():
     """
-    Lista las corridas del usuario actual (anónimo) agrupadas por run_id.
-    Muestra: fecha última, si está completa (7/7), y el mejor ROI de esa corrida.
-    Permite filtrar por run_id (?q=) y paginar (?page=, ?per_page=).
+    Lista las corridas del usuario actual (anónimo), de la más reciente a la más
+    antigua: fecha última, si está completa (7/7) y el mejor ROI de la corrida.
+
+    Lee HistorialRun (una fila por corrida, se actualiza al guardar sus
+    galerías) con paginación por cursor: ?antes=<cursor> para la página
+    siguiente y ?despues=<cursor> para la anterior. Permite filtrar por run_id
+    (?q=) y elegir el tamaño de página (?per_page=).
     """
     uk = get_or_create_user_key()  # ← identifica al “usuario” por cookie
 
     # Filtros opcionales
     term = (request.args.get("q") or "").strip()
-    page = int(request.args.get("page", 1) or 1)
-    per_page = int(request.args.get("per_page", 10) or 10)
-
-    # Agregado por corrida (run_id) SOLO del user_key actual
-    base = (
-        db.session.query(
-            Ejecucion.run_id.label("run_id"),
-            func.count(Ejecucion.id).label("filas"),
-            func.max(Ejecucion.fecha_ejecucion).label("ultima_fecha"),
-            func.max(Ejecucion.roi).label("mejor_roi"),
-        )
-        .filter(Ejecucion.user_key == uk)                     # ← filtro clave
-        .group_by(Ejecucion.run_id)
-        .order_by(func.max(Ejecucion.fecha_ejecucion).desc())
-    )
+    per_page = min(max(int(request.args.get("per_page", 10) or 10), 1), 100)
+    antes = _cursor_historial(request.args.get("antes"))
+    despues = None if antes else _cursor_historial(request.args.get("despues"))
 
+    q = HistorialRun.query.filter(HistorialRun.user_key == uk)  # ← filtro clave
     if term:
-        base = base.filter(Ejecucion.run_id.ilike(f"%{term}%"))
-
-    # Paginar (si usas Flask-SQLAlchemy ≥3, usa .paginate sobre db.session.execute/Select)
-    try:
-        pag = base.paginate(page=page, per_page=per_page, error_out=False)
-        rows = pag.items
-        total = pag.total
-        pages = pag.pages
-    except Exception:
-        # Fallback sin paginate si tu versión no lo soporta en queries agregadas
-        rows = base.all()
-        total = len(rows)
-        pages = 1
+        q = q.filter(HistorialRun.run_id.ilike(f"%{term}%"))
+
+    clave = tuple_(HistorialRun.ultima_fecha, HistorialRun.id)
+    if despues:
+        # Página anterior: las siguientes en orden ascendente, luego se invierten
+        rows = (q.filter(clave > tuple_(*despues))
+                 .order_by(HistorialRun.ultima_fecha.asc(), HistorialRun.id.asc())
+                 .limit(per_page + 1).all())
+        hay_anterior = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        hay_siguiente = True
+    else:
+        if antes:
+            q = q.filter(clave < tuple_(*antes))
+        rows = (q.order_by(HistorialRun.ultima_fecha.desc(), HistorialRun.id.desc())
+                 .limit(per_page + 1).all())
+        hay_siguiente = len(rows) > per_page
+        rows = rows[:per_page]
+        hay_anterior = antes is not None
+
+    def cursor(r):
+        return f"{r.ultima_fecha.isoformat()}_{r.id}"
+
+    # Total del usuario (conteo mantenido; con búsqueda no se cuenta)
+    total = None
+    if not term:
+        conteo = db.session.get(ConteoCorridas, uk)
+        total = conteo.corridas if conteo else 0
 
     # Empaquetar para el template
     corridas = []
@@ -1310,10 +1995,10 @@ def historial():
         "historial.html",
         corridas=corridas,
         q=term,
-        page=page,
         per_page=per_page,
         total=total,
-        pages=pages,
+        anterior=cursor(rows[0]) if rows and hay_anterior else None,
+        siguiente=cursor(rows[-1]) if rows and hay_siguiente else None,
     )
 
 @app.route('/api/check_completion/<thread_id>')
@@ -1321,7 +2006,7 @@ def historial():
 def check_completion(thread_id):
     uk = get_or_create_user_key()
     nskey = _ns(uk, thread_id)
-    if 'RESULTS' in app.config and nskey in app.config['RESULTS']:
+    if run_store.has_result(nskey):
         return jsonify({"completed": True})
     return jsonify({"completed": False})
 
@@ -1330,15 +2015,26 @@ def check_completion(thread_id):
 def diagnostic():
     """Ruta de diagnostico para verificar el estado de los threads"""
     try:
-        active_threads = list(app.config.get('EXECUTION_LOGS', {}).keys())
+        active_threads = run_store.keys()
         return jsonify({
             'active_threads': active_threads,
-            'results_available': list(app.config.get('RESULTS', {}).keys()),
-            'thread_count': len(active_threads)
+            'results_available': run_store.result_keys(),
+            'thread_count': len(active_threads),
+            'job_queue': job_queue.stats(),
+            'run_store': run_store.stats(),
+            'persistencia': persistencia.stats() if persistencia is not None else None,
+            'conexiones_sse': _conexiones_sse
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/run_store/stats')
+@only_dev
+def run_store_stats():
+    """Corridas, líneas de log y (en memoria) bytes aproximados que guarda `run_store`."""
+    run_store.sweep()
+    return jsonify(run_store.stats())
+
 @app.route('/detalle_ejecucion/<int:ejecucion_id>')
 def detalle_ejecucion(ejecucion_id):
     try:
@@ -1365,26 +2061,27 @@ def detalle_ejecucion(ejecucion_id):
         return render_template('detalle_ejecucion.html',
                                error=f"Error al cargar el detalle: {str(ex)}")
 
+# Columnas de Ejecucion que usa /comparativo (además de las de su detalle)
+_COLUMNAS_COMPARATIVO = [Ejecucion.id, Ejecucion.comuna, Ejecucion.inv_inicial_usd, Ejecucion.empleos_directos,
+                         Ejecucion.peso_mun, Ejecucion.utilidad_neta_usd, Ejecucion.beneficio_social,
+                         Ejecucion.mejor_fitness]
+
 @app.route("/comparativo")
 def comparativo():
     run_id = request.args.get("run_id")
     uk = get_or_create_user_key()
 
-    q = (Ejecucion.query
-        .filter(Ejecucion.user_key == uk)  
-        .order_by(Ejecucion.comuna.asc(), Ejecucion.fecha_ejecucion.desc()))
+    # La última ejecución por comuna (1..7) en SQL con DISTINCT ON (ver
+    # ix_ejec_user_comuna_fecha), solo con las columnas del gráfico y su detalle
+    q = (db.select(*_COLUMNAS_COMPARATIVO, EjecucionDetalle.id.label("detalle_id"), *_COLUMNAS_DETALLE)
+         .select_from(Ejecucion)
+         .outerjoin(EjecucionDetalle, EjecucionDetalle.ejecucion_id == Ejecucion.id)
+         .where(Ejecucion.user_key == uk)
+         .distinct(Ejecucion.comuna)
+         .order_by(Ejecucion.comuna.asc(), Ejecucion.fecha_ejecucion.desc(), Ejecucion.id.desc()))
     if run_id:
-        q = q.filter(Ejecucion.run_id == run_id)
-
-    # Tomamos la última por comuna (1..7). Si ya lo haces en SQL, perfecto; si no:
-    ejecs_por_comuna = {}
-
-    for e in q.all():
-        # guarda solo la primera que veas por comuna (ya viene desc por fecha)
-        ejecs_por_comuna.setdefault(e.comuna, e)
-
-    print(">>> comparativo ejecuciones:", ejecs_por_comuna)
-    ejecuciones = [ejecs_por_comuna[k] for k in sorted(ejecs_por_comuna.keys())]
+        q = q.where(Ejecucion.run_id == run_id)
+    ejecuciones = db.session.execute(q).all()
 
     # Helper para 0 si None
     def z(x): 
@@ -1403,14 +2100,8 @@ def comparativo():
     idx_mun      = []; idx_bc       = []; idx_bs_idx      = []; idx_fitness = []
 
     for e in ejecuciones:
-        # trae su detalle (1–a–1). Si definiste relationship one-to-one "detalles" como lista, ajusta:
-        det = None
-        # Caso 1: relationship one-to-one
-        if hasattr(e, "detalles") and isinstance(e.detalles, list):
-            det = e.detalles[0] if e.detalles else None
-        # Caso 2: relationship one-to-one con atributo singular (ajusta si lo llamaste distinto)
-        if hasattr(e, "detalle") and det is None:
-            det = e.detalle
+        # Cada fila trae las columnas de su detalle (1–a–1), si lo tiene
+        det = e if e.detalle_id is not None else None
 
         # si no hay detalle, todo 0
         if det is None:
@@ -1534,6 +2225,18 @@ def comparativo():
         idx_mun=idx_mun, idx_bc=idx_bc, idx_bs_idx=idx_bs_idx, idx_fitness=idx_fitness,tabla_rows=tabla_rows
     )
 
+# Sumas de las galerías guardadas en ResumenRun (columna -> valor si falta)
+SUMAS_RESUMEN = {
+    "sum_l12": 0, "sum_l16": 0, "sum_l20": 0, "sum_l25": 0,
+    "sum_ar_af": 0, "sum_ar_cp": 0, "sum_ar_nal": 0, "sum_ar_sc": 0,
+    "sum_ing_total": 0.0, "sum_egr_total": 0.0,
+}
+
+def _sumas_resumen(resumen):
+    """Sumas por corrida de un ResumenRun (0 en las corridas anteriores sin calcular)."""
+    return {col: getattr(resumen, col) if getattr(resumen, col) is not None else cero
+            for col, cero in SUMAS_RESUMEN.items()}
+
 @app.route("/resumen-corrida")
 def resumen_corrida():
     # 🔥 GLOBAL: no usamos user_key (sin backfill aquí para mantenerlo simple)
@@ -1552,45 +2255,8 @@ def resumen_corrida():
                .limit(limit)
                .all())
 
-    # Agregados por run_id (locales, áreas, ingresos/egresos) – GLOBAL
-    aggs = (
-        db.session.query(
-            Ejecucion.run_id.label("run_id"),
-            func.coalesce(func.sum(cast(Ejecucion.locales_12, Integer)), 0).label("sum_l12"),
-            func.coalesce(func.sum(cast(Ejecucion.locales_16, Integer)), 0).label("sum_l16"),
-            func.coalesce(func.sum(cast(Ejecucion.locales_20, Integer)), 0).label("sum_l20"),
-            func.coalesce(func.sum(cast(Ejecucion.locales_25, Integer)), 0).label("sum_l25"),
-            func.coalesce(func.sum(cast(EjecucionDetalle.ar_alimentos_frescos, Integer)), 0).label("sum_ar_af"),
-            func.coalesce(func.sum(cast(EjecucionDetalle.ar_comidas_preparadas, Integer)), 0).label("sum_ar_cp"),
-            func.coalesce(func.sum(cast(EjecucionDetalle.ar_no_alimentarios, Integer)), 0).label("sum_ar_nal"),
-            func.coalesce(func.sum(cast(EjecucionDetalle.ar_complementarios, Integer)), 0).label("sum_ar_sc"),
-            func.coalesce(func.sum(EjecucionDetalle.ing_total), 0.0).label("sum_ing_total"),
-            func.coalesce(func.sum(EjecucionDetalle.egr_total), 0.0).label("sum_egr_total"),
-        )
-        .outerjoin(EjecucionDetalle, EjecucionDetalle.ejecucion_id == Ejecucion.id)
-        # 🔥 sin filtro por Ejecucion.user_key
-        .group_by(Ejecucion.run_id)
-        .all()
-    )
-
-    aggs_map = {
-        a.run_id: {
-            "sum_l12": a.sum_l12, "sum_l16": a.sum_l16, "sum_l20": a.sum_l20, "sum_l25": a.sum_l25,
-            "sum_ar_af": a.sum_ar_af, "sum_ar_cp": a.sum_ar_cp, "sum_ar_nal": a.sum_ar_nal, "sum_ar_sc": a.sum_ar_sc,
-            "sum_ing_total": float(a.sum_ing_total or 0.0),
-            "sum_egr_total": float(a.sum_egr_total or 0.0),
-        }
-        for a in aggs
-    }
-
-    rows_with_aggs = []
-    for r in filas:
-        sums = aggs_map.get(r.run_id, {
-            "sum_l12": 0, "sum_l16": 0, "sum_l20": 0, "sum_l25": 0,
-            "sum_ar_af": 0, "sum_ar_cp": 0, "sum_ar_nal": 0, "sum_ar_sc": 0,
-            "sum_ing_total": 0.0, "sum_egr_total": 0.0,
-        })
-        rows_with_aggs.append({"resumen": r, **sums})
+    # Sumas por corrida guardadas en ResumenRun al terminar (sin GROUP BY por petición)
+    rows_with_aggs = [{"resumen": r, **_sumas_resumen(r)} for r in filas]
 
     return render_template(
         "resumen_corrida.html",
@@ -1600,55 +2266,89 @@ def resumen_corrida():
     )
 
 
-@app.route("/resumen-corrida.csv")
-def resumen_corrida_csv():
-    """Exporta el mismo resumen como CSV (GLOBAL) respetando los filtros."""
-    only_run = (request.args.get("run_id") or "").strip()
-    limit = int(request.args.get("limit", 50) or 50)
+# Filas por lectura del cursor (yield_per) y por trozo de las respuestas CSV
+CSV_LOTE = 500
 
-    q = ResumenRun.query
-    if only_run:
-        q = q.filter(ResumenRun.run_id == only_run)
+def _limite_csv(valor, defecto=50):
+    """`?limit=` de las exportaciones: un número, o 'all' / 0 para exportar todo (None)."""
+    valor = (valor or "").strip().lower()
+    if valor in ("all", "todas", "todo", "0"):
+        return None
+    try:
+        return max(1, int(valor))
+    except ValueError:
+        return defecto
 
-    filas = (q.order_by(ResumenRun.prom_fitness.desc(),
-                        ResumenRun.created_at.desc())
-               .limit(limit)
-               .all())
+def _csv_stream(encabezado, filas):
+    """
+    Genera un CSV en trozos de CSV_LOTE filas, para responder en streaming con
+    memoria constante sin importar cuántas filas haya.
 
-    aggs = (
-        db.session.query(
-            Ejecucion.run_id.label("run_id"),
-            func.coalesce(func.sum(cast(Ejecucion.locales_12, Integer)), 0).label("sum_l12"),
-            func.coalesce(func.sum(cast(Ejecucion.locales_16, Integer)), 0).label("sum_l16"),
-            func.coalesce(func.sum(cast(Ejecucion.locales_20, Integer)), 0).label("sum_l20"),
-            func.coalesce(func.sum(cast(Ejecucion.locales_25, Integer)), 0).label("sum_l25"),
-            func.coalesce(func.sum(cast(EjecucionDetalle.ar_alimentos_frescos, Integer)), 0).label("sum_ar_af"),
-            func.coalesce(func.sum(cast(EjecucionDetalle.ar_comidas_preparadas, Integer)), 0).label("sum_ar_cp"),
-            func.coalesce(func.sum(cast(EjecucionDetalle.ar_no_alimentarios, Integer)), 0).label("sum_ar_nal"),
-            func.coalesce(func.sum(cast(EjecucionDetalle.ar_complementarios, Integer)), 0).label("sum_ar_sc"),
-            func.coalesce(func.sum(EjecucionDetalle.ing_total), 0.0).label("sum_ing_total"),
-            func.coalesce(func.sum(EjecucionDetalle.egr_total), 0.0).label("sum_egr_total"),
-        )
-        .outerjoin(EjecucionDetalle, EjecucionDetalle.ejecucion_id == Ejecucion.id)
-        .group_by(Ejecucion.run_id)
-        .all()
+    Args:
+        filas: Iterable de listas de valores (p. ej. un resultado con yield_per).
+    """
+    salida = io.StringIO(newline="")
+    writer = csv.writer(salida)
+    writer.writerow(encabezado)
+    pendientes = 0
+    yield "\ufeff"  # BOM para Excel
+    for fila in filas:
+        writer.writerow(fila)
+        pendientes += 1
+        if pendientes >= CSV_LOTE:
+            yield salida.getvalue()
+            salida.seek(0)
+            salida.truncate()
+            pendientes = 0
+    yield salida.getvalue()
+
+def _filas_cursor(consulta):
+    """Ejecuta un `select` para exportarlo: devuelve el resultado leído de a CSV_LOTE filas."""
+    # Cursor del lado del servidor: se leen CSV_LOTE filas a la vez
+    return db.session.execute(consulta.execution_options(yield_per=CSV_LOTE))
+
+def _respuesta_csv(nombre, encabezado, filas):
+    return Response(
+        stream_with_context(_csv_stream(encabezado, filas)),
+        mimetype="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'},
     )
 
-    aggs_map = {
-        a.run_id: {
-            "sum_l12": a.sum_l12, "sum_l16": a.sum_l16, "sum_l20": a.sum_l20, "sum_l25": a.sum_l25,
-            "sum_ar_af": a.sum_ar_af, "sum_ar_cp": a.sum_ar_cp, "sum_ar_nal": a.sum_ar_nal, "sum_ar_sc": a.sum_ar_sc,
-            "sum_ing_total": float(a.sum_ing_total or 0.0),
-            "sum_egr_total": float(a.sum_egr_total or 0.0),
-        }
-        for a in aggs
-    }
-
-    # Generar CSV
-    output = io.StringIO(newline="")
-    writer = csv.writer(output)
+@app.route("/resumen-corrida.csv")
+def resumen_corrida_csv():
+    """
+    Exporta el mismo resumen como CSV (GLOBAL) respetando los filtros; con
+    ?limit=all exporta todas las corridas. Se envía en streaming.
+    """
+    only_run = (request.args.get("run_id") or "").strip()
+    limit = _limite_csv(request.args.get("limit"))
 
-    writer.writerow([
+    consulta = db.select(ResumenRun)
+    if only_run:
+        consulta = consulta.where(ResumenRun.run_id == only_run)
+    consulta = consulta.order_by(ResumenRun.prom_fitness.desc(), ResumenRun.created_at.desc())
+    if limit is not None:
+        consulta = consulta.limit(limit)
+
+    def filas():
+        for r in _filas_cursor(consulta).scalars():
+            sums = _sumas_resumen(r)
+            yield [
+                r.run_id,
+                (r.prom_fitness or 0),
+                (r.prom_roi or 0),
+                (r.prom_margen or 0),
+                (r.prom_ben_social or 0),
+                (r.total_inversion or 0),
+                (r.total_utilidad or 0),
+                (r.mejor_comuna_base if r.mejor_comuna_base is not None else ""),
+                (r.mejor_roi_base or 0),
+                sums["sum_l12"], sums["sum_l16"], sums["sum_l20"], sums["sum_l25"],
+                sums["sum_ar_af"], sums["sum_ar_cp"], sums["sum_ar_nal"], sums["sum_ar_sc"],
+                sums["sum_ing_total"], sums["sum_egr_total"],
+            ]
+
+    return _respuesta_csv("resumen_corrida.csv", [
         "run_id",
         "prom_fitness", "prom_roi", "prom_margen", "prom_ben_social",
         "total_inversion", "total_utilidad",
@@ -1656,37 +2356,38 @@ def resumen_corrida_csv():
         "locales_12", "locales_16", "locales_20", "locales_25",
         "ar_alimentos_frescos", "ar_comidas_preparadas", "ar_no_alimentarios", "ar_complementarios",
         "ing_total", "egr_total",
-    ])
+    ], filas())
 
-    for r in filas:
-        sums = aggs_map.get(r.run_id, {
-            "sum_l12": 0, "sum_l16": 0, "sum_l20": 0, "sum_l25": 0,
-            "sum_ar_af": 0, "sum_ar_cp": 0, "sum_ar_nal": 0, "sum_ar_sc": 0,
-            "sum_ing_total": 0.0, "sum_egr_total": 0.0,
-        })
-        writer.writerow([
-            r.run_id,
-            (r.prom_fitness or 0),
-            (r.prom_roi or 0),
-            (r.prom_margen or 0),
-            (r.prom_ben_social or 0),
-            (r.total_inversion or 0),
-            (r.total_utilidad or 0),
-            (r.mejor_comuna_base if r.mejor_comuna_base is not None else ""),
-            (r.mejor_roi_base or 0),
-            sums["sum_l12"], sums["sum_l16"], sums["sum_l20"], sums["sum_l25"],
-            sums["sum_ar_af"], sums["sum_ar_cp"], sums["sum_ar_nal"], sums["sum_ar_sc"],
-            sums["sum_ing_total"], sums["sum_egr_total"],
-        ])
-
-    csv_bytes = output.getvalue().encode("utf-8-sig")  # BOM para Excel
-    output.close()
+# Columnas de la exportación por galería: Ejecucion + su EjecucionDetalle
+_COLUMNAS_EJECUCION = [c for c in Ejecucion.__table__.columns if c.key not in ("id", "user_key")]
+_COLUMNAS_DETALLE = [c for c in EjecucionDetalle.__table__.columns if c.key not in ("id", "ejecucion_id")]
 
-    return Response(
-        csv_bytes,
-        mimetype="text/csv; charset=utf-8",
-        headers={"Content-Disposition": 'attachment; filename="resumen_corrida.csv"'},
-    )
+@app.route("/ejecuciones.csv")
+def ejecuciones_csv():
+    """
+    Exporta como CSV las galerías (Ejecucion + EjecucionDetalle) del usuario
+    actual: de una corrida con ?run_id=, o de todo su historial. Se envía en
+    streaming.
+    """
+    uk = get_or_create_user_key()
+    only_run = (request.args.get("run_id") or "").strip()
+
+    consulta = (db.select(*_COLUMNAS_EJECUCION, *_COLUMNAS_DETALLE)
+                .select_from(Ejecucion)
+                .outerjoin(EjecucionDetalle, EjecucionDetalle.ejecucion_id == Ejecucion.id)
+                .where(Ejecucion.user_key == uk)
+                .order_by(Ejecucion.run_id, Ejecucion.comuna))
+    if only_run:
+        consulta = consulta.where(Ejecucion.run_id == only_run)
+
+    def filas():
+        for fila in _filas_cursor(consulta):
+            yield [json.dumps(v) if isinstance(v, (list, dict)) else ("" if v is None else v)
+                   for v in fila]
+
+    sufijo = "".join(ch for ch in only_run if ch.isalnum() or ch in "-_")
+    nombre = f"ejecuciones_{sufijo}.csv" if sufijo else "ejecuciones.csv"
+    return _respuesta_csv(nombre, [c.key for c in _COLUMNAS_EJECUCION + _COLUMNAS_DETALLE], filas())
 
 @app.route('/como-usar')
 def como_usar():
@@ -1696,13 +2397,4 @@ def como_usar():
 def legal():
     return render_template('legal.html')
 if __name__ == '__main__':
-    # Inicializar estructuras de datos si no existen
-    if 'EXECUTION_LOGS' not in app.config:
-        app.config['EXECUTION_LOGS'] = {}
-        print("EXECUTION_LOGS inicializado")
-        
-    if 'RESULTS' not in app.config:
-        app.config['RESULTS'] = {}
-        print("RESULTS inicializado")
-
     app.run(debug=True, threaded=True)
\ No newline at end of file
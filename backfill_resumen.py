@@ -0,0 +1,28 @@
+from app import app, guardar_resumen_run
+from extensions import db
+from models import Ejecucion, ResumenRun
+from sqlalchemy import and_, func, or_
+
+# Las corridas guardan su ResumenRun al terminar; este script lo calcula para
+# las corridas completas (7 galerías) anteriores que no lo tienen o que no
+# tienen sus sumas por corrida (columnas sum_*)
+LOTE = 100
+
+if __name__ == "__main__":
+    try:
+        with app.app_context():
+            faltantes = (db.session.query(Ejecucion.user_key, Ejecucion.run_id)
+                         .outerjoin(ResumenRun, and_(ResumenRun.user_key == Ejecucion.user_key,
+                                                     ResumenRun.run_id == Ejecucion.run_id))
+                         .filter(or_(ResumenRun.id.is_(None), ResumenRun.sum_ing_total.is_(None)))
+                         .group_by(Ejecucion.user_key, Ejecucion.run_id)
+                         .having(func.count(Ejecucion.id) >= 7)
+                         .all())
+            for i, (user_key, run_id) in enumerate(faltantes, start=1):
+                guardar_resumen_run(run_id, user_key, commit=False)
+                if i % LOTE == 0:
+                    db.session.commit()
+            db.session.commit()
+        print(f"✅ Resúmenes calculados: {len(faltantes)}")
+    except Exception as e:
+        print(f"Error al calcular resúmenes: {e}")
@@ -0,0 +1,68 @@
+"""
+Compara la evaluación completa frente a la incremental del grafo de fórmulas.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_formula_graph [--hijos 5000] [--genes 1 3 10]
+"""
+import argparse
+import random
+import time
+
+from utils.formula_graph import get_formula_graph
+from utils.genetic_algorithm import (
+    CONSTANTS, GENE_INDEX_MAP, calculate_gallery_metrics,
+    create_initial_population, gene_definitions,
+)
+from utils.gene_space import get_gene_space
+
+
+def _hijo(parent, changed_genes, space, mutable):
+    child = list(parent)
+    for index in random.sample(mutable, changed_genes):
+        child[index] = space.sample(index)
+    return child
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hijos', type=int, default=5000)
+    parser.add_argument('--genes', type=int, nargs='+', default=[1, 3, 10])
+    args = parser.parse_args()
+
+    constants = {**CONSTANTS, 'g_TamPar': 2000, 'g_TaUtPa': 1400}
+    user_inputs = {'g_TamLot': 5000, 'b_CanPri': 2, 'b_CanSec': 3}
+    graph = get_formula_graph()
+    space = get_gene_space(gene_definitions)
+    mutable = [i for i in GENE_INDEX_MAP if i not in (0, 24, 25)]
+
+    parents = create_initial_population(50, gene_definitions, user_inputs, constants)
+    parent_values = [graph.evaluate(p, constants) for p in parents]
+
+    print(f"Loci en el grafo: {len(graph.order)}")
+    print(f"{'genes':>5} {'escalar/s':>12} {'grafo/s':>12} {'incremental/s':>14} {'aceleración':>11}")
+    for changed in args.genes:
+        pairs = []
+        for _ in range(args.hijos):
+            k = random.randrange(len(parents))
+            pairs.append((k, _hijo(parents[k], changed, space, mutable)))
+
+        start = time.perf_counter()
+        for _, child in pairs:
+            calculate_gallery_metrics(child, constants, GENE_INDEX_MAP)
+        scalar = args.hijos / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _, child in pairs:
+            graph.evaluate(child, constants)
+        full = args.hijos / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for k, child in pairs:
+            graph.reevaluate(parent_values[k], parents[k], child)
+        incremental = args.hijos / (time.perf_counter() - start)
+
+        print(f"{changed:>5} {scalar:>12,.0f} {full:>12,.0f} {incremental:>14,.0f} {incremental / full:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
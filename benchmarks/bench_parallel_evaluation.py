@@ -0,0 +1,62 @@
+"""
+Mide el punto de cruce entre la evaluación en proceso y la evaluación con memoria compartida.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_parallel_evaluation [--workers 8] [--tamanos 500 2000 8000 32000]
+
+El primer tamaño en que el backend paralelo es más rápido es el valor sugerido
+para GA_PARALLEL_EVAL_MIN en ese host.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from utils.batch_evaluation import FitnessKernel
+from utils.genetic_algorithm import CONSTANTS, create_initial_population, gene_definitions
+from utils.parallel_evaluation import SharedMemoryEvaluator
+
+
+def _medir(evaluador, population, repeticiones):
+    evaluador(population)  # calentamiento (arranque del pool, bloques compartidos)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        evaluador(population)
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[500, 2000, 8000, 32000])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    constants = {**CONSTANTS, 'g_TamPar': 2000, 'g_TaUtPa': 1400}
+    user_inputs = {'g_TamLot': 5000, 'b_CanPri': 2, 'b_CanSec': 3}
+    base = create_initial_population(500, gene_definitions, user_inputs, constants)
+
+    kernel = FitnessKernel(constants)
+    cruce = None
+    print(f"workers={args.workers}")
+    print(f"{'poblacion':>10} {'en proceso (ms)':>16} {'compartida (ms)':>16} {'speedup':>8}")
+    with SharedMemoryEvaluator(constants, workers=args.workers, min_population=0) as paralelo:
+        for tamano in args.tamanos:
+            population = [base[i % len(base)] for i in range(tamano)]
+            t_local = _medir(kernel, population, args.repeticiones)
+            t_paralelo = _medir(paralelo, population, args.repeticiones)
+            assert np.allclose(kernel(population), paralelo(population))
+            speedup = t_local / t_paralelo
+            print(f"{tamano:>10} {t_local * 1e3:>16.2f} {t_paralelo * 1e3:>16.2f} {speedup:>7.2f}x")
+            if cruce is None and speedup > 1.0:
+                cruce = tamano
+
+    if cruce is None:
+        print("El backend paralelo no superó a la evaluación en proceso en los tamaños medidos.")
+    else:
+        print(f"Punto de cruce: GA_PARALLEL_EVAL_MIN={cruce}")
+
+
+if __name__ == '__main__':
+    main()
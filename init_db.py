@@ -1,10 +1,54 @@
 from app import app
 from extensions import db
+from sqlalchemy import text
+
+# create_all() no agrega columnas ni índices a tablas que ya existen: los nuevos
+# de los modelos se agregan aquí de forma idempotente
+COLUMNAS_NUEVAS = [
+    "ALTER TABLE ejecuciones ADD COLUMN IF NOT EXISTS criterio_parada VARCHAR(20)",
+    "ALTER TABLE ejecuciones ADD COLUMN IF NOT EXISTS generaciones_ejecutadas INTEGER",
+    *(f"ALTER TABLE resumen_runs ADD COLUMN IF NOT EXISTS {columna} INTEGER"
+      for columna in ("sum_l12", "sum_l16", "sum_l20", "sum_l25",
+                      "sum_ar_af", "sum_ar_cp", "sum_ar_nal", "sum_ar_sc")),
+    "ALTER TABLE resumen_runs ADD COLUMN IF NOT EXISTS sum_ing_total DOUBLE PRECISION",
+    "ALTER TABLE resumen_runs ADD COLUMN IF NOT EXISTS sum_egr_total DOUBLE PRECISION",
+    "CREATE INDEX IF NOT EXISTS ix_resumen_fitness_created ON resumen_runs (prom_fitness DESC, created_at DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_ejec_user_comuna_fecha ON ejecuciones (user_key, comuna, fecha_ejecucion DESC, id DESC)",
+]
+
+# Tablas derivadas que se mantienen al guardar las corridas: se completan con
+# las corridas anteriores (se puede repetir sin duplicar)
+RELLENOS = [
+    """INSERT INTO historial_runs (user_key, run_id, filas, mejor_roi, ultima_fecha)
+       SELECT user_key, run_id, count(*), max(roi), coalesce(max(fecha_ejecucion), now())
+       FROM ejecuciones GROUP BY user_key, run_id
+       ON CONFLICT ON CONSTRAINT uq_historial_user_run DO NOTHING""",
+    """INSERT INTO conteo_corridas (user_key, corridas)
+       SELECT user_key, count(*) FROM historial_runs GROUP BY user_key
+       ON CONFLICT (user_key) DO UPDATE SET corridas = excluded.corridas""",
+]
+
+# Búsqueda por run_id en /historial (ILIKE '%texto%'). Requiere la extensión
+# pg_trgm; si la base no la tiene, la búsqueda recorre solo las corridas del usuario
+INDICES_OPCIONALES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_historial_run_trgm ON historial_runs USING gin (run_id gin_trgm_ops)",
+]
 
 if __name__ == "__main__":
     try:
         with app.app_context():
             db.create_all()
+            for ddl in COLUMNAS_NUEVAS + RELLENOS:
+                db.session.execute(text(ddl))
+            db.session.commit()
+            try:
+                for ddl in INDICES_OPCIONALES:
+                    db.session.execute(text(ddl))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Aviso: sin índice de trigramas para buscar en /historial ({e.__class__.__name__})")
         print("✅ Tablas creadas/actualizadas en la base de datos indicada por DATABASE_URL")
     except Exception as e:
         print(f"Error al crear tablas: {e}")
\ No newline at end of file
@@ -59,8 +59,16 @@ class Ejecucion(db.Model):
     locales_20 = db.Column(db.Integer, nullable=True)
     locales_25 = db.Column(db.Integer, nullable=True)
 
+    # ------------------
+    #  Parada del GA: 'convergencia', 'generaciones', 'tiempo' o 'error'
+    # ------------------
+    criterio_parada = db.Column(db.String(20), nullable=True)
+    generaciones_ejecutadas = db.Column(db.Integer, nullable=True)
+
     __table_args__ = (
         db.UniqueConstraint('user_key','run_id', 'comuna', name='uq_ejec_run_comuna'),
+        # /comparativo: la última ejecución por comuna (DISTINCT ON comuna)
+        db.Index('ix_ejec_user_comuna_fecha', 'user_key', 'comuna', fecha_ejecucion.desc(), id.desc()),
     )
 
     # relación 1:N hacia detalles
@@ -92,8 +100,90 @@ class ResumenRun(db.Model):
     mejor_roi_base    = db.Column(db.Float, nullable=True)
     created_at        = db.Column(db.DateTime, server_default=func.now())
 
+    # sumas de las galerías para /resumen-corrida (NULL = corrida anterior, ver backfill_resumen.py)
+    sum_l12       = db.Column(db.Integer, nullable=True)   # locales_12
+    sum_l16       = db.Column(db.Integer, nullable=True)
+    sum_l20       = db.Column(db.Integer, nullable=True)
+    sum_l25       = db.Column(db.Integer, nullable=True)
+    sum_ar_af     = db.Column(db.Integer, nullable=True)   # detalle.ar_alimentos_frescos
+    sum_ar_cp     = db.Column(db.Integer, nullable=True)   # detalle.ar_comidas_preparadas
+    sum_ar_nal    = db.Column(db.Integer, nullable=True)   # detalle.ar_no_alimentarios
+    sum_ar_sc     = db.Column(db.Integer, nullable=True)   # detalle.ar_complementarios
+    sum_ing_total = db.Column(db.Float, nullable=True)     # detalle.ing_total
+    sum_egr_total = db.Column(db.Float, nullable=True)     # detalle.egr_total
+
     __table_args__ = (
         db.UniqueConstraint('user_key', 'run_id', name='uq_resumen_user_run'),
+        # /resumen-corrida: ORDER BY prom_fitness DESC, created_at DESC LIMIT n
+        db.Index('ix_resumen_fitness_created', prom_fitness.desc(), created_at.desc()),
+    )
+
+
+class HistorialRun(db.Model):
+    """Una fila por corrida del usuario para /historial (se actualiza al guardar sus galerías)."""
+    __tablename__ = 'historial_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_key = db.Column(db.String(64), nullable=False)
+    run_id   = db.Column(db.String(64), nullable=False)
+
+    filas        = db.Column(db.Integer, nullable=False, default=0)   # galerías guardadas (7 = completa)
+    mejor_roi    = db.Column(db.Float, nullable=True)
+    ultima_fecha = db.Column(db.DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('user_key', 'run_id', name='uq_historial_user_run'),
+        # Paginación por cursor: WHERE user_key = ? AND (ultima_fecha, id) < (?, ?)
+        # ORDER BY ultima_fecha DESC, id DESC. La búsqueda por run_id usa un índice
+        # de trigramas si la base tiene pg_trgm (ver init_db.py)
+        db.Index('ix_historial_user_fecha', 'user_key', ultima_fecha.desc(), id.desc()),
+    )
+
+
+class ConteoCorridas(db.Model):
+    """Cantidad de corridas de cada usuario en HistorialRun (se mantiene junto con ella)."""
+    __tablename__ = 'conteo_corridas'
+
+    user_key = db.Column(db.String(64), primary_key=True)
+    corridas = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CheckpointRun(db.Model):
+    """Parámetros de una corrida reanudable (para continuarla en otra petición)."""
+    __tablename__ = 'checkpoint_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_key = db.Column(db.String(64), index=True, nullable=False)
+    run_id   = db.Column(db.String(64), index=True, nullable=False)
+    thread_id = db.Column(db.String(64), nullable=False)
+
+    # galerías, parámetros del GA, pesos y motor con que se lanzó la corrida
+    parametros = db.Column(JSONB, nullable=False)
+    terminada  = db.Column(db.Boolean, nullable=False, default=False)
+
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('user_key', 'run_id', name='uq_checkpoint_run'),
+    )
+
+
+class CheckpointGaleria(db.Model):
+    """Último estado guardado del GA de una galería (población, parámetros, RNG, mejor)."""
+    __tablename__ = 'checkpoint_galerias'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_key = db.Column(db.String(64), index=True, nullable=False)
+    run_id   = db.Column(db.String(64), index=True, nullable=False)
+    comuna   = db.Column(db.Integer, nullable=False)
+
+    generacion = db.Column(db.Integer, nullable=False)
+    estado     = db.Column(JSONB, nullable=False)   # utils.ga_engine.checkpoint_state
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('user_key', 'run_id', 'comuna', name='uq_checkpoint_galeria'),
     )
 
 
@@ -59,14 +59,30 @@
     const finalMsg   = document.getElementById('finalMessage');
     const bestComunaInfo = document.getElementById('bestComunaInfo');
     const bestComunaText = document.getElementById('bestComunaText');
+    const queueInfo = document.getElementById('queueInfo');
+    const queuePosition = document.getElementById('queuePosition');
+    const cancelBtn = document.getElementById('cancelRun');
 
-    let lastLen = 0;        // cuántas líneas de logs ya mostré
+    let lastLen = 0;        // cuántas líneas de logs ya recibí (cursor del servidor)
     let completed = 0;      // cuántas galerías con ROI ya registradas
+    let finished = false;   // la corrida llegó a un estado final
     const roiSeen = {};     // para contabilizar una sola vez por galería
+    const roiByGallery = {};       // ROI por galería, acumulado de los logs
+    const progressByGallery = {};  // generación y fitness por galería
+
+    // Cancelar la corrida: se detiene en la siguiente generación y no guarda más galerías
+    cancelBtn?.addEventListener('click', async () => {
+      if (!threadId || !confirm('¿Cancelar la corrida en curso?')) return;
+      cancelBtn.disabled = true;
+      try {
+        await fetch(`/api/cancelar/${encodeURIComponent(threadId)}`, { method: 'POST' });
+      } finally {
+        window.location.href = window.location.pathname;
+      }
+    });
 
     clearBtn?.addEventListener('click', () => {
       if (logPre) logPre.textContent = '';
-      lastLen = 0;
     });
 
     // Utilidades
@@ -87,14 +103,16 @@
       }
       return null;
     }
-    function updateGalleryBars(roiByGallery) {
+    function updateGalleryBars() {
       for (let i = 1; i <= totalGalleries; i++) {
         const bar   = document.getElementById(`progress-${i}`);
         const label = document.getElementById(`progress-text-${i}`);
         const roiEl = document.getElementById(`roi-${i}`);
         if (!bar || !label) continue;
 
-        if (roiByGallery[i] !== undefined) {
+        const prog = progressByGallery[i];
+        const roi = roiByGallery[i] !== undefined ? roiByGallery[i] : (prog?.done ? prog.roi : undefined);
+        if (roi !== undefined) {
           if (!roiSeen[i]) {
             roiSeen[i] = true;
             completed++;
@@ -103,7 +121,13 @@
           bar.classList.add('bg-success');
           bar.classList.remove('progress-bar-animated');
           label.textContent = 'Completado';
-          if (roiEl) roiEl.textContent = `${roiByGallery[i].toFixed(2)}%`;
+          if (roiEl) roiEl.textContent = `${roi.toFixed(2)}%`;
+        } else if (prog && prog.max_generations) {
+          // avance real de la galería según la generación en curso
+          const pct = Math.max(5, Math.min(99, Math.round((prog.generation / prog.max_generations) * 100)));
+          bar.style.width = `${pct}%`;
+          bar.classList.add('progress-bar-animated');
+          label.textContent = `Gen ${prog.generation}/${prog.max_generations} · fitness ${prog.best_fitness.toFixed(4)}`;
         } else {
           // estado intermedio si aún no hay ROI para esa galería
           if (label.textContent !== 'Completado') {
@@ -121,54 +145,122 @@
       }
     }
 
-    async function poll() {
-      try {
-        const res = await fetch(`/api/logs/${threadId}`);
-        const data = await res.json();
-        const logs = data.logs || [];
-        const status = data.status || 'ejecutando';
-
-        // Estado en badge
-        if (statusBadge) {
-          statusBadge.textContent = status;
-          statusBadge.classList.toggle('bg-success', status === 'completado');
-          statusBadge.classList.toggle('bg-secondary', status !== 'completado');
-        }
-
-        // Agregar logs nuevos al dock
-        if (logPre && logs.length > lastLen) {
-          const newLines = logs.slice(lastLen).join('\n');
-          logPre.textContent += (logPre.textContent ? '\n' : '') + newLines;
+    // Líneas nuevas: el servidor conserva solo las últimas, así que se cuenta
+    // sobre el total escrito (offset = índice de la primera línea recibida)
+    function handleLogs(data) {
+      const logs = data.logs || [];
+      const offset = data.offset ?? lastLen;
+      const total = data.total ?? (offset + logs.length);
+      const newLines = logs.slice(Math.max(0, lastLen - offset));
+      if (newLines.length) {
+        if (logPre) {
+          logPre.textContent += (logPre.textContent ? '\n' : '') + newLines.join('\n');
           logPre.scrollTop = logPre.scrollHeight;
-          lastLen = logs.length;
         }
-
-        // Actualizar barras por ROI detectado
-        const roiByGallery = parseRoiFromLogs(logs);
-        updateGalleryBars(roiByGallery);
+        Object.assign(roiByGallery, parseRoiFromLogs(newLines));
 
         // Mostrar comuna óptima si está en logs
-        const best = parseBestComuna(logs);
+        const best = parseBestComuna(newLines);
         if (best && bestComunaInfo && bestComunaText) {
           bestComunaText.textContent = `Mejor comuna: ${best} — la nueva galería se optimizó para esta comuna.`;
           bestComunaInfo.style.display = 'block';
         }
+      }
+      lastLen = Math.max(lastLen, total);
+      updateGalleryBars();
+    }
 
-        // Fin: redirigir a /resultados igual que antes
-        if (status === 'completado' || data.has_results) {
-          if (finalMsg) finalMsg.style.display = 'block';
-          const finalUrl = runId
-            ? `${resultsUrl}${resultsUrl.includes('?') ? '&' : '?'}run_id=${encodeURIComponent(runId)}`
-            : resultsUrl;
-          setTimeout(() => { window.location.href = finalUrl; }, 1000);
-          return;
-        }
+    function handleProgress(galerias) {
+      Object.assign(progressByGallery, galerias || {});
+      updateGalleryBars();
+    }
+
+    // Devuelve true si la corrida llegó a un estado final
+    function handleStatus(data) {
+      const status = data.status || 'ejecutando';
+
+      // Estado en badge
+      if (statusBadge) {
+        statusBadge.textContent = status;
+        statusBadge.classList.toggle('bg-success', status === 'completado');
+        statusBadge.classList.toggle('bg-secondary', status !== 'completado');
+      }
+
+      // Posición en la cola mientras la corrida espera un ejecutor
+      if (queueInfo) {
+        const pos = data.queue_position || 0;
+        queueInfo.style.display = (status === 'en_cola' && pos > 0) ? 'block' : 'none';
+        if (queuePosition) queuePosition.textContent = `posición ${pos}`;
+      }
+
+      // La corrida terminó sin resultados o quedó en pausa: dejar de consultar
+      if (status === 'fallido' || status === 'cancelado' || status === 'pausada') {
+        finished = true;
+        return true;
+      }
+
+      // Fin: redirigir a /resultados igual que antes
+      if (status === 'completado' || data.has_results) {
+        finished = true;
+        if (finalMsg) finalMsg.style.display = 'block';
+        const finalUrl = runId
+          ? `${resultsUrl}${resultsUrl.includes('?') ? '&' : '?'}run_id=${encodeURIComponent(runId)}`
+          : resultsUrl;
+        setTimeout(() => { window.location.href = finalUrl; }, 1000);
+        return true;
+      }
+      return false;
+    }
+
+    // Respaldo: consultar cada segundo solo las líneas nuevas
+    async function poll() {
+      if (finished) return;
+      try {
+        const res = await fetch(`/api/logs/${encodeURIComponent(threadId)}?since=${lastLen}`);
+        const data = await res.json();
+        handleLogs(data);
+        handleProgress(data.progress);
+        if (handleStatus(data)) return;
       } catch (err) {
         console.error('Polling error:', err);
       }
       setTimeout(poll, 1000);
     }
 
-    poll();
+    // Flujo de eventos del servidor; si no está disponible o falla seguido, polling
+    function startStream() {
+      if (!window.EventSource) {
+        poll();
+        return;
+      }
+      const source = new EventSource(`/api/stream/${encodeURIComponent(threadId)}?since=${lastLen}`);
+      let failures = 0;
+      source.addEventListener('log', (e) => {
+        failures = 0;
+        handleLogs(JSON.parse(e.data));
+      });
+      source.addEventListener('progress', (e) => {
+        failures = 0;
+        handleProgress(JSON.parse(e.data).galerias);
+      });
+      source.addEventListener('status', (e) => {
+        failures = 0;
+        if (handleStatus(JSON.parse(e.data))) source.close();
+      });
+      source.onerror = () => {
+        if (finished) {
+          source.close();
+          return;
+        }
+        // El navegador reconecta solo (retoma con Last-Event-ID), salvo si el
+        // servidor rechazó el flujo (p. ej. 503 por exceso de conexiones)
+        if (source.readyState === EventSource.CLOSED || ++failures >= 3) {
+          source.close();
+          poll();
+        }
+      };
+    }
+
+    startStream();
   });
 })();
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def flask_app():
+    """La app con su BD (Postgres, ver DATABASE_URL); se omite si no responde."""
+    from app import app
+    from extensions import db
+    with app.app_context():
+        try:
+            db.session.execute(text("SELECT 1"))
+            db.create_all()
+        except Exception as e:
+            pytest.skip(f"Sin base de datos: {e}")
+    return app
@@ -0,0 +1,92 @@
+import random
+
+import numpy as np
+import pytest
+
+from utils.batch_evaluation import FitnessKernel, evaluate_population, population_metrics_row
+from utils.gene_space import get_gene_space
+from utils.genetic_algorithm import (
+    CONSTANTS,
+    GENE_INDEX_MAP,
+    calculate_fitness,
+    calculate_gallery_metrics,
+    create_initial_population,
+    gene_definitions,
+    mutate_chromosome,
+    recalculate_dependent_genes,
+)
+
+PESOS = (0.3, 0.5, 0.2)
+INDICE = {info['name']: index for index, info in GENE_INDEX_MAP.items()}
+GENES_USUARIO = {INDICE['g_TamLot'], INDICE['b_CanPri'], INDICE['b_CanSec']}
+# Proporciones de locales 25/20/16; si suman más de 100 %, la de 12 se acota a 0
+PROPORCIONES = [INDICE[nombre] for nombre in ('l_PLTi25', 'l_PLTi20', 'l_PLTi16')]
+
+
+def _constantes(tam_lote):
+    return {**CONSTANTS, 'g_TamPar': tam_lote * 0.4, 'g_TaUtPa': tam_lote * 0.4 * 0.7}
+
+
+def _poblacion(constantes, tam_lote, semilla):
+    random.seed(semilla)
+    np.random.seed(semilla)
+    user_inputs = {'g_TamLot': tam_lote, 'b_CanPri': random.randint(0, 4), 'b_CanSec': random.randint(0, 4)}
+    poblacion = create_initial_population(40, gene_definitions, user_inputs, constantes)
+    mutados = [recalculate_dependent_genes(mutate_chromosome(list(c), gene_definitions, 0.5, 0.3), constantes)
+               for c in poblacion]
+    return poblacion + mutados
+
+
+def _extremos(base):
+    """Cromosomas con cada gen en el mínimo o el máximo de su dominio, y con los topes activos."""
+    space = get_gene_space(gene_definitions)
+    extremos = []
+    for lado in (0, 1):
+        cromosoma = list(base)
+        for i in range(len(space)):
+            if i not in GENES_USUARIO:
+                cromosoma[i] = space.bounds(i)[lado]
+        extremos.append(cromosoma)
+    # Proporciones al máximo: p12 = max(0, 1 - ...) queda en 0
+    cromosoma = list(base)
+    for i in PROPORCIONES:
+        cromosoma[i] = space.bounds(i)[1] * 2
+    extremos.append(cromosoma)
+    # Zona de parqueo sin área útil: los max(0, ...) de áreas quedan en 0
+    cromosoma = list(base)
+    cromosoma[INDICE['g_TaZoAu']] = 10 ** 6
+    cromosoma[INDICE['g_AreVer']] = 10 ** 6
+    extremos.append(cromosoma)
+    # Sin bloques primarios ni secundarios (b_CanPri = b_CanSec = 0)
+    cromosoma = list(base)
+    cromosoma[INDICE['b_CanPri']] = cromosoma[INDICE['b_CanSec']] = 0
+    extremos.append(cromosoma)
+    return extremos
+
+
+@pytest.mark.parametrize('tam_lote,semilla', [(3000, 1), (5000, 2), (5800, 3)])
+def test_metricas_por_lote_iguales_a_las_escalares(tam_lote, semilla):
+    constantes = _constantes(tam_lote)
+    poblacion = _poblacion(constantes, tam_lote, semilla)
+    poblacion += _extremos(poblacion[0])
+
+    aptitudes, metricas = evaluate_population(poblacion, constantes, PESOS)
+    for i, cromosoma in enumerate(poblacion):
+        escalares = calculate_gallery_metrics(cromosoma, constantes, GENE_INDEX_MAP)
+        fila = population_metrics_row(metricas, i)
+        assert set(fila) == set(escalares)
+        for nombre, valor in escalares.items():
+            assert fila[nombre] == valor, (i, nombre)
+        assert aptitudes[i] == pytest.approx(calculate_fitness(escalares, PESOS), rel=1e-12, abs=1e-12)
+
+
+@pytest.mark.parametrize('tam_lote,semilla', [(3000, 4), (5000, 5), (5800, 6)])
+def test_kernel_igual_a_la_aptitud_escalar(tam_lote, semilla):
+    constantes = _constantes(tam_lote)
+    poblacion = _poblacion(constantes, tam_lote, semilla)
+    poblacion += _extremos(poblacion[0])
+
+    aptitudes = FitnessKernel(constantes, PESOS)(poblacion)
+    esperadas = [calculate_fitness(calculate_gallery_metrics(c, constantes, GENE_INDEX_MAP), PESOS)
+                 for c in poblacion]
+    assert aptitudes == pytest.approx(esperadas, rel=1e-12, abs=1e-12)
@@ -0,0 +1,57 @@
+import json
+import random
+import time
+
+import numpy as np
+
+from utils.ga_engine import STOP_PAUSED, run_ga
+
+USER_INPUTS = {'g_TamLot': 5000, 'b_CanPri': 2, 'b_CanSec': 3, 'comuna': 1}
+CONSTANTS = {'g_TamPar': 2000, 'g_TaUtPa': 1400}
+ARGS = (USER_INPUTS, CONSTANTS, 30, 25, 0.1, 0.05, 0.1, 0.7, (0.4, 0.5, 0.1))
+
+
+def _sembrar(semilla=7):
+    random.seed(semilla)
+    np.random.seed(semilla)
+
+
+def _json(estado):
+    # Como al guardarlo en CheckpointGaleria.estado (JSONB)
+    return json.loads(json.dumps(estado))
+
+
+def test_reanudar_da_la_misma_secuencia_que_sin_interrumpir():
+    _sembrar()
+    estados = []
+    completa = run_ga(*ARGS, checkpoint_every=10, on_checkpoint=lambda e: estados.append(_json(e)))
+    por_generacion = {estado['generation']: estado for estado in estados}
+    assert 10 in por_generacion and 20 in por_generacion
+
+    # Otro proceso: el RNG global no tiene nada que ver con el de la corrida original
+    _sembrar(99)
+    reanudados = []
+    reanudada = run_ga(*ARGS, checkpoint=por_generacion[10], checkpoint_every=10,
+                       on_checkpoint=lambda e: reanudados.append(_json(e)))
+
+    assert reanudada[0] == completa[0]
+    assert reanudada[1] == completa[1]
+    assert reanudada[2] == completa[2]
+    # El estado intermedio (población, aptitudes y RNG) coincide bit a bit
+    assert [e for e in reanudados if e['generation'] == 20] == [por_generacion[20]]
+
+
+def test_pausa_por_plazo_y_continuacion():
+    _sembrar()
+    completa = run_ga(*ARGS)
+
+    _sembrar()
+    estados, info = [], {}
+    run_ga(*ARGS, deadline=time.time(), on_checkpoint=lambda e: estados.append(_json(e)), info=info)
+    assert info['stop_reason'] == STOP_PAUSED
+    assert estados
+
+    _sembrar(99)
+    continuada = run_ga(*ARGS, checkpoint=estados[-1])
+    assert continuada[2] == completa[2]
+    assert continuada[0] == completa[0]
@@ -0,0 +1,65 @@
+from utils.fitness_cache import FitnessCache
+
+
+class Evaluador:
+    """Aptitud = suma de los genes; registra cada lote evaluado."""
+
+    def __init__(self):
+        self.lotes = []
+
+    def __call__(self, cromosomas):
+        self.lotes.append([tuple(c) for c in cromosomas])
+        return [float(sum(c)) for c in cromosomas]
+
+    @property
+    def evaluados(self):
+        return [c for lote in self.lotes for c in lote]
+
+
+def test_duplicados_y_elites_no_se_reevaluan():
+    cache = FitnessCache(max_size=100)
+    evaluador = Evaluador()
+    poblacion = [[1, 2], [3, 4], [1, 2], [5, 6], [3, 4]]
+    assert cache.evaluate(poblacion, evaluador) == [3.0, 7.0, 3.0, 11.0, 7.0]
+    # Un solo lote con cada cromosoma distinto una vez, en orden de aparición
+    assert evaluador.lotes == [[(1, 2), (3, 4), (5, 6)]]
+
+    # Siguiente generación: las élites ([5, 6], [1, 2]) vienen de la caché
+    siguiente = [[5, 6], [7, 8], [1, 2], [7, 8]]
+    assert cache.evaluate(siguiente, evaluador) == [11.0, 15.0, 3.0, 15.0]
+    assert evaluador.lotes[1:] == [[(7, 8)]]
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 7
+
+
+def test_poblacion_en_cache_no_llama_al_evaluador():
+    cache = FitnessCache()
+    evaluador = Evaluador()
+    poblacion = [[1], [2], [3]]
+    cache.evaluate(poblacion, evaluador)
+    assert cache.evaluate(list(reversed(poblacion)), evaluador) == [3.0, 2.0, 1.0]
+    assert len(evaluador.lotes) == 1
+    assert cache.stats()['hit_rate'] == 0.5
+
+
+def test_lru_respeta_max_size():
+    cache = FitnessCache(max_size=3)
+    evaluador = Evaluador()
+    cache.evaluate([[1], [2], [3]], evaluador)
+    cache.evaluate([[1]], evaluador)        # [1] pasa a ser el más reciente
+    cache.evaluate([[4]], evaluador)        # se descarta [2], el menos reciente
+    assert len(cache) == 3
+    assert cache.get((2,)) is None
+    assert cache.get((1,)) == 1.0 and cache.get((3,)) == 3.0 and cache.get((4,)) == 4.0
+    cache.evaluate([[2]], evaluador)
+    assert evaluador.evaluados.count((2,)) == 2
+    assert len(cache) == 3
+
+
+def test_max_size_cero_desactiva_la_cache():
+    cache = FitnessCache(max_size=0)
+    evaluador = Evaluador()
+    assert cache.evaluate([[1], [1]], evaluador) == [1.0, 1.0]
+    assert cache.evaluate([[1]], evaluador) == [1.0]
+    assert len(cache) == 0
+    assert evaluador.evaluados == [(1,), (1,)]
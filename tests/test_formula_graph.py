@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pytest
+
+from utils.formula_graph import get_formula_graph
+from utils.gene_space import get_gene_space
+from utils.genetic_algorithm import (
+    CONSTANTS,
+    GENE_INDEX_MAP,
+    calculate_gallery_metrics,
+    create_initial_population,
+    gene_definitions,
+    recalculate_dependent_genes,
+)
+
+INDICE = {info['name']: index for index, info in GENE_INDEX_MAP.items()}
+GENES_USUARIO = {INDICE['g_TamLot'], INDICE['b_CanPri'], INDICE['b_CanSec']}
+
+
+def _constantes(tam_lote):
+    return {**CONSTANTS, 'g_TamPar': tam_lote * 0.4, 'g_TaUtPa': tam_lote * 0.4 * 0.7}
+
+
+def _poblacion(constantes, tam_lote, semilla):
+    random.seed(semilla)
+    np.random.seed(semilla)
+    user_inputs = {'g_TamLot': tam_lote, 'b_CanPri': random.randint(0, 4), 'b_CanSec': random.randint(0, 4)}
+    return create_initial_population(60, gene_definitions, user_inputs, constantes)
+
+
+def _hijo(padre, cambios, rng):
+    """Copia de `padre` con `cambios` genes mapeados (no del usuario) distintos."""
+    space = get_gene_space(gene_definitions)
+    hijo = list(padre)
+    candidatos = [i for i in GENE_INDEX_MAP if i not in GENES_USUARIO]
+    for i in rng.sample(candidatos, cambios):
+        domain = space.domain(i)
+        for _ in range(50):
+            valor = domain.sample(rng)
+            if valor != padre[i]:
+                hijo[i] = valor
+                break
+        else:
+            hijo[i] = padre[i] + 1      # dominio de un solo valor: fuera de la rejilla
+    return hijo
+
+
+@pytest.mark.parametrize('tam_lote,semilla', [(3000, 1), (5000, 2), (5800, 3)])
+def test_evaluacion_completa_igual_a_calculate_gallery_metrics(tam_lote, semilla):
+    grafo = get_formula_graph()
+    constantes = _constantes(tam_lote)
+    for cromosoma in _poblacion(constantes, tam_lote, semilla):
+        assert grafo.evaluate(cromosoma, constantes) == calculate_gallery_metrics(cromosoma, constantes,
+                                                                                   GENE_INDEX_MAP)
+
+
+@pytest.mark.parametrize('cambios', [1, 2, 3])
+@pytest.mark.parametrize('tam_lote,semilla', [(3000, 4), (5000, 5), (5800, 6)])
+def test_reevaluacion_incremental_igual_a_la_completa(tam_lote, semilla, cambios):
+    grafo = get_formula_graph()
+    constantes = _constantes(tam_lote)
+    rng = random.Random(semilla * 10 + cambios)
+    for padre in _poblacion(constantes, tam_lote, semilla):
+        metricas_padre = grafo.evaluate(padre, constantes)
+        hijo = _hijo(padre, cambios, rng)
+        assert len(grafo.changed_genes(padre, hijo)) == cambios
+        esperadas = calculate_gallery_metrics(hijo, constantes, GENE_INDEX_MAP)
+        assert grafo.reevaluate(metricas_padre, padre, hijo) == esperadas
+
+
+def test_reevaluacion_con_genes_dependientes_recalculados():
+    grafo = get_formula_graph()
+    constantes = _constantes(5000)
+    random.seed(7)
+    for padre in _poblacion(constantes, 5000, 7):
+        hijo = recalculate_dependent_genes(list(padre), constantes)
+        esperadas = calculate_gallery_metrics(hijo, constantes, GENE_INDEX_MAP)
+        assert grafo.reevaluate(grafo.evaluate(padre, constantes), padre, hijo) == esperadas
+
+
+def test_hijo_identico_no_recalcula():
+    grafo = get_formula_graph()
+    constantes = _constantes(5000)
+    padre = _poblacion(constantes, 5000, 8)[0]
+    metricas = grafo.evaluate(padre, constantes)
+    assert grafo.reevaluate(metricas, padre, list(padre)) == metricas
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from utils.gene_space import DEPENDENT_GENES, GeneSpace, RangeDomain, get_gene_space
+from utils.genetic_algorithm import (
+    create_initial_population,
+    gene_definitions,
+    mutate_chromosome,
+    recalculate_dependent_genes,
+)
+
+
+def _dentro(valor, indice, base):
+    _, low, high, _ = DEPENDENT_GENES[indice]
+    return int(base * low) <= valor <= int(base * high)
+
+
+@pytest.mark.parametrize('start,end,increment', [(606, 757, 50), (30, 50, 50), (50, 75, 3), (0.60, 0.89, 0.03),
+                                                 (0.80, 0.99, 0.01), (5000, 6000, 100)])
+def test_rango_no_pasa_del_extremo(start, end, increment):
+    dominio = RangeDomain(start, end, increment)
+    valores = [dominio.value_at(k) for k in range(dominio.cardinality)]
+    assert valores[0] == start
+    assert max(valores) <= end
+    assert end - max(valores) < increment
+
+
+@pytest.mark.parametrize('tam_lote', [1010, 3000, 5000, 5800, 6000])
+def test_genes_dependientes_dentro_de_sus_cotas(tam_lote):
+    random.seed(tam_lote)
+    constantes = {'g_TamPar': tam_lote * 0.4, 'g_TaUtPa': tam_lote * 0.4 * 0.7}
+    user_inputs = {'g_TamLot': tam_lote, 'b_CanPri': 2, 'b_CanSec': 3}
+    poblacion = create_initial_population(200, gene_definitions, user_inputs, constantes)
+    assert poblacion
+    for c in poblacion:
+        assert _dentro(c[1], 1, c[0])
+        assert _dentro(c[2], 2, c[1]) and _dentro(c[3], 3, c[1])
+        assert _dentro(c[4], 4, constantes['g_TamPar'])
+        assert _dentro(c[5], 5, constantes['g_TaUtPa'])
+
+    for c in poblacion:
+        for _ in range(20):
+            c = recalculate_dependent_genes(mutate_chromosome(c, gene_definitions, 0.5, 0.3), constantes)
+            g_TamPar = c[0] - c[1]
+            assert _dentro(c[1], 1, c[0])
+            assert _dentro(c[2], 2, c[1]) and _dentro(c[3], 3, c[1])
+            assert _dentro(c[4], 4, g_TamPar)
+            assert _dentro(c[5], 5, g_TamPar - c[4])
+
+
+def test_genes_con_rejilla_dentro_de_sus_cotas():
+    space = get_gene_space(gene_definitions)
+    rng = random.Random(0)
+    for i in range(len(space)):
+        low, high = space.bounds(i)
+        for _ in range(200):
+            assert low <= space.sample(i, rng) <= high
+        assert low <= space.snap(i, high * 10) <= high
+
+
+def test_dominio_dependiente_acotado():
+    assert list(GeneSpace.dependent_domain(1, 1010)._values) == [606, 656, 706, 756]
+    assert list(GeneSpace.dependent_domain(2, 200)._values) == [30]
@@ -0,0 +1,135 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from utils.job_queue import JOB_CANCELLED, JOB_QUEUED, JOB_RUNNING, JobQueue, QueueFullError, UserLimitError
+
+GALERIAS = [{'numero': n, 'comuna': n, 'tam_lote': 5000 + 100 * n, 'can_pri': 2, 'can_sec': 3}
+            for n in range(1, 8)]
+
+
+def _esperar(condicion, timeout=5):
+    limite = time.time() + timeout
+    while not condicion():
+        assert time.time() < limite
+        time.sleep(0.01)
+
+
+def test_otro_usuario_adelanta_al_que_esta_en_su_limite():
+    cola = JobQueue(workers=2, max_queued=10, max_running_per_user=1)
+    liberar = threading.Event()
+    cola.submit('a0', liberar.wait, 5, user_key='a')
+    _esperar(lambda: cola.get('a0').state == JOB_RUNNING)
+    cola.submit('a1', liberar.wait, 5, user_key='a')
+    cola.submit('b0', liberar.wait, 5, user_key='b')
+    # b0 llegó después pero a1 espera por el límite de su usuario
+    _esperar(lambda: cola.get('b0').state == JOB_RUNNING)
+    assert cola.get('a1').state == JOB_QUEUED
+    assert cola.position('a1') == 1
+    liberar.set()
+
+
+def test_orden_equitativo_entre_usuarios():
+    cola = JobQueue(workers=1, max_queued=10)
+    liberar = threading.Event()
+    orden = []
+    cola.submit('bloqueo', liberar.wait, 5, user_key='x')
+    _esperar(lambda: cola.get('bloqueo').state == JOB_RUNNING)
+    for job_id, user_key in (('a0', 'a'), ('a1', 'a'), ('a2', 'a'), ('b0', 'b'), ('c0', 'c')):
+        cola.submit(job_id, orden.append, job_id, user_key=user_key)
+    assert sorted(('a0', 'a1', 'a2', 'b0', 'c0'), key=cola.position) == ['a0', 'b0', 'c0', 'a1', 'a2']
+    liberar.set()
+    _esperar(lambda: len(orden) == 5)
+    assert orden == ['a0', 'b0', 'c0', 'a1', 'a2']
+
+
+def test_replace_no_cuenta_las_corridas_en_cola_del_usuario():
+    cola = JobQueue(workers=1, max_queued=2, max_queued_per_user=1, budget_per_hour=100)
+    liberar = threading.Event()
+    cola.submit('b0', liberar.wait, 5, user_key='b', cost=10)
+    _esperar(lambda: cola.get('b0').state == JOB_RUNNING)
+    cola.submit('a1', lambda: None, user_key='a', cost=60)
+
+    # Sin replace, a2 excede el límite en cola y el presupuesto de 'a'
+    with pytest.raises(UserLimitError):
+        cola.submit('a2', lambda: None, user_key='a', cost=60)
+    assert cola.get('a1').state == JOB_QUEUED
+
+    # Con replace, a1 no cuenta: a2 se admite y a1 sigue en cola hasta que
+    # quien llama la cancele (y se le devuelve su costo)
+    cola.submit('a2', lambda: None, user_key='a', cost=60, replace=True)
+    assert cola.get('a1').state == JOB_QUEUED
+    assert cola.cancel('a1')
+    assert cola.get('a1').state == JOB_CANCELLED
+    cola.charge('a', 40)    # 60 de a2 + 40: cabe solo si se devolvió el costo de a1
+
+    # La cola llena rechaza aunque sea un reemplazo
+    cola.submit('c0', lambda: None, user_key='c')
+    with pytest.raises(QueueFullError):
+        cola.submit('d0', lambda: None, user_key='d', replace=True)
+    liberar.set()
+
+
+def test_reemplazo_cancela_la_anterior_solo_si_la_nueva_es_admitida(flask_app, monkeypatch):
+    import app as aplicacion
+
+    monkeypatch.setattr(aplicacion, 'SYNC_MODE', False)
+    monkeypatch.setitem(flask_app.config, 'GA_CANCEL_PREVIOUS', True)
+    user_key = 'test-' + uuid.uuid4().hex[:8]
+    anterior = threading.Event()
+    monkeypatch.setitem(aplicacion._CORRIDAS_EN_CURSO, f"{user_key}:anterior", ('run-anterior', anterior))
+    cliente = flask_app.test_client()
+    cliente.set_cookie('user_key', user_key)
+    with cliente.session_transaction() as sesion:
+        sesion['galerias_existentes'] = GALERIAS
+        sesion['weights'] = [0.4, 0.5, 0.1]
+
+    # Cola llena: la nueva se rechaza y la anterior sigue
+    monkeypatch.setattr(aplicacion, 'job_queue', JobQueue(workers=1, max_queued=0))
+    assert cliente.post('/procesar_todas_galerias').status_code == 429
+    assert not anterior.is_set()
+
+    # Admitida: recién entonces se cancela la anterior (y no la nueva)
+    cola = JobQueue(workers=1, max_queued=4)
+    liberar = threading.Event()
+    cola.submit('ocupado', liberar.wait, 5, user_key='otro')
+    monkeypatch.setattr(aplicacion, 'job_queue', cola)
+    respuesta = cliente.post('/procesar_todas_galerias')
+    assert respuesta.status_code == 200
+    assert anterior.is_set()
+    nueva = cola.active_jobs(user_key)
+    assert [job.state for job in nueva] == [JOB_QUEUED]
+    cola.cancel(nueva[0].job_id)
+    liberar.set()
+
+
+def test_corrida_reanudada_se_cobra_una_vez(flask_app, monkeypatch):
+    import app as aplicacion
+    from app import _costo_corrida, _guardar_checkpoint_run
+
+    monkeypatch.setattr(aplicacion, 'SYNC_MODE', False)
+    run_id = str(uuid.uuid4())
+    user_key = 'test-' + run_id[:8]
+    costo = _costo_corrida(40, 100, GALERIAS)
+    cola = JobQueue(workers=1, max_queued=4, budget_per_hour=costo)
+    liberar = threading.Event()
+    cola.submit('ocupado', liberar.wait, 5, user_key='otro')
+    monkeypatch.setattr(aplicacion, 'job_queue', cola)
+    # Se cobró al iniciar la corrida
+    cola.charge(user_key, costo)
+    with flask_app.app_context():
+        _guardar_checkpoint_run(run_id, user_key, 'hilo', {
+            'galerias': GALERIAS, 'weights': [0.4, 0.5, 0.1], 'engine': 'generacional',
+            'ga_params': {'population_size': 40, 'max_generations': 100, 'elite_percentage': 0.1,
+                          'mutation_rate': 0.05, 'sigma_factor': 0.1, 'crossover_rate': 0.7},
+        })
+
+    cliente = flask_app.test_client()
+    cliente.set_cookie('user_key', user_key)
+    assert cliente.post(f'/api/continuar/{run_id}').status_code == 200
+    [job] = cola.active_jobs(user_key)
+    assert job.cost == 0
+    cola.cancel(job.job_id)
+    liberar.set()
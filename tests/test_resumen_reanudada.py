@@ -0,0 +1,55 @@
+import time
+import uuid
+
+import pytest
+
+import app as aplicacion
+from app import SUMAS_RESUMEN, _costo_corrida, _ns, guardar_resumen_run, procesar_todas_galerias, run_store
+from extensions import db
+from models import CheckpointRun, ResumenRun
+
+GALERIAS = [{'numero': n, 'comuna': n, 'tam_lote': 4000 + 500 * n, 'can_pri': 2, 'can_sec': 3}
+            for n in range(1, 8)]
+
+
+def test_resumen_de_corrida_pausada_y_retomada(flask_app, monkeypatch):
+    # Tramos cortos: la corrida se pausa y las galerías guardadas en tramos
+    # anteriores se recargan desde la BD al retomarla
+    monkeypatch.setattr(aplicacion, 'SYNC_MODE', True)
+    monkeypatch.setattr(aplicacion, 'persistencia', None)  # como en SYNC_MODE (GA_WRITE_BEHIND=0)
+    monkeypatch.setitem(flask_app.config, 'GA_CHECKPOINTS', True)
+    monkeypatch.setitem(flask_app.config, 'GA_CHECKPOINT_EVERY', 10)
+    monkeypatch.setitem(flask_app.config, 'GA_WORKERS', 1)
+    monkeypatch.setitem(flask_app.config, 'SYNC_TIME_BUDGET', 0.5)
+
+    run_id = str(uuid.uuid4())
+    user_key = 'test-' + run_id[:8]
+    thread_id = str(time.time())
+    run_store.reset_log(_ns(user_key, thread_id))
+    # El presupuesto alcanza justo para la corrida: sus tramos no lo vuelven a cobrar
+    costo = _costo_corrida(40, 200, GALERIAS)
+    monkeypatch.setattr(aplicacion.job_queue, 'budget_per_hour', costo)
+    aplicacion.job_queue.charge(user_key, costo)
+    completada = procesar_todas_galerias(
+        flask_app, thread_id, GALERIAS, 40, 200, 0.1, 0.05, 0.1, 0.7, [0.4, 0.5, 0.1],
+        run_id, user_key, 'generacional', deadline=time.time() + 0.5)
+    assert not completada
+
+    cliente = flask_app.test_client()
+    cliente.set_cookie('user_key', user_key)
+    for _ in range(200):
+        respuesta = cliente.post(f'/api/continuar/{run_id}')
+        assert respuesta.status_code == 200
+        if respuesta.get_json()['completed']:
+            break
+    else:
+        raise AssertionError("la corrida no terminó")
+
+    with flask_app.app_context():
+        assert CheckpointRun.query.filter_by(user_key=user_key, run_id=run_id).one().terminada
+        guardado = ResumenRun.query.filter_by(user_key=user_key, run_id=run_id).one()
+        esperado = guardar_resumen_run(run_id, user_key, commit=False)
+        db.session.rollback()
+        assert guardado.sum_ing_total > 0
+        for columna in ('total_inversion', 'total_utilidad', 'prom_fitness') + tuple(SUMAS_RESUMEN):
+            assert float(getattr(guardado, columna)) == pytest.approx(float(esperado[columna])), columna
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from utils.progress import (GALLERY_FINISHED, GALLERY_STARTED, GENERATION, NEW_BEST, RUN_FINISHED,
+                            RUN_STARTED, render)
+from utils.run_store import RunStore, create_run_store
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return RunStore(max_lines=5, ttl=60, idle_ttl=600)
+    return create_run_store(f"sqlite:///{tmp_path / 'runs.db'}", max_lines=5, ttl=60, idle_ttl=600)
+
+
+def _escenario(store):
+    """Corrida de dos galerías: logs, eventos, progreso y resultado."""
+    store.reset_log('u:1', ['inicio'])
+    store.emit('u:1', RUN_STARTED)
+    store.log('u:1').append('texto libre')
+    for galeria in (1, 2):
+        store.emit('u:1', GALLERY_STARTED, gallery=galeria, max_generations=3)
+        for generacion in (1, 2, 3):
+            store.emit('u:1', GENERATION, record=generacion == 3, gallery=galeria, max_generations=3,
+                       generation=generacion, best_fitness=0.5 + generacion / 10)
+        store.emit('u:1', NEW_BEST, gallery=galeria, generation=3, best_fitness=0.8)
+        store.emit('u:1', GALLERY_FINISHED, gallery=galeria, roi=0.1 * galeria, best_fitness=0.8,
+                   stop_reason='max_generaciones', generations=3)
+    store.emit('u:1', RUN_FINISHED)
+    store.set_result('u:1', {'mejor_comuna': 2, 'galerias': {'1': [0.1, 0.8]}})
+    # Otra corrida sin terminar
+    store.emit('u:2', RUN_STARTED)
+
+
+def _vista(store):
+    log = store.get_log('u:1')
+    lineas, inicio, total = log.since(0)
+    recientes, inicio_2, _ = log.since(total - 2)
+    return {
+        'estado': (store.state('u:1'), store.state('u:2'), store.state('no-existe')),
+        'lineas': store.lines('u:1'),
+        'since': ([render(linea) for linea in lineas], inicio, total),
+        'since_2': ([render(linea) for linea in recientes], inicio_2),
+        'progreso': store.get_progress('u:1')[1],
+        'resultado': store.get_result('u:1'),
+        'con_resultado': (store.has_result('u:1'), store.has_result('u:2'), sorted(store.result_keys())),
+        'claves': sorted(store.keys()),
+    }
+
+
+def test_mismo_estado_en_memoria_y_sqlite(tmp_path):
+    memoria = RunStore(max_lines=5, ttl=60, idle_ttl=600)
+    sqlite = create_run_store(f"sqlite:///{tmp_path / 'runs.db'}", max_lines=5, ttl=60, idle_ttl=600)
+    _escenario(memoria)
+    _escenario(sqlite)
+    assert _vista(sqlite) == _vista(memoria)
+
+
+def test_escenario(store):
+    _escenario(store)
+    vista = _vista(store)
+    assert vista['estado'][0] == 'completado' and vista['estado'][2] is None
+    # Se conservan las últimas max_lines líneas
+    assert len(vista['lineas']) == 5
+    assert vista['since'][1:] == (vista['since'][2] - 5, vista['since'][2])
+    assert set(vista['progreso']) == {1, 2}
+    assert vista['progreso'][2]['generation'] == 3
+    assert vista['con_resultado'] == (True, False, ['u:1'])
+    version, _ = store.get_progress('u:1')
+    store.emit('u:1', GENERATION, record=False, gallery=1, generation=4, max_generations=3)
+    assert store.get_progress('u:1')[0] != version
+
+
+def test_sweep(store):
+    _escenario(store)
+    ahora = time.time()
+    # Terminada y sin actividad más allá de ttl: se elimina; la otra sigue hasta idle_ttl
+    assert store.sweep(ahora + 120) == 1
+    assert store.keys() == ['u:2']
+    assert store.sweep(ahora + 1200) == 1
+    assert store.keys() == []
+    store.reset_log('u:3')
+    store.discard('u:3')
+    assert 'u:3' not in store
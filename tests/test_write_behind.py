@@ -0,0 +1,106 @@
+import os
+import threading
+
+from utils.write_behind import WriteBehindWriter
+
+
+class Escritor:
+    """`write` de prueba: guarda los lotes; puede caerse, rechazar elementos o esperar."""
+
+    def __init__(self):
+        self.lotes = []
+        self.caido = False
+        self.rechazados = set()
+        self.bloqueo = None
+        self.bloqueado = threading.Event()
+
+    def __call__(self, items):
+        if self.bloqueo is not None and 'bloqueo' in items:
+            self.bloqueado.set()
+            self.bloqueo.wait(5)
+        if self.caido:
+            raise ConnectionError("la BD no responde")
+        malos = [item for item in items if isinstance(item, str) and item in self.rechazados]
+        if malos:
+            raise ValueError(f"fila inválida: {sorted(malos)}")
+        self.lotes.append(list(items))
+
+    @property
+    def escritos(self):
+        return [item for lote in self.lotes for item in lote]
+
+
+def _writer(escritor, journal, **kwargs):
+    return WriteBehindWriter(escritor, journal_path=str(journal), retries=1, backoff=0,
+                             replay_interval=3600, is_transient=lambda e: isinstance(e, ConnectionError),
+                             **kwargs)
+
+
+def test_falla_transitoria_va_al_journal_y_replay_lo_escribe(tmp_path):
+    escritor = Escritor()
+    escritor.caido = True
+    journal = tmp_path / 'pendientes.jsonl'
+    writer = _writer(escritor, journal)
+    eventos = []
+    writer.submit('a', on_done=lambda: eventos.append('done'), on_spill=lambda e: eventos.append('spill'))
+    assert writer.flush(5)
+    assert eventos == ['spill']
+    assert writer.journal_size() == 1
+    assert writer.stats()['retries'] == 1
+
+    # Mientras la BD siga caída, replay no escribe nada y el journal se conserva
+    assert writer.replay() == 0
+    assert writer.journal_size() == 1
+
+    escritor.caido = False
+    assert writer.replay() == 1
+    assert escritor.escritos == ['a']
+    assert eventos == ['spill', 'done']
+    assert not journal.exists()
+    writer.close()
+
+
+def test_elemento_invalido_solo_falla_el_suyo(tmp_path):
+    escritor = Escritor()
+    escritor.bloqueo = threading.Event()
+    escritor.rechazados = {'malo'}
+    writer = _writer(escritor, tmp_path / 'pendientes.jsonl')
+    hechos, errores = [], []
+    writer.submit('bloqueo')
+    # Mientras el hilo escribe 'bloqueo', los siguientes se juntan en un lote
+    for item in ('a', 'malo', 'b'):
+        writer.submit(item, on_done=lambda item=item: hechos.append(item),
+                      on_error=lambda e, item=item: errores.append((item, e)))
+    escritor.bloqueo.set()
+    assert writer.flush(5)
+    assert sorted(hechos) == ['a', 'b']
+    assert [item for item, _ in errores] == ['malo']
+    assert isinstance(errores[0][1], ValueError)
+    assert sorted(escritor.escritos) == ['a', 'b', 'bloqueo']
+    assert writer.journal_size() == 0
+    writer.close()
+
+
+def test_close_deja_en_el_journal_lo_encolado(tmp_path):
+    escritor = Escritor()
+    escritor.bloqueo = threading.Event()
+    journal = tmp_path / 'pendientes.jsonl'
+    writer = _writer(escritor, journal, batch_size=1)
+    derramados = []
+    writer.submit('bloqueo')
+    for item in ('a', 'b'):
+        writer.submit({'fila': item}, on_spill=lambda e, item=item: derramados.append(item))
+    assert escritor.bloqueado.wait(5)
+    writer.close(timeout=0.2)
+    escritor.bloqueo.set()
+    writer._thread.join(5)
+    assert escritor.escritos == ['bloqueo']
+    assert sorted(derramados) == ['a', 'b']
+    assert writer.journal_size() == 2
+
+    # Tras reiniciar el proceso, otro escritor con el mismo journal los escribe
+    otro = _writer(escritor, journal)
+    assert otro.replay() == 2
+    assert {'fila': 'a'} in escritor.escritos and {'fila': 'b'} in escritor.escritos
+    assert not os.path.exists(journal)
+    otro.close()
@@ -0,0 +1,463 @@
+import numpy as np
+
+from utils.genetic_algorithm import GENE_INDEX_MAP
+
+
+def population_to_array(population):
+    """
+    Convierte una población (lista de cromosomas) en una matriz 2-D de NumPy.
+
+    Args:
+        population (list | np.ndarray): Lista de cromosomas o matriz ya construida.
+
+    Returns:
+        np.ndarray: Matriz float64 de forma (individuos, genes).
+    """
+    array = np.asarray(population, dtype=np.float64)
+    if array.ndim == 1:
+        array = array.reshape(1, -1)
+    return array
+
+
+def _safe_divide(numerator, denominator):
+    """
+    División elemento a elemento que devuelve 0 donde el denominador es 0,
+    igual que las expresiones `a / b if b != 0 else 0` de la versión escalar.
+    """
+    numerator, denominator = np.broadcast_arrays(
+        np.asarray(numerator, dtype=np.float64),
+        np.asarray(denominator, dtype=np.float64),
+    )
+    out = np.zeros(numerator.shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def calculate_population_metrics(population, constants, gene_index_map=None):
+    """
+    Calcula todas las métricas de la galería para una población completa a la vez.
+
+    Es la versión vectorizada de `calculate_gallery_metrics`: cada locus se calcula
+    como una operación por columnas sobre la matriz de la población, respetando el
+    mismo orden de operaciones para obtener exactamente los mismos valores.
+
+    Args:
+        population (list | np.ndarray): Población como lista de cromosomas o matriz 2-D.
+        constants (dict): Diccionario de valores constantes no incluidos en el cromosoma.
+        gene_index_map (dict): Mapa de índices de cromosoma a nombres de variables.
+            Por defecto se usa `GENE_INDEX_MAP`.
+
+    Returns:
+        dict: Métricas por nombre. Los loci que dependen de genes son arreglos de
+        longitud igual al tamaño de la población; los que solo dependen de
+        constantes se conservan como escalares.
+    """
+    if gene_index_map is None:
+        gene_index_map = GENE_INDEX_MAP
+
+    genes = population_to_array(population)
+
+    m = {}
+    m.update(constants)
+
+    # 1. Asignar las columnas de genes a las métricas
+    for index, gene_info in gene_index_map.items():
+        column = genes[:, index]
+        if gene_info['is_percentage']:
+            m[gene_info['name']] = column / 100.0
+        else:
+            m[gene_info['name']] = column
+
+    # 2. Genes de Galería (Cálculos iniciales)
+    m['g_TaUtCo'] = m['g_TamCom'] - (m['g_TaZoCo'] + m['g_AreVer'])
+    m['g_TamPar'] = m['g_TamLot'] - m['g_TamCom']
+    m['g_TaUtPa'] = m['g_TamPar'] - m['g_TaCiPa']
+    m['g_TaZoMo'] = m['g_TaUtPa'] - m['g_TaZoAu']
+    m['g_TaUtCo'] = np.maximum(0, m['g_TaUtCo'])
+    m['g_TaZoMo'] = np.maximum(0, m['g_TaZoMo'])
+
+    # 3. Inversión Inicial
+    m['l_PLTi12'] = 1 - (m['l_PLTi25'] + m['l_PLTi20'] + m['l_PLTi16'])
+    m['l_PLTi12'] = np.maximum(0, m['l_PLTi12'])
+
+    for size in (25, 20, 16, 12):
+        m[f'l_TLTi{size}'] = np.trunc(m[f'l_PLTi{size}'] * m['g_TaUtCo'])
+        m[f'l_CLTi{size}'] = np.trunc(m[f'l_TLTi{size}'] / size)
+        m[f'l_CULT{size}'] = m['g_CoCoLo'] * size
+        m[f'l_CTLo{size}'] = m[f'l_CLTi{size}'] * m[f'l_CULT{size}']
+
+    m['l_CTCLo'] = m['l_CTLo25'] + m['l_CTLo20'] + m['l_CTLo16'] + m['l_CTLo12']
+
+    m['p_CTPCl1'] = m['g_TaZoAu'] * m['p_CoCoPa']
+    m['p_CTPCl2'] = m['g_TaZoMo'] * m['p_CoCoPa']
+    m['p_SCTPar'] = m['p_CTPCl1'] + m['p_CTPCl2']
+
+    m['z_CoTOAd'] = m['z_TaOfAd'] * m['g_CoCoLo']
+    m['z_CoTBAd'] = m['z_TaBoAd'] * m['g_CoCoLo']
+    m['z_CoTCAd'] = m['z_TaCaAd'] * m['g_CoCoLo']
+    m['z_CoTBCo'] = m['z_TaBaCo'] * m['g_CoCoLo']
+    m['z_CoTZCi'] = m['g_TaZoCo'] * m['z_CoZoCi']
+    m['z_TaUrAV'] = m['g_AreVer'] - (m['z_TaOfAd'] + m['z_TaBoAd'] + m['z_TaCaAd'] + m['z_TaBaCo'])
+    m['z_TaUrAV'] = np.maximum(0, m['z_TaUrAV'])
+    m['z_CoTUrAV'] = m['z_TaUrAV'] * m['z_CoUrAV']
+    m['z_CTZcAv'] = m['z_CoTOAd'] + m['z_CoTBAd'] + m['z_CoTCAd'] + \
+                    m['z_CoTBCo'] + m['z_CoTZCi'] + m['z_CoTUrAV']
+
+    m['i_InvIni'] = m['l_CTCLo'] + m['p_SCTPar'] + m['z_CTZcAv']
+
+    # 4. Ingresos
+    m['a_VTLo25'] = 25 * m['g_VaArMe'] * 0.9
+    m['a_VTLo20'] = 20 * m['g_VaArMe'] * 0.93
+    m['a_VTLo16'] = 16 * m['g_VaArMe'] * 0.95
+    m['a_VTLo12'] = 12 * m['g_VaArMe']
+    for size in (25, 20, 16, 12):
+        m[f'a_SVTL{size}'] = m[f'l_CLTi{size}'] * m[f'a_VTLo{size}']
+        m[f'a_VTAA{size}'] = 12 * m[f'a_SVTL{size}']
+    m['a_ToArGa'] = m['a_VTAA25'] + m['a_VTAA20'] + m['a_VTAA16'] + m['a_VTAA12']
+
+    m['d_DVTL25'] = 25 * m['g_DVALMe'] * 0.9
+    m['d_DVTL20'] = 20 * m['g_DVALMe'] * 0.93
+    m['d_DVTL16'] = 16 * m['g_DVALMe'] * 0.95
+    m['d_DVTL12'] = 12 * m['g_DVALMe']
+    for size in (25, 20, 16, 12):
+        m[f'd_SDTL{size}'] = m[f'l_CLTi{size}'] * m[f'd_DVTL{size}']
+        m[f'd_VTAD{size}'] = 12 * m[f'd_SDTL{size}']
+    m['d_ToAdGa'] = m['d_VTAD25'] + m['d_VTAD20'] + m['d_VTAD16'] + m['d_VTAD12']
+
+    m['q_CanCl1'] = np.trunc(m['g_TaZoAu'] / m['q_EspCl1'])
+    m['q_Va1Cl1'] = m['q_CanCl1'] * m['q_Co1Cl1']
+    m['q_Va2Cl1'] = m['q_CanCl1'] * m['q_Co2Cl1']
+    m['q_VTMCl1'] = m['q_Va1Cl1'] + m['q_Va2Cl1']
+    m['q_ToCCl1'] = 12 * m['q_VTMCl1']
+
+    m['q_CanCl2'] = np.trunc(m['g_TaZoMo'] / m['q_EspCl2'])
+    m['q_Va1Cl2'] = m['q_CanCl2'] * m['q_Co1Cl2']
+    m['q_Va2Cl2'] = m['q_CanCl2'] * m['q_Co2Cl2']
+    m['q_VTMCl2'] = m['q_Va1Cl2'] + m['q_Va2Cl2']
+    m['q_ToCCl2'] = 12 * m['q_VTMCl2']
+
+    m['q_ToPaGa'] = m['q_ToCCl1'] + m['q_ToCCl2']
+    m['u_IngGal'] = m['a_ToArGa'] + m['d_ToAdGa'] + m['q_ToPaGa']
+
+    # 5. Egresos
+    m['m_TaArCo'] = m['g_TaZoCo'] + m['z_TaUrAV']
+    m['m_STMPCo'] = m['m_CaPeCo'] * m['m_SaPeCo']
+    m['m_STAPCo'] = 12 * m['m_STMPCo']
+    m['m_CMReMe'] = m['m_CaReMe'] * m['m_CUReMe']
+    m['m_CAnRMe'] = 12 * m['m_CMReMe']
+    m['m_InReMe'] = 0.6 * m['m_CUReMe']
+    m['m_InReAn'] = 12 * m['m_InReMe']
+    m['m_ToEgGa'] = m['m_STAPCo'] + m['m_CAnRMe'] + m['m_InReAn']
+
+    m['s_CoToEM'] = m['s_CanBom'] * m['s_CoCoUB'] * m['s_TarCME']
+    m['s_CoToEA'] = 12 * m['s_CoToEM']
+    m['s_CoToAM'] = m['s_MeCuAg'] * m['s_TarCMA']
+    m['s_CoToAA'] = 12 * m['s_CoToAM']
+    m['s_CoToGM'] = m['s_MeCuGa'] * m['s_TarCMG']
+    m['s_CoToGA'] = 12 * m['s_CoToGM']
+    m['s_CoToIA'] = 12 * m['s_CoToIM']
+    m['s_ToSPGa'] = m['s_CoToEA'] + m['s_CoToAA'] + m['s_CoToGM'] + m['s_CoToIA']
+
+    m['o_AdAnGa'] = 12 * m['o_AdmGal']
+    m['o_AsAnGa'] = 12 * m['o_AsiGal']
+    m['o_ToSaGa'] = m['o_AdAnGa'] + m['o_AsAnGa']
+
+    m['v_SaToML'] = m['v_CaEmLi'] * m['v_SaMeLi']
+    m['v_SaAnLi'] = 12 * m['v_SaToML']
+    m['v_SaToMV'] = m['v_CaEmVi'] * m['v_SaMeVi']
+    m['v_SaAnVi'] = 12 * m['v_SaToMV']
+    m['v_ToSOGa'] = m['v_SaAnLi'] + m['v_SaAnVi']
+
+    m['n_PAOfAn'] = 12 * m['n_PaOfMe']
+    m['n_SeAdAn'] = 12 * m['n_SeAdMe']
+    m['n_ToGAGa'] = m['n_PAOfAn'] + m['n_SeAdAn']
+
+    m['t_ReMeAn'] = 12 * m['t_ReMeMe']
+    m['t_ToRMGa'] = m['t_ReMeAn']
+
+    m['u_EgrGal'] = m['m_ToEgGa'] + m['s_ToSPGa'] + m['o_ToSaGa'] + \
+                    m['v_ToSOGa'] + m['n_ToGAGa'] + m['t_ToRMGa']
+
+    # 6. Resultados Económicos y Financieros
+    m['u_UtBrGa'] = m['u_IngGal'] - m['u_EgrGal']
+    m['c_ICAAno'] = 0.06 * m['u_IngGal']
+    m['c_PreAno'] = 0.08 * m['i_InvIni']
+    m['c_RenAno'] = 0.35 * m['u_UtBrGa']
+    m['c_LiFuAn'] = 12 * m['c_LiFuMe']
+    m['c_LiAmAn'] = 12 * m['c_LiAmMe']
+    m['u_ImpGas'] = m['c_ICAAno'] + m['c_PreAno'] + m['c_RenAno'] + \
+                    m['c_LiFuAn'] + m['c_LiAmAn']
+    m['u_UtNeGa'] = m['u_UtBrGa'] - m['u_ImpGas']
+    m['u_MarUtN'] = _safe_divide(m['u_UtNeGa'], m['u_IngGal'])
+    m['u_ROIGal'] = _safe_divide(m['u_UtNeGa'], m['i_InvIni']) * 100
+    m['ROI'] = m['u_ROIGal'] / 100
+    m['u_BenCos'] = _safe_divide(m['u_UtNeGa'], m['u_EgrGal'])
+
+    # 7. Beneficio Social - Accesibilidad
+    m['b_PonPri'] = m['b_CanPri'] / 4
+    m['b_PonSec'] = m['b_CanSec'] / 8
+    m['b_ToPVia'] = np.minimum(m['b_PonPri'] + m['b_PonSec'], 1)
+    m['e_CaPoEs'] = (m['e_CaZoRe'] + m['e_CaEsPa']) / 2
+    m['e_Accesi'] = (m['b_ToPVia'] + m['e_CaTrPu'] + m['e_CaPoEs']) / 3
+
+    # 8. Beneficio Social - Impacto en la Comunidad
+    m['w_TMED25'] = m['l_CLTi25'] * 4
+    m['w_ToED25'] = m['w_CPEm25'] * m['l_CLTi25']
+    m['w_TMED20'] = m['l_CLTi20'] * 3
+    m['w_ToED20'] = m['w_CPEm20'] * m['l_CLTi20']
+    m['w_TMED16'] = m['l_CLTi16'] * 2
+    m['w_ToED16'] = m['w_CPEm16'] * m['l_CLTi16']
+    m['w_TMED12'] = m['l_CLTi12'] * 1
+    m['w_ToED12'] = m['w_CPEm12'] * m['l_CLTi12']
+
+    m['w_STMEDi'] = m['w_TMED25'] + m['w_TMED20'] + m['w_TMED16'] + \
+                    m['w_TMED12'] + m['m_CaPeCo'] + 1 + 1 + \
+                    m['v_CaEmLi'] + m['v_CaEmVi']
+    m['w_STEmDi'] = m['w_ToED25'] + m['w_ToED20'] + m['w_ToED16'] + \
+                    m['w_ToED12'] + m['m_CaPeCo'] + 1 + 1 + \
+                    m['v_CaEmLi'] + m['v_CaEmVi']
+
+    m['x_TMEIPr'] = (m['l_CLTi25'] + m['l_CLTi20'] + m['l_CLTi16'] + m['l_CLTi12']) * 3
+    m['x_ToEIPr'] = m['x_CPInPr'] * (m['l_CLTi25'] + m['l_CLTi20'] + m['l_CLTi16'] + m['l_CLTi12'])
+    m['x_STMEIn'] = m['x_TMEIPr'] + m['x_TMEILg'] + m['x_TMEIMn'] + \
+                    m['x_TMEIZv'] + m['x_TMEIEx']
+    m['x_STEmIn'] = m['x_ToEIPr'] + m['x_CPInLg'] + m['x_CPInMn'] + \
+                    m['x_CPInZv'] + m['x_CPInEx']
+    m['x_Empleo'] = m['w_STEmDi'] + m['x_STEmIn']
+    m['x_InEmGe'] = _safe_divide(m['x_Empleo'], m['w_STMEDi'] + m['x_STMEIn'])
+    m['h_ImpCom'] = (m['x_InEmGe'] + m['h_CaMeIn'] + \
+                     m['h_CaPeCo_comunidad'] + m['h_CaInSo']) / 4
+
+    # 9. Resultados Beneficio Social (Calidad de Vida)
+    m['k_CalVid'] = (m['k_CaPABS'] + m['k_CaPeCo_comodidad'] + \
+                     m['k_CaPeSe'] + m['k_CaPeEn']) / 4
+    m['u_BenSoc'] = (m['e_Accesi'] + m['h_ImpCom'] + m['k_CalVid']) / 3
+
+    # 10. Información Complementaria - Áreas Comerciales
+    m['y_ToLoCo'] = m['l_CLTi25'] + m['l_CLTi20'] + m['l_CLTi16'] + m['l_CLTi12']
+    m['y_CLoAlF'] = np.trunc(m['y_ProAlF'] * m['y_ToLoCo'])
+    m['y_CLoCoP'] = np.trunc(m['y_ProCoP'] * m['y_ToLoCo'])
+    m['y_CLoNAl'] = np.trunc(m['y_ProNAl'] * m['y_ToLoCo'])
+    m['y_CLoSeC'] = m['y_ToLoCo'] - (m['y_CLoAlF'] - m['y_CLoCoP'] - m['y_CLoNAl'])
+
+    return m
+
+
+def calculate_population_fitness(metrics, weights=None):
+    """
+    Calcula la aptitud de toda la población a partir de las métricas vectorizadas.
+
+    Args:
+        metrics (dict): Métricas devueltas por `calculate_population_metrics`.
+        weights (tuple): Pesos (w1, w2, w3) para BE, BS, MUN. Por defecto (0.4, 0.5, 0.1).
+
+    Returns:
+        np.ndarray: Arreglo con la aptitud de cada individuo.
+    """
+    if weights is None:
+        w1, w2, w3 = 0.4, 0.5, 0.1  # BE, BS, MUN
+    else:
+        w1, w2, w3 = weights
+
+    be_component = np.asarray(metrics.get('u_BenCos', 0.0), dtype=np.float64)
+    bs_component = np.asarray(metrics.get('u_BenSoc', 0.0), dtype=np.float64)
+    mun_component = np.asarray(metrics.get('u_MarUtN', 0.0), dtype=np.float64)
+
+    # Misma sigmoide que `calculate_fitness` (k=2, x0=1)
+    with np.errstate(over='ignore'):
+        be_normalized = 1 / (1 + np.exp(-2.0 * (be_component - 1.0)))
+
+    return (w1 * be_normalized) + (w2 * bs_component) + (w3 * mun_component)
+
+
+def population_metrics_row(metrics, index):
+    """
+    Extrae las métricas de un individuo como diccionario escalar, con la misma
+    forma que el resultado de `calculate_gallery_metrics`.
+
+    Args:
+        metrics (dict): Métricas devueltas por `calculate_population_metrics`.
+        index (int): Posición del individuo en la población.
+
+    Returns:
+        dict: Métricas escalares del individuo.
+    """
+    row = {}
+    for name, value in metrics.items():
+        if isinstance(value, np.ndarray):
+            row[name] = value[index].item() if value.ndim else value.item()
+        else:
+            row[name] = value
+    return row
+
+
+def evaluate_population(population, constants, weights=None, gene_index_map=None):
+    """
+    Evalúa una población completa en una sola pasada.
+
+    Args:
+        population (list | np.ndarray): Población a evaluar.
+        constants (dict): Constantes combinadas de la corrida.
+        weights (tuple): Pesos (BE, BS, MUN) de la función de aptitud.
+        gene_index_map (dict): Mapa de índices de cromosoma a nombres de variables.
+
+    Returns:
+        tuple: (fitness, metrics) donde fitness es un arreglo y metrics el
+        diccionario de métricas vectorizadas.
+    """
+    metrics = calculate_population_metrics(population, constants, gene_index_map)
+    fitness = calculate_population_fitness(metrics, weights)
+    return fitness, metrics
+
+
+class FitnessKernel:
+    """
+    Evaluador de aptitud reducido para el bucle interno del GA.
+
+    Solo calcula el cono de dependencias de los tres componentes que usa
+    `calculate_fitness` (u_BenCos, u_BenSoc y u_MarUtN). Todo lo que depende
+    únicamente de constantes (salarios, gastos administrativos y legales,
+    licencias, k_CalVid, topes de empleo indirecto, etc.) se pliega una sola
+    vez al crear el kernel. Las métricas completas se calculan con
+    `calculate_gallery_metrics` solo para el cromosoma final.
+    """
+
+    def __init__(self, constants, weights=None, gene_index_map=None):
+        if gene_index_map is None:
+            gene_index_map = GENE_INDEX_MAP
+        if weights is None:
+            weights = (0.4, 0.5, 0.1)  # BE, BS, MUN
+
+        self.weights = tuple(weights)
+        self.constants = constants
+        self._columns = {info['name']: (index, info['is_percentage'])
+                         for index, info in gene_index_map.items()}
+
+        c = constants
+        # Egresos anuales que no dependen del cromosoma
+        self.egresos_fijos = (
+            12 * (0.6 * c['m_CUReMe'])                    # m_InReAn
+            + 12 * c['s_CoToIM']                          # s_CoToIA
+            + (12 * c['o_AdmGal'] + 12 * c['o_AsiGal'])   # o_ToSaGa
+            + (12 * c['n_PaOfMe'] + 12 * c['n_SeAdMe'])   # n_ToGAGa
+            + 12 * c['t_ReMeMe']                          # t_ToRMGa
+        )
+        self.licencias = 12 * c['c_LiFuMe'] + 12 * c['c_LiAmMe']
+        # Zonas comunes administrativas (área fija multiplicada por g_CoCoLo)
+        self.area_admin = c['z_TaOfAd'] + c['z_TaBoAd'] + c['z_TaCaAd'] + c['z_TaBaCo']
+        self.tarifa_cl1 = (c['q_Co1Cl1'], c['q_Co2Cl1'])
+        self.tarifa_cl2 = (c['q_Co1Cl2'], c['q_Co2Cl2'])
+        self.topes_indirectos = c['x_TMEILg'] + c['x_TMEIMn'] + c['x_TMEIZv'] + c['x_TMEIEx']
+        self.h_constante = c['h_CaMeIn'] + c['h_CaPeCo_comunidad'] + c['h_CaInSo']
+        self.k_CalVid = (c['k_CaPABS'] + c['k_CaPeCo_comodidad'] + c['k_CaPeSe'] + c['k_CaPeEn']) / 4
+
+    def _value(self, genes, name):
+        """Columna del gen `name` o, si no es un gen, su valor constante."""
+        column = self._columns.get(name)
+        if column is None:
+            return self.constants[name]
+        index, is_percentage = column
+        if is_percentage:
+            return genes[:, index] / 100.0
+        return genes[:, index]
+
+    def __call__(self, population):
+        """
+        Calcula la aptitud de toda la población.
+
+        Args:
+            population (list | np.ndarray): Población a evaluar.
+
+        Returns:
+            np.ndarray: Aptitud de cada individuo.
+        """
+        genes = population_to_array(population)
+        v = lambda name: self._value(genes, name)
+        c = self.constants
+
+        g_TamCom = v('g_TamCom')
+        g_TaZoAu = v('g_TaZoAu')
+        g_CoCoLo = v('g_CoCoLo')
+        g_TaUtCo = np.maximum(0, g_TamCom - (v('g_TaZoCo') + v('g_AreVer')))
+        g_TaUtPa = (v('g_TamLot') - g_TamCom) - v('g_TaCiPa')
+        g_TaZoMo = np.maximum(0, g_TaUtPa - g_TaZoAu)
+
+        p25, p20, p16 = v('l_PLTi25'), v('l_PLTi20'), v('l_PLTi16')
+        p12 = np.maximum(0, 1 - (p25 + p20 + p16))
+
+        g_VaArMe = v('g_VaArMe')
+        g_DVALMe = v('g_DVALMe')
+
+        # Locales: construcción, arriendo, administración y empleo directo
+        l_CTCLo = 0.0
+        ingresos_locales = 0.0
+        total_locales = 0.0
+        w_TMED = 0.0
+        w_ToED = 0.0
+        for size, proporcion, factor, w_CPEm, tope in (
+            (25, p25, 0.9, v('w_CPEm25'), 4),
+            (20, p20, 0.93, v('w_CPEm20'), 3),
+            (16, p16, 0.95, v('w_CPEm16'), 2),
+            (12, p12, 1.0, v('w_CPEm12'), 1),
+        ):
+            locales = np.trunc(np.trunc(proporcion * g_TaUtCo) / size)
+            l_CTCLo = l_CTCLo + locales * (g_CoCoLo * size)
+            ingresos_locales = ingresos_locales + 12 * (locales * (size * g_VaArMe * factor)) \
+                                                + 12 * (locales * (size * g_DVALMe * factor))
+            total_locales = total_locales + locales
+            w_TMED = w_TMED + locales * tope
+            w_ToED = w_ToED + w_CPEm * locales
+
+        p_CoCoPa = v('p_CoCoPa')
+        p_SCTPar = g_TaZoAu * p_CoCoPa + g_TaZoMo * p_CoCoPa
+
+        z_TaUrAV = np.maximum(0, v('g_AreVer') - self.area_admin)
+        z_CTZcAv = self.area_admin * g_CoCoLo + v('g_TaZoCo') * v('z_CoZoCi') + z_TaUrAV * v('z_CoUrAV')
+
+        i_InvIni = l_CTCLo + p_SCTPar + z_CTZcAv
+
+        q_CanCl1 = np.trunc(g_TaZoAu / v('q_EspCl1'))
+        q_CanCl2 = np.trunc(g_TaZoMo / v('q_EspCl2'))
+        q_ToPaGa = 12 * (q_CanCl1 * self.tarifa_cl1[0] + q_CanCl1 * self.tarifa_cl1[1]) + \
+                   12 * (q_CanCl2 * self.tarifa_cl2[0] + q_CanCl2 * self.tarifa_cl2[1])
+
+        u_IngGal = ingresos_locales + q_ToPaGa
+
+        m_CaPeCo = v('m_CaPeCo')
+        v_CaEmLi = v('v_CaEmLi')
+        v_CaEmVi = v('v_CaEmVi')
+        u_EgrGal = (
+            12 * (m_CaPeCo * c['m_SaPeCo']) + 12 * (v('m_CaReMe') * c['m_CUReMe'])
+            + 12 * (v('s_CanBom') * c['s_CoCoUB'] * c['s_TarCME'])
+            + 12 * (v('s_MeCuAg') * c['s_TarCMA'])
+            + v('s_MeCuGa') * c['s_TarCMG']
+            + 12 * (v_CaEmLi * c['v_SaMeLi']) + 12 * (v_CaEmVi * c['v_SaMeVi'])
+            + self.egresos_fijos
+        )
+
+        u_UtBrGa = u_IngGal - u_EgrGal
+        u_ImpGas = 0.06 * u_IngGal + 0.08 * i_InvIni + 0.35 * u_UtBrGa + self.licencias
+        u_UtNeGa = u_UtBrGa - u_ImpGas
+
+        u_MarUtN = _safe_divide(u_UtNeGa, u_IngGal)
+        u_BenCos = _safe_divide(u_UtNeGa, u_EgrGal)
+
+        # Beneficio social
+        b_ToPVia = np.minimum(v('b_CanPri') / 4 + v('b_CanSec') / 8, 1)
+        e_Accesi = (b_ToPVia + v('e_CaTrPu') + (v('e_CaZoRe') + v('e_CaEsPa')) / 2) / 3
+
+        empleo_base = m_CaPeCo + 1 + 1 + v_CaEmLi + v_CaEmVi
+        w_STMEDi = w_TMED + empleo_base
+        w_STEmDi = w_ToED + empleo_base
+        x_STMEIn = total_locales * 3 + self.topes_indirectos
+        x_STEmIn = v('x_CPInPr') * total_locales + v('x_CPInLg') + v('x_CPInMn') + \
+                   v('x_CPInZv') + v('x_CPInEx')
+        x_InEmGe = _safe_divide(w_STEmDi + x_STEmIn, w_STMEDi + x_STMEIn)
+        h_ImpCom = (x_InEmGe + self.h_constante) / 4
+
+        u_BenSoc = (e_Accesi + h_ImpCom + self.k_CalVid) / 3
+
+        return calculate_population_fitness(
+            {'u_BenCos': u_BenCos, 'u_BenSoc': u_BenSoc, 'u_MarUtN': u_MarUtN},
+            self.weights,
+        )
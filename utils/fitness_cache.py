@@ -0,0 +1,96 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+def chromosome_key(chromosome):
+    """
+    Codificación hashable de un cromosoma, usada como clave de caché y para
+    comprobar unicidad dentro de una población.
+
+    Args:
+        chromosome (list): Lista de valores del cromosoma.
+
+    Returns:
+        tuple: Tupla inmutable con los mismos valores.
+    """
+    return tuple(chromosome)
+
+
+class FitnessCache:
+    """
+    Caché LRU de aptitud por cromosoma, válida durante una corrida del GA.
+
+    La aptitud depende además de las constantes y los pesos de la corrida, por lo
+    que cada ejecución de `run_genetic_algorithm` debe usar su propia instancia.
+    """
+
+    def __init__(self, max_size=20000):
+        self.max_size = max(0, int(max_size))
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Devuelve la aptitud almacenada o None, actualizando contadores y orden LRU."""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, fitness):
+        if self.max_size == 0:
+            return
+        self._entries[key] = fitness
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def evaluate(self, population, evaluator):
+        """
+        Devuelve la aptitud de toda la población, evaluando solo los cromosomas
+        que no están en caché (y cada uno una sola vez).
+
+        Args:
+            population (list): Lista de cromosomas.
+            evaluator (callable): Recibe una lista de cromosomas y devuelve un
+                arreglo con su aptitud (p. ej. `evaluate_population(...)[0]`).
+
+        Returns:
+            list: Aptitud de cada individuo, en el mismo orden que la población.
+        """
+        fitness_scores = [None] * len(population)
+        pending = {}
+        for i, chromosome in enumerate(population):
+            key = chromosome_key(chromosome)
+            cached = self.get(key)
+            if cached is not None:
+                fitness_scores[i] = cached
+            else:
+                pending.setdefault(key, []).append(i)
+
+        if pending:
+            keys = list(pending)
+            results = np.asarray(evaluator([list(key) for key in keys]), dtype=np.float64)
+            for key, fitness in zip(keys, results.tolist()):
+                self.put(key, fitness)
+                for i in pending[key]:
+                    fitness_scores[i] = fitness
+
+        return fitness_scores
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hit_rate': (self.hits / total) if total else 0.0,
+        }
@@ -0,0 +1,330 @@
+import ast
+import copy
+import inspect
+import textwrap
+from functools import lru_cache
+
+from utils.genetic_algorithm import GENE_INDEX_MAP, calculate_gallery_metrics
+
+# Funciones que pueden aparecer en las fórmulas de los loci
+_FORMULA_BUILTINS = {'max': max, 'min': min, 'int': int, 'abs': abs, 'round': round}
+
+
+class Locus:
+    """
+    Un locus calculado: nombre, nombres de sus entradas directas y la fórmula
+    compilada como función de esas entradas (en el mismo orden).
+    """
+
+    __slots__ = ('name', 'inputs', 'expression', 'formula', 'tree', 'step')
+
+    def __init__(self, name, inputs, expression, formula, tree=None):
+        self.name = name
+        self.inputs = inputs
+        self.expression = expression
+        self.formula = formula
+        self.tree = tree
+        # Versión compilada `step(v)` que escribe el locus en el diccionario de valores
+        self.step = _compile_plan([self]) if tree is not None else None
+
+    def __repr__(self):
+        return f"<Locus {self.name} <- {', '.join(self.inputs)}>"
+
+    def compute(self, values):
+        return self.formula(*[values[name] for name in self.inputs])
+
+
+def _metric_key(node):
+    """Devuelve 'x' si el nodo es `metrics['x']`, si no None."""
+    if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)
+            and node.value.id == 'metrics' and isinstance(node.slice, ast.Constant)):
+        return node.slice.value
+    return None
+
+
+class _Inliner(ast.NodeTransformer):
+    """
+    Sustituye `metrics['x']` por el nombre `x` (o por la expresión anterior de `x`
+    cuando un locus se reasigna, p. ej. `max(0, metrics['g_TaUtCo'])`) y las
+    variables locales auxiliares por su expresión.
+    """
+
+    def __init__(self, previous, local_names):
+        self.previous = previous
+        self.local_names = local_names
+
+    def visit_Subscript(self, node):
+        key = _metric_key(node)
+        if key is None:
+            return self.generic_visit(node)
+        if key in self.previous:
+            return self.previous[key]
+        return ast.Name(id=key, ctx=ast.Load())
+
+    def visit_Name(self, node):
+        if node.id in self.local_names:
+            return self.local_names[node.id]
+        return node
+
+
+def _assignments(body):
+    """Recorre las asignaciones del cuerpo de la función, entrando en los bloques try."""
+    for stmt in body:
+        if isinstance(stmt, ast.Try):
+            yield from _assignments(stmt.body)
+        elif isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+            yield stmt
+
+
+def _extract_loci(function):
+    """
+    Obtiene las fórmulas de los loci a partir del código fuente de `function`
+    (por defecto `calculate_gallery_metrics`), en orden de cálculo.
+    """
+    tree = ast.parse(textwrap.dedent(inspect.getsource(function)))
+    body = tree.body[0].body
+
+    expressions = {}   # locus -> expresión AST vigente
+    order = []
+    read_after_assign = {}
+    local_names = {}
+
+    for stmt in _assignments(body):
+        target = stmt.targets[0]
+        if isinstance(target, ast.Name):
+            local_names[target.id] = _Inliner({}, local_names).visit(stmt.value)
+            continue
+        key = _metric_key(target)
+        if key is None:
+            continue
+
+        reads = {_metric_key(n) for n in ast.walk(stmt.value)} - {None}
+        if key in expressions:
+            # Una reasignación solo puede componerse si nadie leyó el valor intermedio
+            if read_after_assign[key]:
+                raise ValueError(f"El locus {key} se lee antes de ser reasignado.")
+            previous = {key: expressions[key]}
+        else:
+            previous = {}
+            order.append(key)
+        for name in reads:
+            if name in read_after_assign and name != key:
+                read_after_assign[name] = True
+        read_after_assign[key] = False
+        expressions[key] = _Inliner(previous, local_names).visit(stmt.value)
+
+    loci = []
+    for name in order:
+        expression = expressions[name]
+        inputs = tuple(sorted({n.id for n in ast.walk(expression)
+                               if isinstance(n, ast.Name) and n.id not in _FORMULA_BUILTINS}))
+        lambda_node = ast.Expression(ast.Lambda(
+            args=ast.arguments(posonlyargs=[], args=[ast.arg(arg=i) for i in inputs],
+                               kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=expression))
+        ast.fix_missing_locations(lambda_node)
+        formula = eval(compile(lambda_node, f'<locus {name}>', 'eval'), dict(_FORMULA_BUILTINS))
+        loci.append(Locus(name, inputs, ast.unparse(expression), formula, expression))
+    return loci
+
+
+class _ValuesAccess(ast.NodeTransformer):
+    """Convierte cada nombre de entrada `x` en `v['x']` para los planes compilados."""
+
+    def visit_Name(self, node):
+        if node.id in _FORMULA_BUILTINS:
+            return node
+        return ast.Subscript(value=ast.Name(id='v', ctx=ast.Load()),
+                             slice=ast.Constant(node.id), ctx=ast.Load())
+
+
+def _compile_plan(loci):
+    """
+    Compila una secuencia de loci en una sola función `plan(v)` que actualiza el
+    diccionario de valores en orden, evitando una llamada por locus.
+    """
+    statements = []
+    for locus in loci:
+        value = _ValuesAccess().visit(copy.deepcopy(locus.tree))
+        target = ast.Subscript(value=ast.Name(id='v', ctx=ast.Load()),
+                               slice=ast.Constant(locus.name), ctx=ast.Store())
+        statements.append(ast.Assign(targets=[target], value=value))
+    function = ast.FunctionDef(
+        name='plan',
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(arg='v')],
+                           kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=statements or [ast.Pass()], decorator_list=[], returns=None, type_params=[])
+    module = ast.fix_missing_locations(ast.Module(body=[function], type_ignores=[]))
+    namespace = dict(_FORMULA_BUILTINS)
+    exec(compile(module, '<plan de loci>', 'exec'), namespace)
+    return namespace['plan']
+
+
+class FormulaGraph:
+    """
+    Grafo de dependencias gen -> loci intermedios -> componentes de aptitud.
+
+    Permite consultar qué genes alimentan un locus y reevaluar un hijo a partir
+    de las métricas de su padre recalculando solo los loci aguas abajo de los
+    genes que cambiaron.
+    """
+
+    def __init__(self, loci, gene_index_map=None):
+        if gene_index_map is None:
+            gene_index_map = GENE_INDEX_MAP
+        self.gene_index_map = gene_index_map
+        self.gene_names = {index: info['name'] for index, info in gene_index_map.items()}
+        self.loci = {locus.name: locus for locus in loci}
+        self.order = [locus.name for locus in loci]
+        self._position = {name: i for i, name in enumerate(self.order)}
+
+        self.dependents = {}
+        for locus in loci:
+            for name in locus.inputs:
+                self.dependents.setdefault(name, set()).add(locus.name)
+
+        # Máscara de bits (por posición en `order`) de los loci aguas abajo de cada gen
+        self._gene_masks = {}
+        for index, gene in self.gene_names.items():
+            mask = 0
+            for name in _downstream_plan(self, frozenset([gene])):
+                mask |= 1 << self._position[name]
+            self._gene_masks[index] = mask
+
+    @classmethod
+    def from_function(cls, function=calculate_gallery_metrics, gene_index_map=None):
+        return cls(_extract_loci(function), gene_index_map)
+
+    # -----------------------------------------------------------
+    # Introspección
+    # -----------------------------------------------------------
+    def inputs(self, name):
+        """Entradas directas de un locus."""
+        return self.loci[name].inputs
+
+    def upstream(self, name):
+        """Todos los nombres (genes, constantes y loci) de los que depende `name`."""
+        seen = set()
+        stack = list(self.loci[name].inputs) if name in self.loci else []
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            if current in self.loci:
+                stack.extend(self.loci[current].inputs)
+        return seen
+
+    def genes_feeding(self, name):
+        """
+        Genes del cromosoma que influyen en un locus, p. ej. `genes_feeding('u_ROIGal')`.
+
+        Returns:
+            list: Pares (índice, nombre) ordenados por índice.
+        """
+        upstream = self.upstream(name)
+        return [(index, gene) for index, gene in sorted(self.gene_names.items())
+                if gene in upstream and gene not in self.loci]
+
+    def constants_feeding(self, name):
+        """Constantes (ni genes ni loci) que intervienen en un locus."""
+        genes = set(self.gene_names.values())
+        return sorted(n for n in self.upstream(name) if n not in self.loci and n not in genes)
+
+    def downstream(self, names):
+        """Loci afectados por un cambio en `names`, en orden de cálculo."""
+        return list(self._downstream(frozenset(names)))
+
+    def _downstream(self, names):
+        return _downstream_plan(self, names)
+
+    def _plan(self, names):
+        return _plan_function(self, names)
+
+    # -----------------------------------------------------------
+    # Evaluación
+    # -----------------------------------------------------------
+    def gene_values(self, chromosome):
+        """Valores de los genes del cromosoma con la conversión de porcentajes aplicada."""
+        values = {}
+        for index, gene_info in self.gene_index_map.items():
+            value = chromosome[index]
+            values[gene_info['name']] = value / 100.0 if gene_info['is_percentage'] else value
+        return values
+
+    def evaluate(self, chromosome, constants):
+        """
+        Evaluación completa, equivalente a `calculate_gallery_metrics`.
+
+        Returns:
+            dict: Todas las métricas de la galería.
+        """
+        values = dict(constants)
+        values.update(self.gene_values(chromosome))
+        self._plan(tuple(self.order))(values)
+        return values
+
+    def changed_genes(self, parent_chromosome, child_chromosome):
+        """Índices de los genes mapeados que difieren entre padre e hijo."""
+        return [index for index in self.gene_index_map
+                if parent_chromosome[index] != child_chromosome[index]]
+
+    def reevaluate(self, parent_values, parent_chromosome, child_chromosome):
+        """
+        Evalúa un hijo a partir de las métricas del padre recalculando solo los
+        loci aguas abajo de los genes que cambiaron.
+
+        Args:
+            parent_values (dict): Métricas completas del padre (de `evaluate`).
+            parent_chromosome (list): Cromosoma del padre.
+            child_chromosome (list): Cromosoma del hijo.
+
+        Returns:
+            dict: Métricas completas del hijo.
+        """
+        values = dict(parent_values)
+        mask = 0
+        for index, gene_info in self.gene_index_map.items():
+            value = child_chromosome[index]
+            if value != parent_chromosome[index]:
+                values[gene_info['name']] = value / 100.0 if gene_info['is_percentage'] else value
+                mask |= self._gene_masks[index]
+        if mask:
+            for step in _steps_for_mask(self, mask):
+                step(values)
+        return values
+
+
+@lru_cache(maxsize=2048)
+def _downstream_plan(graph, names):
+    affected = set()
+    stack = list(names)
+    while stack:
+        current = stack.pop()
+        for dependent in graph.dependents.get(current, ()):
+            if dependent not in affected:
+                affected.add(dependent)
+                stack.append(dependent)
+    return tuple(sorted(affected, key=graph._position.__getitem__))
+
+
+@lru_cache(maxsize=4096)
+def _steps_for_mask(graph, mask):
+    return tuple(graph.loci[name].step for position, name in enumerate(graph.order)
+                 if mask >> position & 1)
+
+
+@lru_cache(maxsize=8)
+def _plan_function(graph, names):
+    return _compile_plan([graph.loci[name] for name in names])
+
+
+_GRAPH = None
+
+
+def get_formula_graph():
+    """Grafo de `calculate_gallery_metrics`, construido una sola vez por proceso."""
+    global _GRAPH
+    if _GRAPH is None:
+        _GRAPH = FormulaGraph.from_function()
+    return _GRAPH
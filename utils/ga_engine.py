@@ -0,0 +1,844 @@
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from utils.fitness_cache import FitnessCache, chromosome_key
+from utils.progress import GENERATION, NEW_BEST, VERBOSITY_DEBUG, VERBOSITY_INFO, LevelLog
+from utils.parallel_evaluation import DEFAULT_MIN_POPULATION, make_evaluator
+from utils.genetic_algorithm import (
+    CONSTANTS as GLOBAL_CONSTANTS,
+    GENE_INDEX_MAP,
+    adjust_parameters,
+    calculate_diversity,
+    calculate_fitness,
+    calculate_gallery_metrics,
+    create_initial_population,
+    crossover_chromosomes,
+    gene_definitions,
+    mutate_chromosome,
+    recalculate_dependent_genes,
+    select_elites,
+    select_parents,
+)
+
+# Valores por defecto de las constantes críticas que el GA necesita sí o sí
+REQUIRED_CONSTANTS = {
+    'z_TaOfAd': 20,
+    'z_TaBoAd': 20,
+    'z_TaCaAd': 12,
+    'z_TaBaCo': 68,
+}
+
+
+# Criterios de parada que se registran en cada Ejecucion
+STOP_CONVERGENCE = 'convergencia'
+STOP_GENERATIONS = 'generaciones'
+STOP_DEADLINE = 'tiempo'
+STOP_ERROR = 'error'
+# La corrida se detuvo para continuar desde su checkpoint en otra petición
+STOP_PAUSED = 'pausa'
+# La corrida se canceló (su resultado no se guarda)
+STOP_CANCELLED = 'cancelada'
+
+# Segundos mínimos entre dos envíos de progreso desde un proceso del pool
+PROGRESS_INTERVAL = 0.5
+
+
+def stop_reason(generation, max_generations, average_fitness, stagnation_count,
+                convergence_window=0, deadline=None):
+    """
+    Criterio de parada que se cumple en esta generación, o None para seguir.
+
+    Además del criterio original (aptitud promedio > 0.85 o máximo de
+    generaciones), detiene por convergencia si no hubo mejora en las últimas
+    `convergence_window` generaciones y por tiempo al alcanzar `deadline`
+    (marca de tiempo `time.time()`), devolviendo el mejor resultado hasta ahí.
+    """
+    if average_fitness > 0.85:
+        return STOP_CONVERGENCE
+    if generation >= max_generations:
+        return STOP_GENERATIONS
+    if convergence_window and stagnation_count >= convergence_window:
+        return STOP_CONVERGENCE
+    if deadline is not None and time.time() >= deadline:
+        return STOP_DEADLINE
+    return None
+
+
+# -----------------------------------------------------------
+# Checkpoints (estado serializable del GA generacional)
+# -----------------------------------------------------------
+CHECKPOINT_VERSION = 1
+
+
+def _plain(value):
+    """Convierte escalares y listas de numpy a tipos de Python (serializables a JSON)."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def capture_rng_state():
+    """Estado de los generadores `random` y `np.random` en formato JSON."""
+    version, internal, gauss_next = random.getstate()
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        'random': [version, list(internal), gauss_next],
+        'numpy': [name, keys.tolist(), int(pos), int(has_gauss), float(cached_gaussian)],
+    }
+
+
+def restore_rng_state(state):
+    """Restaura el estado guardado por `capture_rng_state`."""
+    version, internal, gauss_next = state['random']
+    random.setstate((version, tuple(internal), gauss_next))
+    name, keys, pos, has_gauss, cached_gaussian = state['numpy']
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+
+
+def checkpoint_state(generation, population, fitness_scores, mutation_rate, sigma_factor,
+                     elite_percentage, stagnation_count, improvement_count,
+                     best_fitness, best_chromosome):
+    """
+    Estado completo del GA al terminar de evaluar `generation` (antes de cruzar).
+
+    Reanudar desde este estado con `run_ga(..., checkpoint=estado)` produce la
+    misma secuencia de generaciones que una corrida sin interrupción.
+
+    Returns:
+        dict: Estado serializable a JSON.
+    """
+    return {
+        'version': CHECKPOINT_VERSION,
+        'generation': generation,
+        'population': _plain(population),
+        'fitness_scores': _plain(fitness_scores),
+        'mutation_rate': float(mutation_rate),
+        'sigma_factor': float(sigma_factor),
+        'elite_percentage': float(elite_percentage),
+        'stagnation_count': stagnation_count,
+        'improvement_count': improvement_count,
+        'best_fitness': float(best_fitness),
+        'best_chromosome': _plain(best_chromosome),
+        'rng': capture_rng_state(),
+    }
+
+
+def prepare_constants(constants, log):
+    """
+    Combina las constantes globales con las de la galería y completa las críticas.
+
+    Returns:
+        dict: Constantes completas de la corrida.
+    """
+    # Combinar constantes globales con constantes especificas de esta ejecucion
+    full_constants = {**GLOBAL_CONSTANTS, **constants}
+
+    log("Constantes combinadas correctamente")
+
+    # Asegurarse de que todas las constantes necesarias esten presentes
+    for const, default in REQUIRED_CONSTANTS.items():
+        if const not in full_constants:
+            log(f"ADVERTENCIA: Constante {const} no encontrada, usando valor por defecto")
+            full_constants[const] = default
+    return full_constants
+
+
+def breed_generation(population, fitness_scores, elites, population_size, user_inputs,
+                     full_constants, mutation_rate, sigma_factor, crossover_rate):
+    """
+    Construye la siguiente generación: élites, un 5% de individuos aleatorios
+    nuevos y el resto hijos por torneo, cruce y mutación.
+
+    Returns:
+        list: Nueva población de `population_size` cromosomas.
+    """
+    new_population = []
+
+    # Agregar elites
+    new_population.extend(elites)
+
+    # Agregar individuos aleatorios (5%)
+    num_random = int(0.05 * population_size)
+    new_population_keys = {chromosome_key(c) for c in new_population}
+    while len(new_population) < len(elites) + num_random:
+        random_individual = create_initial_population(1, gene_definitions, user_inputs, full_constants)[0]
+        random_key = chromosome_key(random_individual)
+        if random_key not in new_population_keys:
+            new_population_keys.add(random_key)
+            new_population.append(random_individual)
+
+    # Generar hijos mediante cruce y mutacion hasta completar la poblacion
+    while len(new_population) < population_size:
+        # Seleccionar dos padres
+        parent1 = select_parents(population, fitness_scores)
+        parent2 = select_parents(population, fitness_scores)
+
+        # Cruce
+        child = crossover_chromosomes(parent1, parent2, crossover_rate)
+
+        # Recalcular genes dependientes despues del cruce
+        child = recalculate_dependent_genes(child, full_constants)
+
+        # Mutacion
+        child = mutate_chromosome(child, gene_definitions, mutation_rate, sigma_factor)
+
+        # Recalcular genes dependientes despues de la mutacion
+        child = recalculate_dependent_genes(child, full_constants)
+
+        # Agregar hijo a la nueva poblacion
+        new_population.append(child)
+
+    return new_population
+
+
+def log_initial_population(population, full_constants, weights, crossover_rate, log):
+    """
+    Registra la población inicial con un cromosoma de ejemplo, sus métricas y un cruce.
+
+    El cruce de ejemplo no altera el estado aleatorio, así que el resultado del GA
+    no depende de que se registre o no este detalle.
+    """
+    rng_state = capture_rng_state()
+    try:
+        _log_initial_population(population, full_constants, weights, crossover_rate, log)
+    finally:
+        restore_rng_state(rng_state)
+
+
+def _log_initial_population(population, full_constants, weights, crossover_rate, log):
+    log(f"Poblacion inicial creada con {len(population)} individuos")
+
+    log("Poblacion inicial generada:")
+    for i, chromosome in enumerate(population[:3]):
+        log(f"Individuo {i+1}: {chromosome}")
+    log("-" * 50)
+
+    # Mostrar ejemplo de un cromosoma y sus metricas
+    sample_chromosome = population[0]
+    log(f"Cromosoma de ejemplo: {sample_chromosome}")
+
+    gallery_metrics = calculate_gallery_metrics(sample_chromosome, full_constants, GENE_INDEX_MAP)
+
+    log("Metricas calculadas para el cromosoma de ejemplo:")
+    log(f"  Inversion Inicial (i_InvIni): {gallery_metrics.get('i_InvIni'):,.2f}")
+    log(f"Ejemplo - ROI Porcentual: {gallery_metrics.get('u_ROIGal'):.2f}%")
+    log(f"Ejemplo - Utilidad Neta: {gallery_metrics.get('u_UtNeGa'):,.2f}")
+    log(f"Ejemplo - Empleo Generado: {gallery_metrics.get('x_Empleo')}")
+    log(f"  Ingresos Galeria (u_IngGal): {gallery_metrics.get('u_IngGal'):,.2f}")
+    log(f"  Egresos Galeria (u_EgrGal): {gallery_metrics.get('u_EgrGal'):,.2f}")
+    log(f"  Utilidad Bruta (u_UtBrGa): {gallery_metrics.get('u_UtBrGa'):,.2f}")
+    log(f"  Utilidad Neta (u_UtNeGa): {gallery_metrics.get('u_UtNeGa'):,.2f}")
+    log(f"  Margen Utilidad Neta (u_MarUtN): {gallery_metrics.get('u_MarUtN'):.4f}")
+    log(f"  ROI Porcentual (u_ROIGal): {gallery_metrics.get('u_ROIGal'):.4f}%")
+    log(f"  Beneficio Social (u_BenSoc): {gallery_metrics.get('u_BenSoc'):.4f}")
+    log(f"  Empleo Generado (x_Empleo): {gallery_metrics.get('x_Empleo')}")
+    log(f"  Total Locales Comerciales (y_ToLoCo): {gallery_metrics.get('y_ToLoCo')}")
+    log("-" * 50)
+
+    # Calcular aptitud del cromosoma de ejemplo
+    fitness_score = calculate_fitness(gallery_metrics, weights)
+    log(f"Puntuacion de Aptitud (Fitness) para el cromosoma de ejemplo: {fitness_score:.4f}")
+    log("-" * 50)
+
+    # Ejemplo de cruce
+    parent1 = random.choice(population)
+    parent2 = random.choice(population)
+    log(f"Padre 1: {parent1}")
+    log(f"Padre 2: {parent2}")
+    child = crossover_chromosomes(parent1, parent2, crossover_rate)
+    final_child = recalculate_dependent_genes(child, full_constants)
+    log(f"Hijo despues del cruce: {final_child}")
+
+
+def report_best_solution(best_chromosome, full_constants, weights, log=None):
+    """
+    Calcula las métricas completas del mejor cromosoma y, si se pasa `log`, las
+    deja en los logs.
+
+    Returns:
+        tuple: (best_metrics, best_fitness).
+    """
+    best_metrics = calculate_gallery_metrics(best_chromosome, full_constants, GENE_INDEX_MAP)
+    best_fitness = calculate_fitness(best_metrics, weights)
+    if log is None:
+        return best_metrics, best_fitness
+
+    log(f"Cromosoma optimo: {best_chromosome}")
+    log(f"Fitness: {best_fitness:.4f}")
+
+    log("Metricas clave de la mejor solucion:")
+    log(f"  Inversion Inicial: {best_metrics.get('i_InvIni'):,.2f}")
+    log(f"  Ingresos Anuales: {best_metrics.get('u_IngGal'):,.2f}")
+    log(f"  Egresos Anuales: {best_metrics.get('u_EgrGal'):,.2f}")
+    log(f"  Utilidad Neta: {best_metrics.get('u_UtNeGa'):,.2f}")
+    log(f"  ROI: {best_metrics.get('u_ROIGal'):.2f}%")
+    log(f"  Beneficio Social: {best_metrics.get('u_BenSoc'):.4f}")
+    log(f"  Empleo Generado: {best_metrics.get('x_Empleo')}")
+    return best_metrics, best_fitness
+
+
+def run_ga(user_inputs, constants, population_size, max_generations, elite_percentage,
+           mutation_rate, sigma_factor, crossover_rate, weights, log=None, cache_size=20000,
+           eval_workers=0, eval_min_population=DEFAULT_MIN_POPULATION,
+           deadline=None, convergence_window=0, info=None,
+           checkpoint=None, checkpoint_every=0, on_checkpoint=None, cancel=None,
+           on_event=None, verbosity=VERBOSITY_INFO):
+    """
+    Ejecuta el algoritmo genético para una galería, sin depender de Flask.
+
+    Es el núcleo de `run_genetic_algorithm`: puede correr en el hilo de la petición
+    o en un proceso del pool, ya que solo recibe datos serializables y reporta el
+    progreso a través de `log`.
+
+    Args:
+        user_inputs (dict): g_TamLot, b_CanPri, b_CanSec y comuna de la galería.
+        constants (dict): Constantes propias de la galería (se combinan con CONSTANTS).
+        population_size, max_generations, elite_percentage, mutation_rate,
+        sigma_factor, crossover_rate: Parámetros del GA.
+        weights (list): Pesos de la función de aptitud.
+        log (callable): Recibe cada línea de log. Si es None se descartan.
+        verbosity (int): Detalle de los logs de texto (ver `utils.progress`); con
+            VERBOSITY_EVENTS solo se registran errores y el progreso va por `on_event`.
+        cache_size (int): Tamaño máximo de la caché de aptitud de la corrida.
+        eval_workers (int): Procesos para evaluar la aptitud de cada generación con
+            memoria compartida (0 o 1 = evaluación en el proceso actual).
+        eval_min_population (int): Población mínima para usar esos procesos.
+        deadline (float): Marca `time.time()` en la que parar y devolver el mejor
+            resultado hasta el momento (modo con presupuesto de tiempo).
+        convergence_window (int): Generaciones sin mejora tras las que se da por
+            convergido (0 = desactivado).
+        info (dict): Si se pasa, se completa con 'stop_reason' y 'generations'.
+        checkpoint (dict): Estado de `checkpoint_state` desde el que reanudar.
+        checkpoint_every (int): Cada cuántas generaciones entregar el estado a
+            `on_checkpoint` (0 = solo al pausar).
+        on_checkpoint (callable): Recibe el estado serializable del GA. Si se pasa,
+            la corrida es reanudable: al alcanzar `deadline` se pausa (criterio
+            'pausa') en lugar de terminar.
+        cancel: Token de cancelación (p. ej. `threading.Event` o el `Event` de un
+            Manager); se revisa en cada generación y, si está activo, la corrida
+            termina con el criterio 'cancelada'.
+        on_event (callable): on_event(tipo, datos) con los eventos GENERATION
+            (generation, best_fitness, average_fitness, diversity) de cada
+            generación evaluada y NEW_BEST (generation, best_fitness).
+
+    Returns:
+        tuple: (best_chromosome, best_metrics, best_fitness).
+    """
+    say = LevelLog(log, verbosity)
+    if info is None:
+        info = {}
+
+    # Inicializar valores por defecto para retorno
+    best_chromosome = None
+    best_metrics = {}
+    best_fitness = 0.0
+    evaluar_lote = None
+
+    try:
+        full_constants = prepare_constants(constants, say.info)
+
+        if checkpoint is None:
+            # Inicializar poblacion
+            population = create_initial_population(population_size, gene_definitions, user_inputs, full_constants)
+            if say.enabled(VERBOSITY_DEBUG):
+                log_initial_population(population, full_constants, weights, crossover_rate, log)
+
+        # Iniciar el algoritmo genetico principal
+        say.info("Iniciando algoritmo genetico principal...")
+
+        # Variables para seguimiento de estancamiento y mejora
+        best_fitness = -np.inf
+        stagnation_count = 0
+        improvement_count = 0
+        best_chromosome = None
+        best_metrics = None
+        first_generation = 1
+
+        # Cache de aptitud de la corrida: los elites y repetidos no se reevaluan
+        fitness_cache = FitnessCache(cache_size)
+
+        if checkpoint is not None:
+            # Reanudar: la generacion del checkpoint ya se evaluo, se sigue con el cruce
+            first_generation = checkpoint['generation']
+            population = checkpoint['population']
+            mutation_rate = checkpoint['mutation_rate']
+            sigma_factor = checkpoint['sigma_factor']
+            elite_percentage = checkpoint['elite_percentage']
+            stagnation_count = checkpoint['stagnation_count']
+            improvement_count = checkpoint['improvement_count']
+            best_fitness = checkpoint['best_fitness']
+            best_chromosome = checkpoint['best_chromosome']
+            for chromosome, fitness in zip(population, checkpoint['fitness_scores']):
+                fitness_cache.put(chromosome_key(chromosome), fitness)
+            restore_rng_state(checkpoint['rng'])
+            say.info("Reanudando desde el checkpoint de la generacion %d (mejor fitness %.4f)",
+                     first_generation, best_fitness)
+
+        # Kernel de aptitud con las constantes de la corrida ya plegadas (repartido
+        # entre procesos si se pidio); las metricas completas solo se calculan para
+        # el mejor cromosoma final
+        evaluar_lote = make_evaluator(full_constants, weights, eval_workers, eval_min_population)
+
+        # Con checkpoints, el plazo pausa la corrida en lugar de terminarla
+        stop_deadline = None if on_checkpoint is not None else deadline
+
+        for generation in range(first_generation, max_generations + 1):
+            if cancel is not None and cancel.is_set():
+                info['stop_reason'] = STOP_CANCELLED
+                info['generations'] = generation - 1
+                say.info("Corrida cancelada en la generacion %d", generation)
+                break
+
+            resumed = checkpoint is not None and generation == first_generation
+
+            # Evaluar la aptitud de la poblacion: solo los cromosomas nuevos pasan
+            # por la evaluacion vectorizada
+            fitness_scores = fitness_cache.evaluate(population, evaluar_lote)
+
+            if not resumed:
+                # Encontrar la mejor aptitud actual
+                current_best_fitness = max(fitness_scores)
+                current_best_index = fitness_scores.index(current_best_fitness)
+
+                # Actualizar seguimiento de estancamiento y mejora
+                if current_best_fitness > best_fitness:
+                    improvement_count += 1
+                    stagnation_count = 0
+                    best_fitness = current_best_fitness
+                    best_chromosome = population[current_best_index].copy()
+                    say.info("Nueva mejor fitness %.4f en generacion %d", best_fitness, generation)
+                    if on_event is not None:
+                        on_event(NEW_BEST, {'generation': generation, 'best_fitness': float(best_fitness)})
+                else:
+                    stagnation_count += 1
+                    improvement_count = 0
+
+            # Calcular diversidad
+            diversity = calculate_diversity(fitness_scores)
+
+            # Seleccionar elites
+            elites = select_elites(population, fitness_scores, elite_percentage)
+
+            # Verificar criterio de parada (aptitud promedio > 0.85, maximo de generaciones,
+            # sin mejora en la ventana de convergencia o plazo agotado)
+            average_fitness = np.mean(fitness_scores)
+            if on_event is not None and not resumed:
+                on_event(GENERATION, {'generation': generation, 'best_fitness': float(best_fitness),
+                                      'average_fitness': float(average_fitness),
+                                      'diversity': float(diversity)})
+            reason = None
+            if not resumed:
+                reason = stop_reason(generation, max_generations, average_fitness, stagnation_count,
+                                     convergence_window, stop_deadline)
+            if reason is not None:
+                info['stop_reason'] = reason
+                info['generations'] = generation
+                say.info("Criterio de parada alcanzado en la generacion %d.", generation)
+                if reason == STOP_DEADLINE:
+                    say.info("Plazo de tiempo agotado: se devuelve el mejor resultado hasta ahora")
+                elif stagnation_count and convergence_window and stagnation_count >= convergence_window:
+                    say.info("Sin mejora en las ultimas %d generaciones", convergence_window)
+                say.info("Mejor fitness: %.4f, Fitness promedio: %.4f", best_fitness, average_fitness)
+                break
+
+            if on_checkpoint is not None and not resumed:
+                paused = deadline is not None and time.time() >= deadline
+                if paused or (checkpoint_every and generation % checkpoint_every == 0):
+                    on_checkpoint(checkpoint_state(
+                        generation, population, fitness_scores, mutation_rate, sigma_factor,
+                        elite_percentage, stagnation_count, improvement_count,
+                        best_fitness, best_chromosome))
+                if paused:
+                    info['stop_reason'] = STOP_PAUSED
+                    info['generations'] = generation
+                    say.info("Plazo de tiempo agotado: corrida en pausa en la generacion %d/%d",
+                             generation, max_generations)
+                    break
+
+            # Ajustar parametros basandose en reglas heuristicas
+            params = {
+                'mutation_rate': mutation_rate,
+                'sigma_factor': sigma_factor,
+                'elite_percentage': elite_percentage
+            }
+            new_params = adjust_parameters(params, diversity, stagnation_count, improvement_count)
+            mutation_rate = new_params['mutation_rate']
+            sigma_factor = new_params['sigma_factor']
+            elite_percentage = new_params['elite_percentage']
+
+            # Crear nueva generacion
+            new_population = breed_generation(population, fitness_scores, elites, population_size,
+                                              user_inputs, full_constants, mutation_rate,
+                                              sigma_factor, crossover_rate)
+
+            # Reemplazar la poblacion antigua con la nueva
+            population = new_population
+
+            # Imprimir progreso cada 10 generaciones (el progreso numérico va por on_event)
+            if generation % 10 == 0 and say.enabled(VERBOSITY_DEBUG):
+                say.debug("Progreso - Generacion %d/%d", generation, max_generations)
+                say.debug("Mejor fitness: %.4f", best_fitness)
+                say.debug("Diversidad de poblacion: %.4f", diversity)
+                say.debug("Tasa de mutacion actual: %.3f", mutation_rate)
+                cache_stats = fitness_cache.stats()
+                say.debug("Cache de aptitud: %d aciertos, %d fallos", cache_stats['hits'], cache_stats['misses'])
+
+        if say.enabled(VERBOSITY_INFO):
+            cache_stats = fitness_cache.stats()
+            say.info("Cache de aptitud: %d aciertos, %d fallos (%.1f%% evaluaciones ahorradas, %d/%d entradas)",
+                     cache_stats['hits'], cache_stats['misses'], cache_stats['hit_rate'] * 100,
+                     cache_stats['size'], cache_stats['max_size'])
+
+        if info.get('stop_reason') in (STOP_PAUSED, STOP_CANCELLED):
+            # Resultado parcial: la corrida continua desde el checkpoint o se descarta
+            if best_chromosome is None:
+                return None, {}, 0.0
+            best_metrics = calculate_gallery_metrics(best_chromosome, full_constants, GENE_INDEX_MAP)
+            return best_chromosome, best_metrics, best_fitness
+
+        # Mostrar el mejor resultado al finalizar
+        say.info("\n" + "="*60)
+        say.info("MEJOR SOLUCIoN ENCONTRADA")
+        say.info("="*60)
+
+        if best_chromosome is not None:
+            best_metrics, best_fitness = report_best_solution(best_chromosome, full_constants, weights,
+                                                              say.at(VERBOSITY_INFO))
+        else:
+            say.warning("No se encontro una solucion optima.")
+
+    except Exception as e:
+        error_msg = f"Error en el algoritmo genético: {str(e)}"
+        print(error_msg)
+        say.warning(error_msg)
+        traceback_str = traceback.format_exc()
+        print(traceback_str)
+        say.warning(traceback_str)
+        info['stop_reason'] = STOP_ERROR
+
+        # Las metricas completas solo se calculan al final; si el error ocurrio
+        # durante la evolucion, calcularlas ahora para el mejor cromosoma conocido
+        if best_chromosome is not None and not best_metrics:
+            best_metrics = calculate_gallery_metrics(best_chromosome, full_constants, GENE_INDEX_MAP)
+
+    finally:
+        if hasattr(evaluar_lote, 'close'):
+            evaluar_lote.close()
+
+    return best_chromosome, best_metrics, best_fitness
+
+
+# Entradas de usuario que no intervienen en las métricas ni en la aptitud
+_INPUTS_SIN_EFECTO = ('comuna',)
+
+
+def problem_signature(user_inputs, constants):
+    """
+    Firma canónica del problema de optimización de una galería.
+
+    Dos galerías con la misma firma (mismo tamaño de lote, cantidades y constantes;
+    la comuna no se usa en `calculate_gallery_metrics`) resuelven exactamente el
+    mismo problema cuando comparten los parámetros del GA y los pesos.
+
+    Returns:
+        tuple: Firma hashable.
+    """
+    inputs = tuple(sorted((k, v) for k, v in user_inputs.items() if k not in _INPUTS_SIN_EFECTO))
+    return inputs, tuple(sorted(constants.items()))
+
+
+def plan_jobs(entries):
+    """
+    Agrupa las galerías de una corrida por problema para optimizar cada uno una vez.
+
+    Args:
+        entries (list): Tuplas (clave, user_inputs, constants) en orden de proceso.
+
+    Returns:
+        dict: clave representante -> lista de claves que comparten su problema
+            (la primera es la propia representante), en el orden original.
+    """
+    groups = {}
+    representatives = {}
+    for key, user_inputs, constants in entries:
+        signature = problem_signature(user_inputs, constants)
+        representative = representatives.setdefault(signature, key)
+        groups.setdefault(representative, []).append(key)
+    return groups
+
+
+# -----------------------------------------------------------
+# Ejecución en paralelo (pool de procesos)
+# -----------------------------------------------------------
+ENGINES = ('generacional', 'islas')
+
+
+def get_engine(name=None):
+    """
+    Función del motor de GA por nombre: 'generacional' (`run_ga`, por defecto) o
+    'islas' (`run_island_ga`). Ambas comparten firma y retorno.
+    """
+    if name in (None, '', 'generacional'):
+        return run_ga
+    if name == 'islas':
+        from utils.island_model import run_island_ga
+        return run_island_ga
+    raise ValueError(f"Motor de GA desconocido: {name}")
+
+
+def run_ga_job(job, log_queue=None, cancel=None, events=False):
+    """
+    Punto de entrada de un trabajo del pool: ejecuta `run_ga` para una galería.
+
+    Args:
+        job (dict): 'key' (identificador que se devuelve tal cual), 'kwargs'
+            (argumentos del motor, sin `log`) y opcionalmente 'engine' (ver
+            `get_engine`) y 'time_budget' (segundos desde que arranca el trabajo).
+        log_queue: Cola (de un Manager) donde se envían tuplas (key, 'log', línea)
+            para que el proceso padre las reparta en los logs de la corrida.
+        cancel: `Event` de un Manager para cancelar el trabajo desde el padre.
+        events (bool): Enviar también los eventos de progreso como
+            (key, 'event', (tipo, datos)); los de GENERATION a lo sumo cada
+            PROGRESS_INTERVAL segundos.
+
+    Returns:
+        tuple: (key, (best_chromosome, best_metrics, best_fitness), info).
+    """
+    key = job['key']
+    log = None
+    kwargs = dict(job['kwargs'])
+    if log_queue is not None:
+        log = lambda line: log_queue.put((key, 'log', line))
+        if events:
+            kwargs['on_event'] = _forward_events(key, log_queue)
+    if job.get('time_budget') is not None:
+        # El presupuesto corre desde que el trabajo empieza, no desde que se encoló
+        deadline = time.time() + job['time_budget']
+        if kwargs.get('deadline') is not None:
+            deadline = min(deadline, kwargs['deadline'])
+        kwargs['deadline'] = deadline
+    if cancel is not None:
+        kwargs['cancel'] = cancel
+    info = {}
+    result = get_engine(job.get('engine'))(log=log, info=info, **kwargs)
+    return key, result, info
+
+
+def _forward_events(key, log_queue):
+    # GENERATION llega en cada generación; por IPC solo se envía una cada
+    # PROGRESS_INTERVAL segundos (las mejoras se envían todas)
+    last_sent = [0.0]
+
+    def on_event(kind, data):
+        if kind == GENERATION:
+            now = time.time()
+            if now - last_sent[0] < PROGRESS_INTERVAL:
+                return
+            last_sent[0] = now
+        log_queue.put((key, 'event', (kind, data)))
+    return on_event
+
+
+def time_slice(deadline, pending_jobs, workers=1, reserve_fraction=0.1):
+    """
+    Segundos asignados a cada trabajo pendiente dentro de un plazo global.
+
+    El tiempo restante (menos una reserva para guardar resultados) se reparte
+    entre las tandas de trabajos que quedan: con `workers` procesos, los trabajos
+    corren de a `workers` a la vez.
+
+    Returns:
+        float | None: Presupuesto por trabajo, o None si no hay plazo.
+    """
+    if deadline is None:
+        return None
+    remaining = (deadline - time.time()) * (1 - reserve_fraction)
+    waves = -(-max(1, pending_jobs) // max(1, workers))
+    return max(0.0, remaining / waves)
+
+
+_EXECUTOR = None
+_MANAGER = None
+# Protege _EXECUTOR y _MANAGER: las corridas llegan desde varios hilos de la cola
+_POOL_LOCK = threading.Lock()
+
+
+def resolve_workers(configured, sync_mode=False, jobs=7):
+    """
+    Número de procesos a usar para una corrida.
+
+    Args:
+        configured (int): Valor de GA_WORKERS; 0 significa automático.
+        sync_mode (bool): En modo síncrono (serverless) el automático es 1.
+        jobs (int): Trabajos independientes de la corrida (no tiene sentido más procesos).
+
+    Returns:
+        int: Procesos a usar (1 = ejecución secuencial en el hilo actual).
+    """
+    if configured and configured > 0:
+        return configured
+    if sync_mode:
+        return 1
+    return max(1, min(os.cpu_count() or 1, jobs))
+
+
+def pool_size(configured=0):
+    """Procesos del pool compartido: GA_WORKERS si se definió, si no los núcleos."""
+    if configured and configured > 0:
+        return configured
+    return max(1, os.cpu_count() or 1)
+
+
+def get_executor(configured=0):
+    """
+    Pool de procesos compartido por todas las corridas del proceso web.
+
+    Se crea una sola vez con `pool_size(configured)` procesos y no se cierra
+    mientras tenga trabajos: una corrida que quiere menos procesos envía menos
+    trabajos a la vez (ver `run_ga_jobs`). Usa el contexto 'spawn' para no
+    heredar (con fork) los hilos, locks y conexiones de base de datos del servidor.
+    """
+    global _EXECUTOR
+    with _POOL_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ProcessPoolExecutor(max_workers=pool_size(configured),
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _EXECUTOR
+
+
+def _discard_broken(executor):
+    """Descarta el pool `executor` si sigue siendo el compartido (está roto: sus trabajos ya fallaron)."""
+    global _EXECUTOR
+    with _POOL_LOCK:
+        if _EXECUTOR is executor:
+            _EXECUTOR = None
+    executor.shutdown(wait=False)
+
+
+def shutdown_executor():
+    """Cierra el pool compartido al terminar el proceso (cancela lo que no empezó)."""
+    global _EXECUTOR
+    with _POOL_LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_manager():
+    global _MANAGER
+    with _POOL_LOCK:
+        if _MANAGER is None:
+            _MANAGER = multiprocessing.get_context('spawn').Manager()
+        return _MANAGER
+
+
+def run_ga_jobs(jobs, max_workers, on_log=None, on_result=None, poll_interval=0.2, cancel=None,
+                on_event=None, pool_workers=0):
+    """
+    Ejecuta varios trabajos de `run_ga` en el pool y entrega cada resultado
+    apenas termina, reenviando el progreso de los procesos mientras tanto.
+
+    Args:
+        jobs (list): Trabajos en el formato de `run_ga_job`.
+        max_workers (int): Trabajos de esta corrida en el pool a la vez; el
+            resto se envía a medida que terminan.
+        on_log (callable): on_log(key, línea), llamado en el hilo actual.
+        on_result (callable): on_result(key, resultado, info), en orden de
+            finalización. Si un trabajo falla (o el pool lo cancela), el
+            resultado es la excepción.
+        cancel: Token de cancelación del padre (`threading.Event`). Al activarse
+            se descartan los trabajos que no empezaron y los que corren terminan
+            en su siguiente generación (criterio 'cancelada').
+        on_event (callable): on_event(key, tipo, datos) con los eventos de
+            progreso de `run_ga`, en el hilo actual (GENERATION a lo sumo cada
+            PROGRESS_INTERVAL segundos por trabajo).
+        pool_workers (int): GA_WORKERS, para dimensionar el pool si aún no existe.
+
+    Returns:
+        dict: key -> resultado (tupla de `run_ga` o excepción).
+    """
+    uses_queue = on_log is not None or on_event is not None
+    log_queue = _get_manager().Queue() if uses_queue else None
+    remote_cancel = _get_manager().Event() if cancel is not None else None
+
+    def drain():
+        if log_queue is None:
+            return
+        while True:
+            try:
+                key, kind, payload = log_queue.get_nowait()
+            except queue.Empty:
+                return
+            if kind == 'event':
+                if on_event is not None:
+                    on_event(key, *payload)
+            elif on_log is not None:
+                on_log(key, payload)
+
+    def submit(job):
+        executor = get_executor(pool_workers)
+        try:
+            return executor.submit(run_ga_job, job, log_queue, remote_cancel, on_event is not None)
+        except BrokenProcessPool:
+            # Un proceso del pool murió: se reemplaza el pool una vez
+            _discard_broken(executor)
+            return get_executor(pool_workers).submit(run_ga_job, job, log_queue, remote_cancel,
+                                                     on_event is not None)
+
+    waiting = list(jobs)
+    futures = {}
+    pending = set()
+    cancelled_here = set()
+    results = {}
+
+    def finish(key, result, info):
+        results[key] = result
+        if on_result is not None:
+            on_result(key, result, info)
+
+    def fill():
+        while waiting and len(pending) < max(1, max_workers):
+            job = waiting.pop(0)
+            try:
+                future = submit(job)
+            except Exception as e:
+                finish(job['key'], e, {})
+                continue
+            futures[future] = job['key']
+            pending.add(future)
+
+    fill()
+    while pending:
+        done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+        pending.difference_update(done)
+        drain()
+        if cancel is not None and cancel.is_set() and not remote_cancel.is_set():
+            remote_cancel.set()
+            waiting.clear()
+            for future in pending:
+                if future.cancel():
+                    cancelled_here.add(future)
+        for future in done:
+            if future in cancelled_here:
+                continue
+            key = futures[future]
+            try:
+                _, result, info = future.result()
+            except Exception as e:
+                # Incluye CancelledError: el pool canceló un trabajo que esta corrida no canceló
+                result, info = e, {}
+            finish(key, result, info)
+        fill()
+    drain()
+    return results
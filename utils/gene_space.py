@@ -0,0 +1,190 @@
+import math
+import random
+from functools import lru_cache
+
+import numpy as np
+
+# Genes dependientes: índice -> (gen base, fracción mínima, fracción máxima, incremento).
+# El gen base indica de qué valor se toman las fracciones; para g_TaCiPa y g_TaZoAu
+# ese valor puede venir de las constantes (población inicial) o del propio cromosoma
+# (recalculo tras cruce/mutación).
+DEPENDENT_GENES = {
+    1: ('g_TamLot', 0.60, 0.75, 50),  # g_TamCom
+    2: ('g_TamCom', 0.15, 0.25, 50),  # g_TaZoCo
+    3: ('g_TamCom', 0.10, 0.20, 50),  # g_AreVer
+    4: ('g_TamPar', 0.30, 0.40, 50),  # g_TaCiPa
+    5: ('g_TaUtPa', 0.70, 0.80, 20),  # g_TaZoAu
+}
+
+
+class RangeDomain:
+    """
+    Dominio aritmético (start, end, increment) que nunca materializa la lista de valores.
+
+    Los valores posibles son start + k * increment con 0 <= k < cardinality y nunca
+    pasan de `end`, aunque `end - start` no sea múltiplo de `increment`: para enteros
+    `range(start, end + 1, increment)` y para flotantes la rejilla redondeada a dos
+    decimales.
+    """
+
+    __slots__ = ('start', 'end', 'increment', 'is_float', 'cardinality', '_values')
+
+    def __init__(self, start, end, increment):
+        self.start = start
+        self.end = end
+        self.increment = increment
+        self.is_float = not (isinstance(start, int) and isinstance(end, int) and isinstance(increment, int))
+        if self.is_float:
+            self._values = None
+            # El margen absorbe el error de punto flotante de (end - start) / increment
+            self.cardinality = max(1, int(math.floor((end - start) / increment + 1e-9)) + 1)
+        else:
+            # range() es perezoso: len() e indexación son O(1)
+            self._values = range(start, end + 1, increment) or range(start, start + 1)
+            self.cardinality = len(self._values)
+
+    @property
+    def bounds(self):
+        return self.start, self.end
+
+    def value_at(self, k):
+        if self._values is not None:
+            return self._values[k]
+        return round(self.start + k * self.increment, 2)
+
+    def sample(self, rng=random):
+        return self.value_at(rng.randrange(self.cardinality))
+
+    def snap(self, value):
+        """Acota el valor a [start, end] y lo ajusta al múltiplo de increment más cercano."""
+        value = max(self.start, min(self.end, value))
+        k = int(round((value - self.start) / self.increment))
+        k = max(0, min(self.cardinality - 1, k))
+        snapped = self.value_at(k)
+        if snapped > self.end and k > 0:
+            snapped = self.value_at(k - 1)
+        return snapped
+
+
+class ChoiceDomain:
+    """Dominio categórico a partir de una lista de valores permitidos."""
+
+    __slots__ = ('values', 'array', 'cardinality')
+
+    def __init__(self, values):
+        self.values = tuple(values)
+        self.array = np.asarray(self.values)
+        self.cardinality = len(self.values)
+
+    @property
+    def bounds(self):
+        return min(self.values), max(self.values)
+
+    def value_at(self, k):
+        return self.values[k]
+
+    def sample(self, rng=random):
+        return self.values[rng.randrange(self.cardinality)]
+
+    def snap(self, value):
+        """Devuelve el valor permitido más cercano."""
+        return self.values[int(np.abs(self.array - value).argmin())]
+
+
+def make_domain(gene_def):
+    """
+    Construye el dominio correspondiente a una definición de gen.
+
+    Args:
+        gene_def (tuple | list): Tupla (start, end, increment) o lista de valores.
+
+    Returns:
+        RangeDomain | ChoiceDomain: El dominio del gen.
+    """
+    if isinstance(gene_def, tuple) and len(gene_def) == 3:
+        return RangeDomain(*gene_def)
+    if isinstance(gene_def, list):
+        return ChoiceDomain(gene_def)
+    raise ValueError("Definición de gen inválida.")
+
+
+class GeneSpace:
+    """
+    Espacio de búsqueda precalculado a partir de `gene_definitions`.
+
+    Expone cardinalidad, cotas, muestreo O(1) y ajuste a la rejilla de cada gen,
+    además de los dominios de los genes dependientes en función de su gen base.
+    """
+
+    def __init__(self, gene_definitions):
+        self.gene_definitions = gene_definitions
+        self.domains = [make_domain(gene_def) for gene_def in gene_definitions]
+
+    def __len__(self):
+        return len(self.domains)
+
+    def domain(self, index):
+        return self.domains[index]
+
+    def cardinality(self, index):
+        return self.domains[index].cardinality
+
+    def bounds(self, index):
+        return self.domains[index].bounds
+
+    def sample(self, index, rng=random):
+        return self.domains[index].sample(rng)
+
+    def snap(self, index, value):
+        return self.domains[index].snap(value)
+
+    def log10_size(self):
+        """Tamaño del espacio de búsqueda (log10), útil para diagnóstico."""
+        return sum(math.log10(d.cardinality) for d in self.domains)
+
+    @staticmethod
+    def dependent_domain(index, base_value):
+        """
+        Dominio de un gen dependiente dado el valor de su gen base.
+
+        Args:
+            index (int): Índice del gen dependiente (ver DEPENDENT_GENES).
+            base_value (float): Valor del gen base.
+
+        Returns:
+            RangeDomain: Dominio perezoso entre las fracciones del valor base.
+        """
+        _, low, high, increment = DEPENDENT_GENES[index]
+        return _dependent_domain(int(base_value * low), int(base_value * high), increment)
+
+
+@lru_cache(maxsize=4096)
+def _dependent_domain(start, end, increment):
+    return RangeDomain(start, end, increment)
+
+
+def _definitions_key(gene_definitions):
+    return tuple(tuple(d) if isinstance(d, list) else d for d in gene_definitions)
+
+
+_SPACES = {}
+
+
+def get_gene_space(gene_definitions):
+    """
+    Devuelve el GeneSpace de unas definiciones de genes, construyéndolo una sola vez.
+
+    Args:
+        gene_definitions (list | GeneSpace): Definiciones de genes o un GeneSpace ya creado.
+
+    Returns:
+        GeneSpace: El espacio de genes correspondiente.
+    """
+    if isinstance(gene_definitions, GeneSpace):
+        return gene_definitions
+    key = _definitions_key(gene_definitions)
+    space = _SPACES.get(key)
+    if space is None:
+        space = GeneSpace(gene_definitions)
+        _SPACES[key] = space
+    return space
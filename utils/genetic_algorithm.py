@@ -2,6 +2,9 @@ import random
 import math
 import numpy as np
 
+from utils.fitness_cache import chromosome_key
+from utils.gene_space import GeneSpace, RangeDomain, get_gene_space
+
 def create_initial_population(population_size, gene_definitions, user_inputs, constants):
     """
     Genera una población inicial para un algoritmo genético con genes multivaluados,
@@ -18,6 +21,8 @@ def create_initial_population(population_size, gene_definitions, user_inputs, co
         elegidos basándose en las definiciones de los genes y las dependencias.
     """
     population = []
+    seen = set()
+    space = get_gene_space(gene_definitions)
     
     # Mapeo de nombres de genes a sus índices para facilitar el acceso
     gene_map = {
@@ -30,83 +35,39 @@ def create_initial_population(population_size, gene_definitions, user_inputs, co
     attempts = 0
 
     while len(population) < population_size and attempts < max_attempts:
-        chromosome = [None] * len(gene_definitions)
+        chromosome = [None] * len(space)
 
         # 1. Asignar los valores fijos del usuario
         for name, value in user_inputs.items():
             if name in gene_map:
                 chromosome[gene_map[name]] = value
         
-        # 2. Iterar sobre las definiciones de los genes para generar el resto
-        for i, gene_def in enumerate(gene_definitions):
+        # 2. Iterar sobre los dominios de los genes para generar el resto
+        for i, domain in enumerate(space.domains):
             # Saltar los genes que ya han sido definidos por el usuario
             if chromosome[i] is not None:
                 continue
 
-            # 3. Aplicar lógica de dependencias
+            # 3. Aplicar lógica de dependencias (dominio según el valor del gen base)
             if i == gene_map['g_TamCom']:
-                g_TamLot = chromosome[gene_map['g_TamLot']]
-                start = int(g_TamLot * 0.60)
-                end = int(g_TamLot * 0.75)
-                increment = 50
-                gene_def = (start, end, increment)
-
-            elif i == gene_map['g_TaZoCo']:
-                g_TamCom = chromosome[gene_map['g_TamCom']]
-                start = int(g_TamCom * 0.15)
-                end = int(g_TamCom * 0.25)
-                increment = 50
-                gene_def = (start, end, increment)
-
-            elif i == gene_map['g_AreVer']:
-                g_TamCom = chromosome[gene_map['g_TamCom']]
-                start = int(g_TamCom * 0.10)
-                end = int(g_TamCom * 0.20)
-                increment = 50
-                gene_def = (start, end, increment)
-
+                domain = space.dependent_domain(i, chromosome[gene_map['g_TamLot']])
+            elif i in (gene_map['g_TaZoCo'], gene_map['g_AreVer']):
+                domain = space.dependent_domain(i, chromosome[gene_map['g_TamCom']])
             elif i == gene_map['g_TaCiPa']:
-                g_TamPar = constants['g_TamPar']
-                start = int(g_TamPar * 0.30)
-                end = int(g_TamPar * 0.40)
-                increment = 50
-                gene_def = (start, end, increment)
-
+                domain = space.dependent_domain(i, constants['g_TamPar'])
             elif i == gene_map['g_TaZoAu']:
-                g_TaUtPa = constants['g_TaUtPa']
-                start = int(g_TaUtPa * 0.70)
-                end = int(g_TaUtPa * 0.80)
-                increment = 20
-                gene_def = (start, end, increment)
-            
-            # 4. Lógica de generación estándar para el gen actual
-            if isinstance(gene_def, tuple) and len(gene_def) == 3:
-                start, end, increment = gene_def
-                
-                if isinstance(start, int) and isinstance(end, int) and isinstance(increment, int):
-                    possible_values = list(range(start, end + increment, increment))
-                else:
-                    num_steps = int(round((end - start) / increment)) + 1
-                    possible_values = [start + i * increment for i in range(num_steps)]
-
-                value = random.choice(possible_values)
-                if isinstance(value, float):
-                    chromosome[i] = round(value, 2)
-                else:
-                    chromosome[i] = value
+                domain = space.dependent_domain(i, constants['g_TaUtPa'])
             
-            elif isinstance(gene_def, list):
-                value = random.choice(gene_def)
-                if isinstance(value, float):
-                    chromosome[i] = round(value, 2)
-                else:
-                    chromosome[i] = value
-            else:
-                raise ValueError(f"Definición de gen inválida para el índice {i}.")
+            # 4. Muestreo O(1) sobre el dominio, sin materializar la lista de valores
+            chromosome[i] = domain.sample()
         
-        # 5. Verificar la unicidad del cromosoma y agregarlo a la población
-        if chromosome not in population:
+        # 5. Verificar la unicidad del cromosoma (conjunto hash, O(1)) y agregarlo a la población
+        key = chromosome_key(chromosome)
+        if key not in seen:
+            seen.add(key)
             population.append(chromosome)
+        else:
+            attempts += 1
     
     return population
 
@@ -129,33 +90,26 @@ def mutate_chromosome(chromosome, gene_definitions, mutation_rate, sigma_factor,
     if user_gene_indices is None:
         user_gene_indices = [0, 24, 25]  # Solo g_TamLot, b_CanPri, b_CanSec
 
+    space = get_gene_space(gene_definitions)
     mutated_chromosome = [None] * len(chromosome)
 
     # Paso 1: Mutar solo los genes independientes
-    for i, gene_def in enumerate(gene_definitions):
+    for i, domain in enumerate(space.domains):
         if i in user_gene_indices:
             mutated_chromosome[i] = chromosome[i]
             continue
         
         if random.random() < mutation_rate:
-            if isinstance(gene_def, tuple) and len(gene_def) == 3:
-                current_value = chromosome[i]
-                start, end, _ = gene_def
+            if isinstance(domain, RangeDomain):
+                start, end = domain.bounds
                 
                 sigma = (end - start) * sigma_factor
                 mutation_value = np.random.normal(0, sigma)
-                new_value = current_value + mutation_value
-                
-                new_value = max(start, min(end, new_value))
                 
-                if isinstance(start, float):
-                    mutated_chromosome[i] = round(new_value, 2)
-                else:
-                    mutated_chromosome[i] = int(round(new_value))
-            elif isinstance(gene_def, list):
-                mutated_chromosome[i] = random.choice(gene_def)
+                # Acotar y ajustar a la rejilla del incremento declarado
+                mutated_chromosome[i] = domain.snap(chromosome[i] + mutation_value)
             else:
-                raise ValueError("Definición de gen inválida.")
+                mutated_chromosome[i] = domain.sample()
         else:
             mutated_chromosome[i] = chromosome[i]
 
@@ -178,20 +132,20 @@ def recalculate_dependent_genes(chromosome, constants):
         'g_TaZoAu': 5, 'b_CanPri': 24, 'b_CanSec': 25
     }
 
-    # Recalcular g_TamCom, g_TaZoCo, g_AreVer
+    # Recalcular g_TamCom, g_TaZoCo, g_AreVer sobre la rejilla de su dominio dependiente
     g_TamLot = chromosome[gene_map['g_TamLot']]
-    chromosome[gene_map['g_TamCom']] = int(g_TamLot * random.uniform(0.60, 0.75))
+    chromosome[gene_map['g_TamCom']] = GeneSpace.dependent_domain(gene_map['g_TamCom'], g_TamLot).sample()
     
     g_TamCom = chromosome[gene_map['g_TamCom']]
-    chromosome[gene_map['g_TaZoCo']] = int(g_TamCom * random.uniform(0.15, 0.25))
-    chromosome[gene_map['g_AreVer']] = int(g_TamCom * random.uniform(0.10, 0.20))
+    chromosome[gene_map['g_TaZoCo']] = GeneSpace.dependent_domain(gene_map['g_TaZoCo'], g_TamCom).sample()
+    chromosome[gene_map['g_AreVer']] = GeneSpace.dependent_domain(gene_map['g_AreVer'], g_TamCom).sample()
     
     # Recalcular g_TaCiPa, g_TaZoAu
     g_TamPar = g_TamLot - g_TamCom # Asumiendo que g_TamPar es la diferencia
-    chromosome[gene_map['g_TaCiPa']] = int(g_TamPar * random.uniform(0.30, 0.40))
+    chromosome[gene_map['g_TaCiPa']] = GeneSpace.dependent_domain(gene_map['g_TaCiPa'], g_TamPar).sample()
     
     g_TaUtPa = g_TamPar - chromosome[gene_map['g_TaCiPa']] # Asumiendo que g_TaUtPa es la diferencia
-    chromosome[gene_map['g_TaZoAu']] = int(g_TaUtPa * random.uniform(0.70, 0.80))
+    chromosome[gene_map['g_TaZoAu']] = GeneSpace.dependent_domain(gene_map['g_TaZoAu'], g_TaUtPa).sample()
     
     return chromosome
 
@@ -0,0 +1,433 @@
+import multiprocessing
+import queue
+import random
+import traceback
+
+import numpy as np
+
+from utils.batch_evaluation import FitnessKernel
+from utils.fitness_cache import FitnessCache
+from utils.ga_engine import (
+    STOP_CANCELLED,
+    STOP_CONVERGENCE,
+    STOP_DEADLINE,
+    STOP_ERROR,
+    STOP_GENERATIONS,
+    breed_generation,
+    prepare_constants,
+    report_best_solution,
+    stop_reason,
+)
+from utils.progress import GENERATION, NEW_BEST, VERBOSITY_INFO, LevelLog
+from utils.genetic_algorithm import (
+    adjust_parameters,
+    calculate_diversity,
+    create_initial_population,
+    gene_definitions,
+    select_elites,
+)
+
+TOPOLOGIES = ('ring', 'random')
+
+# Tamaño mínimo de cada subpoblación (por debajo el torneo pierde sentido)
+MIN_ISLAND_POPULATION = 10
+
+# Segundos máximos de espera por el reporte de una isla antes de darla por perdida
+ISLAND_TIMEOUT = 600
+
+
+class Island:
+    """
+    Subpoblación del modelo de islas. Evoluciona con los mismos operadores y
+    reglas de `run_ga` (torneo, cruce, mutación, élites, inmigrantes aleatorios y
+    ajuste heurístico de parámetros) y puede emitir y recibir migrantes.
+    """
+
+    def __init__(self, island_id, user_inputs, full_constants, population_size, max_generations,
+                 elite_percentage, mutation_rate, sigma_factor, crossover_rate, weights,
+                 cache_size=20000, deadline=None, convergence_window=0):
+        self.island_id = island_id
+        self.user_inputs = user_inputs
+        self.full_constants = full_constants
+        self.population_size = population_size
+        self.max_generations = max_generations
+        self.elite_percentage = elite_percentage
+        self.mutation_rate = mutation_rate
+        self.sigma_factor = sigma_factor
+        self.crossover_rate = crossover_rate
+        self.deadline = deadline
+        self.convergence_window = convergence_window
+
+        self.cache = FitnessCache(cache_size)
+        self.evaluator = FitnessKernel(full_constants, weights)
+        self.population = create_initial_population(population_size, gene_definitions, user_inputs, full_constants)
+
+        self.generation = 0
+        self.best_fitness = -np.inf
+        self.best_chromosome = None
+        self.best_generation = 0
+        self.average_fitness = 0.0
+        self.diversity = 0.0
+        self.stagnation_count = 0
+        self.improvement_count = 0
+        self.done = False
+        self.stop_reason = None
+
+    def evolve(self, generations):
+        """
+        Avanza hasta `generations` generaciones o hasta un criterio de parada de
+        `run_ga` (ver `stop_reason`).
+
+        Returns:
+            bool: True si la isla terminó.
+        """
+        for _ in range(generations):
+            if self.done:
+                break
+            self.generation += 1
+            fitness_scores = self.cache.evaluate(self.population, self.evaluator)
+
+            current_best_fitness = max(fitness_scores)
+            if current_best_fitness > self.best_fitness:
+                self.improvement_count += 1
+                self.stagnation_count = 0
+                self.best_fitness = current_best_fitness
+                self.best_chromosome = self.population[fitness_scores.index(current_best_fitness)].copy()
+                self.best_generation = self.generation
+            else:
+                self.stagnation_count += 1
+                self.improvement_count = 0
+
+            self.diversity = calculate_diversity(fitness_scores)
+            elites = select_elites(self.population, fitness_scores, self.elite_percentage)
+
+            self.average_fitness = float(np.mean(fitness_scores))
+            self.stop_reason = stop_reason(self.generation, self.max_generations, self.average_fitness,
+                                           self.stagnation_count, self.convergence_window, self.deadline)
+            if self.stop_reason is not None:
+                self.done = True
+                break
+
+            params = {
+                'mutation_rate': self.mutation_rate,
+                'sigma_factor': self.sigma_factor,
+                'elite_percentage': self.elite_percentage
+            }
+            new_params = adjust_parameters(params, self.diversity, self.stagnation_count, self.improvement_count)
+            self.mutation_rate = new_params['mutation_rate']
+            self.sigma_factor = new_params['sigma_factor']
+            self.elite_percentage = new_params['elite_percentage']
+
+            self.population = breed_generation(self.population, fitness_scores, elites, self.population_size,
+                                               self.user_inputs, self.full_constants, self.mutation_rate,
+                                               self.sigma_factor, self.crossover_rate)
+        return self.done
+
+    def emigrants(self, count):
+        """Copias de los `count` mejores individuos de la población actual."""
+        if count <= 0:
+            return []
+        fitness_scores = self.cache.evaluate(self.population, self.evaluator)
+        order = np.argsort(fitness_scores)[::-1][:count]
+        return [list(self.population[i]) for i in order]
+
+    def receive(self, immigrants):
+        """Reemplaza a los peores individuos por los inmigrantes."""
+        if not immigrants:
+            return
+        fitness_scores = self.cache.evaluate(self.population, self.evaluator)
+        worst = np.argsort(fitness_scores)[:len(immigrants)]
+        for index, immigrant in zip(worst, immigrants):
+            self.population[index] = list(immigrant)
+
+    def report(self):
+        stats = self.cache.stats()
+        return {
+            'island': self.island_id,
+            'generation': self.generation,
+            'best_fitness': self.best_fitness,
+            'best_chromosome': self.best_chromosome,
+            'best_generation': self.best_generation,
+            'average_fitness': self.average_fitness,
+            'diversity': self.diversity,
+            'mutation_rate': self.mutation_rate,
+            'done': self.done,
+            'stop_reason': self.stop_reason,
+            'cache_hits': stats['hits'],
+            'cache_misses': stats['misses'],
+        }
+
+
+def _island_process(island_config, migration_interval, migrants, inbox, outbox):
+    """
+    Proceso de una isla: evoluciona `migration_interval` generaciones, reporta su
+    estado y sus emigrantes al coordinador y espera los inmigrantes para seguir.
+    """
+    island_id = island_config['island_id']
+    try:
+        island = Island(**island_config)
+        while True:
+            done = island.evolve(migration_interval)
+            outbox.put(('reporte', island_id, island.report(), [] if done else island.emigrants(migrants)))
+            if done:
+                return
+            immigrants = inbox.get()
+            if immigrants is None:
+                return
+            island.receive(immigrants)
+    except Exception:
+        outbox.put(('error', island_id, traceback.format_exc(), []))
+
+
+class _LocalIslands:
+    """Islas evolucionadas por turnos en el proceso actual (sin procesos hijos)."""
+
+    def __init__(self, configs, migration_interval, migrants):
+        self.islands = {c['island_id']: Island(**c) for c in configs}
+        self.migration_interval = migration_interval
+        self.migrants = migrants
+        self.pending = {}
+
+    def collect(self, active):
+        reports = {}
+        for island_id in sorted(active):
+            island = self.islands[island_id]
+            island.receive(self.pending.pop(island_id, None))
+            done = island.evolve(self.migration_interval)
+            reports[island_id] = ('reporte', island.report(), [] if done else island.emigrants(self.migrants))
+        return reports
+
+    def send(self, island_id, immigrants):
+        self.pending[island_id] = immigrants
+
+    def close(self):
+        pass
+
+
+class _ProcessIslands:
+    """Una isla por proceso ('spawn'), comunicadas con el coordinador por colas."""
+
+    def __init__(self, configs, migration_interval, migrants):
+        context = multiprocessing.get_context('spawn')
+        self.outbox = context.Queue()
+        self.inboxes = {}
+        self.processes = {}
+        for config in configs:
+            island_id = config['island_id']
+            self.inboxes[island_id] = context.Queue()
+            process = context.Process(
+                target=_island_process,
+                args=(config, migration_interval, migrants, self.inboxes[island_id], self.outbox),
+                daemon=True,
+            )
+            process.start()
+            self.processes[island_id] = process
+
+    def collect(self, active):
+        reports = {}
+        while len(reports) < len(active):
+            try:
+                kind, island_id, payload, emigrants = self.outbox.get(timeout=ISLAND_TIMEOUT)
+            except queue.Empty:
+                for island_id in active - set(reports):
+                    reports[island_id] = ('error', 'sin respuesta de la isla', [])
+                break
+            reports[island_id] = (kind, payload, emigrants)
+        return reports
+
+    def send(self, island_id, immigrants):
+        self.inboxes[island_id].put(immigrants)
+
+    def close(self):
+        for island_id, process in self.processes.items():
+            if process.is_alive():
+                self.inboxes[island_id].put(None)
+        for process in self.processes.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def _destinations(active, topology, rng=random):
+    """
+    Isla destino de los emigrantes de cada isla activa.
+
+    'ring' envía a la siguiente isla activa (por índice, cerrando el anillo);
+    'random' a otra isla activa elegida al azar en cada migración.
+    """
+    ordered = sorted(active)
+    if len(ordered) < 2:
+        return {}
+    if topology == 'random':
+        return {i: rng.choice([j for j in ordered if j != i]) for i in ordered}
+    return {i: ordered[(k + 1) % len(ordered)] for k, i in enumerate(ordered)}
+
+
+def run_island_ga(user_inputs, constants, population_size, max_generations, elite_percentage,
+                  mutation_rate, sigma_factor, crossover_rate, weights, log=None, cache_size=20000,
+                  islands=4, migration_interval=10, migrants=2, topology='ring', processes=True,
+                  deadline=None, convergence_window=0, info=None, cancel=None, on_event=None,
+                  verbosity=VERBOSITY_INFO):
+    """
+    Algoritmo genético con modelo de islas y migración periódica.
+
+    La población se reparte en `islands` subpoblaciones que evolucionan en
+    paralelo (un proceso por isla) y cada `migration_interval` generaciones
+    envían sus `migrants` mejores individuos a otra isla según `topology`,
+    donde reemplazan a los peores. Misma interfaz y retorno que `run_ga`.
+
+    Args:
+        islands (int): Número de islas.
+        migration_interval (int): Generaciones entre migraciones.
+        migrants (int): Individuos que emigra cada isla por migración.
+        topology (str): 'ring' o 'random'.
+        processes (bool): Si es False, las islas evolucionan por turnos en el
+            proceso actual (p. ej. en SYNC_MODE o dentro del pool de galerías).
+        deadline, convergence_window, info: Como en `run_ga`; cada isla aplica
+            el plazo y la ventana de convergencia por su cuenta.
+        cancel: Como en `run_ga`, pero se revisa entre migraciones (a lo sumo
+            `migration_interval` generaciones después de activarse).
+        on_event, verbosity: Como en `run_ga`; GENERATION se emite tras cada
+            migración con la generación más avanzada, la mejor aptitud y el
+            promedio y la diversidad medios de las islas.
+
+    Returns:
+        tuple: (best_chromosome, best_metrics, best_fitness).
+    """
+    say = LevelLog(log, verbosity)
+    if info is None:
+        info = {}
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Topología de migración inválida: {topology}")
+
+    best_chromosome = None
+    best_metrics = {}
+    best_fitness = 0.0
+    group = None
+
+    try:
+        full_constants = prepare_constants(constants, say.info)
+
+        islands = max(1, int(islands))
+        island_size = max(MIN_ISLAND_POPULATION, population_size // islands)
+        migration_interval = max(1, int(migration_interval))
+        migrants = max(0, min(int(migrants), island_size - 1))
+        say.info("Modelo de islas: %d islas de %d individuos, migracion cada %d generaciones "
+                 "(%d migrantes, topologia %s)", islands, island_size, migration_interval, migrants, topology)
+        say.info("Iniciando algoritmo genetico principal...")
+
+        configs = [{
+            'island_id': i,
+            'user_inputs': user_inputs,
+            'full_constants': full_constants,
+            'population_size': island_size,
+            'max_generations': max_generations,
+            'elite_percentage': elite_percentage,
+            'mutation_rate': mutation_rate,
+            'sigma_factor': sigma_factor,
+            'crossover_rate': crossover_rate,
+            'weights': tuple(weights),
+            'cache_size': cache_size,
+            'deadline': deadline,
+            'convergence_window': convergence_window,
+        } for i in range(islands)]
+        group = (_ProcessIslands if processes and islands > 1 else _LocalIslands)(
+            configs, migration_interval, migrants)
+
+        best_fitness = -np.inf
+        cache_hits = cache_misses = 0
+        reasons = []
+        generations = 0
+        active = set(range(islands))
+        while active:
+            if cancel is not None and cancel.is_set():
+                info['stop_reason'] = STOP_CANCELLED
+                info['generations'] = generations
+                say.info("Corrida cancelada")
+                return best_chromosome, {}, best_fitness if best_chromosome is not None else 0.0
+            reports = group.collect(active)
+            emigrants = {}
+            averages, diversities = [], []
+            for island_id in sorted(reports):
+                kind, payload, island_emigrants = reports[island_id]
+                if kind == 'error':
+                    say.warning("Isla %d: error, se retira del modelo\n%s", island_id, payload)
+                    active.discard(island_id)
+                    continue
+                say.debug("Isla %d: generacion %d, mejor fitness %.4f, promedio %.4f, diversidad %.4f",
+                          island_id, payload['generation'], payload['best_fitness'],
+                          payload['average_fitness'], payload['diversity'])
+                averages.append(payload['average_fitness'])
+                diversities.append(payload['diversity'])
+                if payload['best_chromosome'] is not None and payload['best_fitness'] > best_fitness:
+                    best_fitness = payload['best_fitness']
+                    best_chromosome = list(payload['best_chromosome'])
+                    say.info("Nueva mejor fitness %.4f en generacion %d (isla %d)",
+                             best_fitness, payload['best_generation'], island_id)
+                    if on_event is not None:
+                        on_event(NEW_BEST, {'generation': payload['best_generation'],
+                                            'best_fitness': float(best_fitness)})
+                if payload['done']:
+                    active.discard(island_id)
+                    cache_hits += payload['cache_hits']
+                    cache_misses += payload['cache_misses']
+                    reasons.append(payload['stop_reason'])
+                    say.info("Isla %d: criterio de parada alcanzado en la generacion %d (%s)",
+                             island_id, payload['generation'], payload['stop_reason'])
+                emigrants[island_id] = island_emigrants
+                generations = max(generations, payload['generation'])
+            if on_event is not None and best_chromosome is not None:
+                on_event(GENERATION, {'generation': generations, 'best_fitness': float(best_fitness),
+                                      'average_fitness': float(np.mean(averages)) if averages else 0.0,
+                                      'diversity': float(np.mean(diversities)) if diversities else 0.0})
+
+            # Migración entre las islas que siguen activas
+            destinations = _destinations(active, topology)
+            immigrants = {island_id: [] for island_id in active}
+            for origin, destination in destinations.items():
+                immigrants[destination].extend(emigrants.get(origin, []))
+            for island_id in active:
+                group.send(island_id, immigrants[island_id])
+
+        # El modelo terminó por tiempo si alguna isla lo hizo; por generaciones si
+        # todas agotaron el máximo; si no, por convergencia
+        if STOP_DEADLINE in reasons:
+            info['stop_reason'] = STOP_DEADLINE
+        elif reasons and all(r == STOP_GENERATIONS for r in reasons):
+            info['stop_reason'] = STOP_GENERATIONS
+        elif reasons:
+            info['stop_reason'] = STOP_CONVERGENCE
+        else:
+            info['stop_reason'] = STOP_ERROR
+        info['generations'] = generations
+
+        total = cache_hits + cache_misses
+        say.info("Cache de aptitud: %d aciertos, %d fallos (%.1f%% evaluaciones ahorradas)",
+                 cache_hits, cache_misses, (cache_hits / total * 100) if total else 0.0)
+
+        say.info("\n" + "="*60)
+        say.info("MEJOR SOLUCIoN ENCONTRADA")
+        say.info("="*60)
+
+        if best_chromosome is not None:
+            best_metrics, best_fitness = report_best_solution(best_chromosome, full_constants, weights,
+                                                              say.at(VERBOSITY_INFO))
+        else:
+            best_fitness = 0.0
+            say.warning("No se encontro una solucion optima.")
+
+    except Exception as e:
+        error_msg = f"Error en el algoritmo genético (islas): {str(e)}"
+        print(error_msg)
+        say.warning(error_msg)
+        say.warning(traceback.format_exc())
+        info['stop_reason'] = STOP_ERROR
+        if best_chromosome is not None and not best_metrics:
+            best_metrics, best_fitness = report_best_solution(best_chromosome, full_constants, weights,
+                                                              say.at(VERBOSITY_INFO))
+
+    finally:
+        if group is not None:
+            group.close()
+
+    return best_chromosome, best_metrics, best_fitness
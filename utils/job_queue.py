@@ -0,0 +1,357 @@
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict, deque
+
+# Estados de un trabajo (se muestran en el modal de progreso)
+JOB_QUEUED = 'en_cola'
+JOB_RUNNING = 'ejecutando'
+JOB_DONE = 'completado'
+JOB_FAILED = 'fallido'
+JOB_CANCELLED = 'cancelado'
+
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# Duración supuesta de una corrida mientras no haya ninguna terminada (segundos)
+DEFAULT_RUN_SECONDS = 60
+
+# Motivos de rechazo de una corrida (se cuentan en `JobQueue.stats()`)
+REJECT_QUEUE_FULL = 'cola_llena'
+REJECT_USER_QUEUED = 'limite_en_cola_usuario'
+REJECT_USER_BUDGET = 'presupuesto_usuario'
+
+
+class QueueFullError(Exception):
+    """La cola de trabajos está llena; `retry_after` sugiere cuántos segundos esperar."""
+    reason = REJECT_QUEUE_FULL
+
+    def __init__(self, retry_after, message=None):
+        super().__init__(message or f"La cola de corridas está llena; reintente en {retry_after} s")
+        self.retry_after = retry_after
+
+
+class UserLimitError(QueueFullError):
+    """El usuario superó uno de sus límites (corridas en espera o presupuesto por hora)."""
+
+    def __init__(self, reason, retry_after, message):
+        super().__init__(retry_after, message)
+        self.reason = reason
+
+
+class Job:
+    """Una corrida encolada, identificada por su thread_id (y su run_id)."""
+
+    def __init__(self, job_id, target, args, kwargs, run_id=None, user_key=None, cost=0):
+        self.job_id = job_id
+        self.run_id = run_id
+        self.user_key = user_key
+        self.cost = cost
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.state = JOB_QUEUED
+        self.cancel_requested = False
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'run_id': self.run_id,
+            'state': self.state,
+            'cost': self.cost,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Cola acotada de corridas con un número fijo de ejecutores.
+
+    Cada ejecutor es un hilo que toma la siguiente corrida de la cola y la lleva
+    de principio a fin; el cómputo del GA de cada galería va al pool de procesos
+    de `utils.ga_engine` (GA_WORKERS), de modo que nunca hay más de `workers`
+    corridas compitiendo por el intérprete. Si la cola está llena, `submit`
+    lanza `QueueFullError` con una estimación de espera para el cliente.
+
+    Límites por usuario (`user_key`; 0 = sin límite):
+      - `max_running_per_user`: corridas suyas ejecutándose a la vez; las demás
+        esperan en la cola aunque haya ejecutores libres.
+      - `max_queued_per_user`: corridas suyas esperando; más allá se rechazan.
+      - `budget_per_hour`: suma del costo (`cost`) de las corridas admitidas en
+        la última hora; se descuenta al admitirlas y se devuelve si se cancelan
+        antes de empezar.
+    Los rechazos por usuario lanzan `UserLimitError` (subclase de
+    `QueueFullError`) y se cuentan por motivo en `stats()`.
+
+    Reparto equitativo: el siguiente trabajo es el del usuario con menos
+    corridas ejecutándose (a igualdad, el atendido hace más tiempo) y, entre
+    las suyas, la más antigua; así las corridas de distintos usuarios se
+    intercalan y uno solo no acapara los ejecutores.
+    """
+
+    def __init__(self, workers=1, max_queued=8, keep_finished=200, max_running_per_user=0,
+                 max_queued_per_user=0, budget_per_hour=0, budget_window=3600):
+        self.workers = max(1, int(workers))
+        self.max_queued = max(0, int(max_queued))
+        self.keep_finished = keep_finished
+        self.max_running_per_user = max(0, int(max_running_per_user))
+        self.max_queued_per_user = max(0, int(max_queued_per_user))
+        self.budget_per_hour = max(0, int(budget_per_hour))
+        self.budget_window = budget_window
+        self._pending = deque()
+        self._jobs = OrderedDict()
+        self._running = Counter()       # user_key -> corridas ejecutándose
+        self._last_served = OrderedDict()   # user_key -> turno en que empezó su última corrida
+        self._turn = 0
+        self._usage = {}                # user_key -> deque([instante, costo, job_id])
+        self._durations = deque(maxlen=20)
+        self._condition = threading.Condition()
+        self._threads = []
+        self.rejected = Counter()
+
+    def _ensure_workers(self):
+        # Los hilos se crean con el primer trabajo (no al importar la app)
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(len(self._threads), self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ga-job-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job_id, target, *args, run_id=None, user_key=None, cost=0, replace=False, **kwargs):
+        """
+        Encola `target(*args, **kwargs)` bajo `job_id`.
+
+        Si ya hay un trabajo activo (en cola o ejecutándose) con ese `job_id` se
+        devuelve ese mismo, sin encolar otro.
+
+        Args:
+            cost (int): Costo de la corrida que se descuenta del presupuesto por
+                hora de `user_key`.
+            replace (bool): La corrida reemplazará a las que `user_key` tiene en
+                cola: esas no cuentan para los límites. Cancelarlas (solo si esta
+                fue admitida) queda a cargo de quien llama.
+
+        Returns:
+            Job: El trabajo encolado.
+
+        Raises:
+            QueueFullError: Si ya hay `max_queued` trabajos esperando.
+            UserLimitError: Si el usuario ya tiene `max_queued_per_user`
+                corridas esperando o la corrida excede su presupuesto.
+        """
+        with self._condition:
+            existing = self._jobs.get(job_id)
+            if existing is not None and existing.state not in FINISHED_STATES:
+                return existing
+            replaced = {job.job_id for job in self._pending if replace and job.user_key == user_key}
+            if len(self._pending) - len(replaced) >= self.max_queued:
+                self.rejected[REJECT_QUEUE_FULL] += 1
+                raise QueueFullError(self._retry_after_locked())
+            if self.max_queued_per_user:
+                queued = sum(1 for job in self._pending
+                             if job.user_key == user_key and job.job_id not in replaced)
+                if queued >= self.max_queued_per_user:
+                    self.rejected[REJECT_USER_QUEUED] += 1
+                    retry_after = self._retry_after_locked(queued)
+                    raise UserLimitError(
+                        REJECT_USER_QUEUED, retry_after,
+                        f"Ya tiene {queued} corrida(s) esperando en la cola; "
+                        f"espere a que empiecen (reintente en {retry_after} s)")
+            self._charge_locked(user_key, cost, job_id, exclude=replaced)
+            job = Job(job_id, target, args, kwargs, run_id=run_id, user_key=user_key, cost=cost)
+            self._jobs[job_id] = job
+            self._jobs.move_to_end(job_id)
+            self._pending.append(job)
+            self._prune_locked()
+            self._ensure_workers()
+            self._condition.notify()
+            return job
+
+    def charge(self, user_key, cost):
+        """
+        Descuenta `cost` del presupuesto por hora de `user_key` para una corrida
+        que no pasa por la cola (p. ej. en SYNC_MODE).
+
+        Raises:
+            UserLimitError: Si la corrida excede el presupuesto.
+        """
+        with self._condition:
+            self._charge_locked(user_key, cost, None)
+
+    def _charge_locked(self, user_key, cost, job_id, exclude=()):
+        # `exclude`: job_ids cuyo costo no cuenta (corridas en cola que se reemplazan)
+        if not self.budget_per_hour or not cost:
+            return
+        now = time.time()
+        usage = self._usage.setdefault(user_key, deque())
+        while usage and now - usage[0][0] >= self.budget_window:
+            usage.popleft()
+        used = sum(entry[1] for entry in usage if entry[2] not in exclude)
+        if used + cost > self.budget_per_hour:
+            self.rejected[REJECT_USER_BUDGET] += 1
+            # Espera hasta que venzan suficientes corridas anteriores
+            retry_after, freed = self.budget_window, 0
+            for charged_at, charged, charged_job in usage:
+                if charged_job in exclude:
+                    continue
+                freed += charged
+                if used - freed + cost <= self.budget_per_hour:
+                    retry_after = charged_at + self.budget_window - now
+                    break
+            retry_after = max(1, int(retry_after))
+            raise UserLimitError(
+                REJECT_USER_BUDGET, retry_after,
+                f"Superó su presupuesto de cómputo por hora ({used + cost:,} de {self.budget_per_hour:,} "
+                f"población × generaciones); reduzca la población o las generaciones, "
+                f"o reintente en {retry_after} s")
+        usage.append([now, cost, job_id])
+
+    def _refund_locked(self, job):
+        usage = self._usage.get(job.user_key)
+        if usage:
+            self._usage[job.user_key] = deque(entry for entry in usage if entry[2] != job.job_id)
+
+    def get(self, job_id):
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id):
+        """
+        Posición del trabajo en la cola: 1 = el siguiente en ejecutarse,
+        0 = ya se está ejecutando o terminó, None = desconocido.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state != JOB_QUEUED:
+                return 0
+            for i, pending in enumerate(self._schedule_locked(), start=1):
+                if pending is job:
+                    return i
+            return 0
+
+    def _schedule_locked(self):
+        """
+        Trabajos en espera en el orden en que se ejecutarían: por cuántas
+        corridas del mismo usuario van antes (ejecutándose o en la cola), luego
+        por el usuario atendido hace más tiempo y por orden de llegada.
+        """
+        seen = Counter(self._running)
+        ranked = []
+        for i, job in enumerate(self._pending):
+            ranked.append((seen[job.user_key], self._last_served.get(job.user_key, 0), i, job))
+            seen[job.user_key] += 1
+        ranked.sort(key=lambda item: item[:3])
+        return [item[-1] for item in ranked]
+
+    def _next_job_locked(self):
+        """Siguiente trabajo a ejecutar (None si todos esperan por el límite de su usuario)."""
+        for job in self._schedule_locked():
+            if not self.max_running_per_user or self._running[job.user_key] < self.max_running_per_user:
+                return job
+        return None
+
+    def cancel(self, job_id):
+        """
+        Cancela un trabajo: si aún espera, se saca de la cola; si ya corre, queda
+        marcado y termina como cancelado cuando `target` retorne (detenerlo es
+        responsabilidad de quien lo encoló, p. ej. con un token de cancelación).
+
+        Returns:
+            bool: True si el trabajo estaba en cola o ejecutándose.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            if job.state == JOB_QUEUED:
+                self._pending.remove(job)
+                self._refund_locked(job)
+                job.state = JOB_CANCELLED
+                job.finished_at = time.time()
+            else:
+                job.cancel_requested = True
+            return True
+
+    def active_jobs(self, user_key):
+        """Trabajos en cola o en ejecución de un usuario."""
+        with self._condition:
+            return [job for job in self._jobs.values()
+                    if job.user_key == user_key and job.state not in FINISHED_STATES]
+
+    def retry_after(self):
+        with self._condition:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self, ahead=None):
+        """Segundos estimados hasta que terminen `ahead` corridas (por defecto, toda la cola)."""
+        average = (sum(self._durations) / len(self._durations)) if self._durations else DEFAULT_RUN_SECONDS
+        ahead = len(self._pending) if ahead is None else ahead
+        return max(1, int(average * (ahead + 1) / self.workers))
+
+    def stats(self):
+        with self._condition:
+            states = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'queued': len(self._pending),
+                'states': states,
+                'users_running': sum(1 for count in self._running.values() if count),
+                'per_user': {
+                    'max_running': self.max_running_per_user,
+                    'max_queued': self.max_queued_per_user,
+                    'budget_per_hour': self.budget_per_hour,
+                },
+                'rejected': dict(self.rejected),
+            }
+
+    def _prune_locked(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while True:
+                    job = self._next_job_locked()
+                    if job is not None:
+                        break
+                    self._condition.wait()
+                self._pending.remove(job)
+                self._running[job.user_key] += 1
+                self._turn += 1
+                self._last_served[job.user_key] = self._turn
+                self._last_served.move_to_end(job.user_key)
+                if len(self._last_served) > 1000:
+                    self._last_served.popitem(last=False)
+                job.state = JOB_RUNNING
+                job.started_at = time.time()
+
+            try:
+                job.target(*job.args, **job.kwargs)
+                state, error = JOB_DONE, None
+            except Exception as e:
+                traceback.print_exc()
+                state, error = JOB_FAILED, str(e)
+
+            with self._condition:
+                job.state = JOB_CANCELLED if job.cancel_requested and state == JOB_DONE else state
+                job.error = error
+                job.finished_at = time.time()
+                self._durations.append(job.finished_at - job.started_at)
+                self._running[job.user_key] -= 1
+                if not self._running[job.user_key]:
+                    del self._running[job.user_key]
+                # Un trabajo que esperaba por el límite de su usuario puede empezar ya
+                self._condition.notify()
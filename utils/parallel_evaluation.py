@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.batch_evaluation import FitnessKernel, population_to_array
+
+# Tamaño de población a partir del cual repartir la evaluación entre procesos.
+# Por debajo, el costo de IPC supera la ganancia y se evalúa en el proceso actual.
+# Medir el punto de cruce del host con benchmarks/bench_parallel_evaluation.py
+# y ajustarlo con GA_PARALLEL_EVAL_MIN.
+DEFAULT_MIN_POPULATION = 4000
+
+# Estado de cada proceso del pool (se crea en `_init_worker`)
+_WORKER_KERNEL = None
+_WORKER_BLOCKS = {}
+
+
+def _init_worker(constants, weights):
+    global _WORKER_KERNEL
+    _WORKER_KERNEL = FitnessKernel(constants, weights)
+
+
+def _attach(name):
+    """
+    Abre (una sola vez por proceso) un bloque de memoria compartida creado por el padre.
+
+    El padre es el dueño del bloque y el único que lo libera (`unlink`); con el
+    contexto 'spawn' los workers comparten su resource_tracker, así que el registro
+    que hace `SharedMemory` al abrir el bloque no genera avisos de fuga.
+    """
+    block = _WORKER_BLOCKS.get(name)
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+        _WORKER_BLOCKS[name] = block
+    return block
+
+
+def _evaluate_slice(genes_name, fitness_name, rows, columns, start, end):
+    """Evalúa las filas [start, end) de la población compartida y escribe su aptitud."""
+    # Si el padre recreó los bloques (población más grande), soltar los anteriores
+    for name in [n for n in _WORKER_BLOCKS if n not in (genes_name, fitness_name)]:
+        _WORKER_BLOCKS.pop(name).close()
+    genes_block = _attach(genes_name)
+    fitness_block = _attach(fitness_name)
+    genes = np.ndarray((rows, columns), dtype=np.float64, buffer=genes_block.buf)
+    fitness = np.ndarray((rows,), dtype=np.float64, buffer=fitness_block.buf)
+    fitness[start:end] = _WORKER_KERNEL(genes[start:end])
+    return end - start
+
+
+class SharedMemoryEvaluator:
+    """
+    Evaluador de aptitud que reparte la población entre procesos.
+
+    La población se copia una vez por generación a un bloque de memoria compartida
+    (n x genes, float64) y cada proceso escribe la aptitud de su tramo directamente
+    en el arreglo de salida, también compartido; solo viajan por IPC los nombres de
+    los bloques y los índices de cada tramo. Para poblaciones pequeñas evalúa con
+    `FitnessKernel` en el proceso actual.
+
+    Se usa como el evaluador de `FitnessCache.evaluate` y debe cerrarse con `close()`
+    (o usarse como context manager) para liberar el pool y la memoria compartida.
+    """
+
+    def __init__(self, constants, weights=None, workers=None, min_population=DEFAULT_MIN_POPULATION):
+        self.kernel = FitnessKernel(constants, weights)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.min_population = min_population
+        self._constants = constants
+        self._weights = self.kernel.weights
+        self._executor = None
+        self._genes_block = None
+        self._fitness_block = None
+        self._capacity = (0, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self._constants, self._weights),
+            )
+        return self._executor
+
+    def _ensure_blocks(self, rows, columns):
+        """Crea (o agranda) los bloques compartidos; se reutilizan entre generaciones."""
+        capacity_rows, capacity_columns = self._capacity
+        if rows <= capacity_rows and columns == capacity_columns:
+            return
+        self._release_blocks()
+        # Margen para no recrear los bloques si la población crece un poco
+        rows = max(rows, int(capacity_rows * 1.5))
+        self._genes_block = shared_memory.SharedMemory(create=True, size=rows * columns * 8)
+        self._fitness_block = shared_memory.SharedMemory(create=True, size=rows * 8)
+        self._capacity = (rows, columns)
+
+    def _release_blocks(self):
+        for block in (self._genes_block, self._fitness_block):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self._genes_block = None
+        self._fitness_block = None
+        self._capacity = (0, 0)
+
+    def __call__(self, population):
+        """
+        Calcula la aptitud de toda la población.
+
+        Args:
+            population (list | np.ndarray): Población a evaluar.
+
+        Returns:
+            np.ndarray: Aptitud de cada individuo.
+        """
+        n = len(population)
+        if n < self.min_population or self.workers < 2:
+            return self.kernel(population)
+
+        columns = len(population[0])
+        self._ensure_blocks(n, columns)
+        rows = self._capacity[0]
+        genes = np.ndarray((rows, columns), dtype=np.float64, buffer=self._genes_block.buf)
+        fitness = np.ndarray((rows,), dtype=np.float64, buffer=self._fitness_block.buf)
+        genes[:n] = population_to_array(population)
+
+        executor = self._ensure_executor()
+        chunk = -(-n // self.workers)
+        futures = [
+            executor.submit(_evaluate_slice, self._genes_block.name, self._fitness_block.name,
+                            rows, columns, start, min(start + chunk, n))
+            for start in range(0, n, chunk)
+        ]
+        for future in futures:
+            future.result()
+        return fitness[:n].copy()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._release_blocks()
+
+
+def make_evaluator(constants, weights=None, workers=0, min_population=DEFAULT_MIN_POPULATION):
+    """
+    Evaluador de aptitud para el GA según la configuración.
+
+    Args:
+        workers (int): Procesos para la evaluación; 0 o 1 desactiva el backend
+            paralelo y devuelve el `FitnessKernel` en proceso.
+        min_population (int): Población mínima para repartir entre procesos.
+
+    Returns:
+        FitnessKernel | SharedMemoryEvaluator: Evaluador invocable sobre una población.
+    """
+    if workers and workers > 1:
+        return SharedMemoryEvaluator(constants, weights, workers, min_population)
+    return FitnessKernel(constants, weights)
@@ -0,0 +1,151 @@
+import time
+from typing import NamedTuple
+
+from utils.job_queue import FINISHED_STATES, JOB_CANCELLED, JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING
+
+# Niveles de detalle de los logs de texto
+VERBOSITY_EVENTS = 0    # solo eventos numéricos y errores (producción)
+VERBOSITY_INFO = 1      # + hitos en texto: inicio, mejoras, criterio de parada, solución
+VERBOSITY_DEBUG = 2     # + detalle: población inicial, cruce de ejemplo, estado cada 10 generaciones
+VERBOSITY_LEVELS = {'events': VERBOSITY_EVENTS, 'info': VERBOSITY_INFO, 'debug': VERBOSITY_DEBUG}
+
+# Tipos de evento de progreso
+RUN_QUEUED = 'run_queued'
+RUN_STARTED = 'run_started'
+GALLERY_STARTED = 'gallery_started'
+GENERATION = 'generation'
+NEW_BEST = 'new_best'
+GALLERY_FINISHED = 'gallery_finished'
+BEST_COMMUNE = 'best_commune'
+RUN_PAUSED = 'run_paused'
+RUN_CANCELLED = 'run_cancelled'
+RUN_FINISHED = 'run_finished'
+RUN_FAILED = 'run_failed'
+
+# Estado de la corrida en pausa (el resto coincide con los de la cola de trabajos)
+STATE_PAUSED = 'pausada'
+
+# Estado al que lleva cada evento de la corrida
+_EVENT_STATES = {
+    RUN_QUEUED: JOB_QUEUED,
+    RUN_STARTED: JOB_RUNNING,
+    RUN_PAUSED: STATE_PAUSED,
+    RUN_CANCELLED: JOB_CANCELLED,
+    RUN_FINISHED: JOB_DONE,
+    RUN_FAILED: JOB_FAILED,
+}
+
+# Texto de cada evento, solo se arma cuando un cliente pide los logs
+_TEMPLATES = {
+    RUN_QUEUED: "Corrida en cola (run_id={run_id})",
+    RUN_STARTED: "Corrida iniciada (run_id={run_id}, motor {engine}, {galleries} galerias)",
+    GALLERY_STARTED: "Procesando Galeria {gallery}...",
+    GENERATION: "Galeria {gallery} - Generacion {generation}/{max_generations}: mejor fitness {best_fitness:.4f}",
+    NEW_BEST: "Galeria {gallery}: nueva mejor fitness {best_fitness:.4f} en generacion {generation}",
+    GALLERY_FINISHED: "GALERIA_{gallery}_ROI:{roi:.2f} (fitness {best_fitness:.4f})",
+    BEST_COMMUNE: "Mejor comuna encontrada: {comuna} con ROI: {roi:.2f}%",
+    RUN_PAUSED: "CORRIDA_EN_PAUSA en la Galeria {gallery} (run_id={run_id}); se continúa con /api/continuar/{run_id}",
+    RUN_CANCELLED: "CORRIDA_CANCELADA (run_id={run_id})",
+    RUN_FINISHED: "PROCESAMIENTO COMPLETADO",
+    RUN_FAILED: "Error en el procesamiento: {error}",
+}
+
+
+class Event(NamedTuple):
+    """Evento de progreso: tipo, marca `time.time()` y datos numéricos o identificadores."""
+    kind: str
+    time: float
+    data: dict
+
+    @classmethod
+    def create(cls, kind, **data):
+        return cls(kind, time.time(), data)
+
+    def to_dict(self):
+        return {'kind': self.kind, 'time': self.time, **self.data}
+
+
+def render(item):
+    """Texto de una línea de log (las líneas de texto se devuelven tal cual)."""
+    if not isinstance(item, Event):
+        return item
+    template = _TEMPLATES.get(item.kind)
+    if template is not None:
+        try:
+            return template.format(**item.data)
+        except (KeyError, ValueError, TypeError):
+            pass
+    return f"{item.kind} {item.data}"
+
+
+def next_state(state, kind):
+    """
+    Estado de la corrida tras un evento.
+
+    Solo los eventos de la corrida (inicio, pausa, fin...) cambian el estado; una
+    corrida terminada no cambia, salvo que vuelva a encolarse o iniciarse (p. ej.
+    al continuar).
+    """
+    new_state = _EVENT_STATES.get(kind)
+    if new_state is None:
+        return state
+    if state in FINISHED_STATES and kind not in (RUN_QUEUED, RUN_STARTED):
+        return state
+    return new_state
+
+
+# Campos de los eventos que se guardan como progreso de cada galería
+PROGRESS_FIELDS = ('generation', 'max_generations', 'best_fitness', 'roi', 'stop_reason')
+
+
+def gallery_progress(progress, kind, data):
+    """Progreso de una galería (dict) actualizado con los campos de un evento."""
+    progress = dict(progress or {})
+    progress.update((k, data[k]) for k in PROGRESS_FIELDS if k in data)
+    if kind == GALLERY_FINISHED:
+        progress['done'] = True
+    return progress
+
+
+def parse_verbosity(value, default=VERBOSITY_INFO):
+    """Nivel de detalle a partir de su nombre ('events', 'info', 'debug') o número."""
+    if isinstance(value, int):
+        return value
+    value = (value or '').strip().lower()
+    if value.isdigit():
+        return int(value)
+    return VERBOSITY_LEVELS.get(value, default)
+
+
+class LevelLog:
+    """
+    Logs de texto con nivel de detalle.
+
+    Los mensajes se pasan con argumentos al estilo de `logging` ('%.4f', valor) y
+    solo se formatean si el nivel está activo, así que con VERBOSITY_EVENTS el
+    GA no arma ningún texto. Los avisos y errores se registran siempre.
+    """
+
+    def __init__(self, log=None, verbosity=VERBOSITY_INFO):
+        self._log = log
+        self.verbosity = verbosity if log is not None else -1
+
+    def enabled(self, level):
+        return self.verbosity >= level
+
+    def at(self, level):
+        """Callback de una línea para funciones que loguean directamente, o None."""
+        return self._log if self.enabled(level) else None
+
+    def _emit(self, level, message, args):
+        if self.verbosity >= level:
+            self._log(message % args if args else message)
+
+    def warning(self, message, *args):
+        self._emit(VERBOSITY_EVENTS, message, args)
+
+    def info(self, message, *args):
+        self._emit(VERBOSITY_INFO, message, args)
+
+    def debug(self, message, *args):
+        self._emit(VERBOSITY_DEBUG, message, args)
@@ -0,0 +1,354 @@
+import sys
+import threading
+import time
+from collections import deque
+
+from utils.job_queue import FINISHED_STATES
+from utils.progress import RUN_QUEUED, RUN_STARTED, STATE_PAUSED, Event, gallery_progress, next_state, render
+from utils.run_store_sql import SqlRunStore
+
+# Costo aproximado (bytes) de cada entrada además de su contenido
+_ENTRY_OVERHEAD = 512
+
+
+def approx_size(obj, _depth=0):
+    """Tamaño aproximado en bytes de un resultado (dicts, listas y escalares anidados)."""
+    size = sys.getsizeof(obj)
+    if _depth > 4:
+        return size
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, _depth + 1) + approx_size(v, _depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(approx_size(v, _depth + 1) for v in obj)
+    return size
+
+
+def _item_size(item):
+    return sys.getsizeof(item) if isinstance(item, str) else approx_size(item)
+
+
+class RunLog:
+    """
+    Logs de una corrida en un buffer circular: conserva las últimas `max_lines`
+    líneas y cuenta cuántas se escribieron en total.
+
+    Cada línea es un texto o un `Event` de progreso, que se guarda compacto y se
+    convierte en texto con `utils.progress.render` al entregarlo a un cliente.
+
+    Las escrituras son seguras entre hilos; los lectores obtienen una copia con
+    `snapshot()` o, con un cursor (cuenta total ya leída), solo las nuevas con
+    `since()`; `wait()` bloquea hasta que lleguen líneas nuevas.
+    """
+
+    def __init__(self, max_lines=2000, lines=()):
+        self._lines = deque(maxlen=max(1, int(max_lines)))
+        self._lock = threading.Condition()
+        self.total = 0
+        self.bytes = 0
+        self.updated_at = time.time()
+        self.extend(lines)
+
+    def append(self, line):
+        if not isinstance(line, Event):
+            line = str(line)
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self.bytes -= _item_size(self._lines[0])
+            self._lines.append(line)
+            self.bytes += _item_size(line)
+            self.total += 1
+            self.updated_at = time.time()
+            self._lock.notify_all()
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    @property
+    def first_index(self):
+        """Índice (en la cuenta total) de la línea más antigua que se conserva."""
+        with self._lock:
+            return self.total - len(self._lines)
+
+    def snapshot(self):
+        """Copia de las líneas conservadas, de la más antigua a la más reciente."""
+        with self._lock:
+            return list(self._lines)
+
+    def since(self, cursor):
+        """
+        Líneas escritas a partir del índice `cursor` (de la cuenta total).
+
+        Returns:
+            tuple: (líneas, índice de la primera devuelta, nuevo cursor). Si las
+                líneas pedidas ya se descartaron, se empieza por la más antigua
+                que se conserva.
+        """
+        with self._lock:
+            first = self.total - len(self._lines)
+            start = max(int(cursor or 0), first)
+            lines = [self._lines[i] for i in range(start - first, len(self._lines))]
+            return lines, start, self.total
+
+    def wait(self, cursor, timeout):
+        """Espera hasta `timeout` segundos a que haya líneas después de `cursor`."""
+        with self._lock:
+            return self._lock.wait_for(lambda: self.total > cursor, timeout)
+
+
+class _Entry:
+    __slots__ = ('log', 'result', 'result_bytes', 'progress', 'progress_version', 'state',
+                 'created_at', 'finished_at')
+
+    def __init__(self):
+        self.log = None
+        self.result = None
+        self.result_bytes = 0
+        self.progress = {}
+        self.progress_version = 0
+        self.state = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def bytes(self):
+        return _ENTRY_OVERHEAD + self.result_bytes + (self.log.bytes if self.log is not None else 0)
+
+    @property
+    def last_activity(self):
+        return max(self.created_at, self.finished_at or 0, self.log.updated_at if self.log is not None else 0)
+
+
+class RunStore:
+    """
+    Estado en memoria de las corridas (logs y resultados para la UI), acotado.
+
+    - Cada corrida (clave `_ns(user_key, thread_id)`) guarda sus logs en un
+      `RunLog` de `max_lines` líneas.
+    - El estado de la corrida y el progreso de cada galería se derivan de los
+      eventos que se registran con `emit` (ver `utils.progress`).
+    - Las corridas terminadas (con resultado o en un estado final o en pausa)
+      se eliminan `ttl` segundos después de su última actividad; las que
+      quedaron abandonadas sin terminar, después de `idle_ttl`.
+    - Si el total aproximado supera `max_bytes`, se eliminan primero las
+      terminadas y luego las inactivas, de la más antigua a la más reciente.
+    """
+
+    def __init__(self, max_lines=2000, ttl=3600, idle_ttl=86400, max_bytes=64 * 1024 * 1024,
+                 sweep_interval=5):
+        self.max_lines = max_lines
+        self.ttl = ttl
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.evicted = {'ttl': 0, 'memoria': 0}
+
+    # -----------------------------------------------------------
+    # Logs
+    # -----------------------------------------------------------
+    def log(self, key):
+        """Logs de la corrida; los crea vacíos si no existen."""
+        with self._lock:
+            entry = self._entry(key)
+            if entry.log is None:
+                entry.log = RunLog(self.max_lines)
+            log = entry.log
+        self._maybe_sweep()
+        return log
+
+    def reset_log(self, key, lines=()):
+        """Reemplaza los logs de la corrida por `lines` y devuelve el nuevo `RunLog`."""
+        log = RunLog(self.max_lines, lines)
+        with self._lock:
+            entry = self._entry(key)
+            entry.log = log
+            entry.finished_at = None
+        self._maybe_sweep()
+        return log
+
+    def get_log(self, key):
+        """Logs de la corrida o None (no los crea)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.log if entry is not None else None
+
+    def lines(self, key):
+        """Texto de las líneas de la corrida (lista vacía si no existe)."""
+        log = self.get_log(key)
+        return [render(line) for line in log.snapshot()] if log is not None else []
+
+    # -----------------------------------------------------------
+    # Eventos, estado y progreso por galería
+    # -----------------------------------------------------------
+    def emit(self, key, kind, record=True, **data):
+        """
+        Registra un evento de progreso de la corrida.
+
+        Actualiza el estado (`utils.progress.next_state`) y, si el evento trae
+        'gallery', el progreso de esa galería.
+
+        Args:
+            record (bool): Si es False el evento solo actualiza estado y progreso,
+                sin agregarse a los logs (p. ej. las generaciones intermedias).
+        """
+        event = Event.create(kind, **data)
+        with self._lock:
+            entry = self._entry(key)
+            entry.state = next_state(entry.state, kind)
+            if kind in (RUN_QUEUED, RUN_STARTED):
+                entry.finished_at = None
+            elif entry.state in FINISHED_STATES or entry.state == STATE_PAUSED:
+                entry.finished_at = entry.finished_at or time.time()
+            gallery = data.get('gallery')
+            if gallery is not None:
+                entry.progress[gallery] = gallery_progress(entry.progress.get(gallery), kind, data)
+                entry.progress_version += 1
+            if entry.log is None:
+                entry.log = RunLog(self.max_lines)
+            if record:
+                # Con el lock tomado: quien lea un estado final ya encuentra el evento
+                entry.log.append(event)
+        self._maybe_sweep()
+
+    def state(self, key):
+        """Estado de la corrida según sus eventos (None si aún no emitió ninguno)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.state if entry is not None else None
+
+    def get_progress(self, key):
+        """
+        Returns:
+            tuple: (versión, {galería: campos}); la versión cambia con cada
+                actualización.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return 0, {}
+            return entry.progress_version, {g: dict(p) for g, p in entry.progress.items()}
+
+    # -----------------------------------------------------------
+    # Resultados
+    # -----------------------------------------------------------
+    def set_result(self, key, result):
+        """Guarda el resultado de la corrida y la marca como terminada."""
+        size = approx_size(result)
+        with self._lock:
+            entry = self._entry(key)
+            entry.result = result
+            entry.result_bytes = size
+            entry.finished_at = time.time()
+        self._maybe_sweep()
+
+    def get_result(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.result if entry is not None else None
+
+    def has_result(self, key):
+        return self.get_result(key) is not None
+
+    def result_keys(self):
+        with self._lock:
+            return [key for key, entry in self._entries.items() if entry.result is not None]
+
+    # -----------------------------------------------------------
+    # Ciclo de vida
+    # -----------------------------------------------------------
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        return entry
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep(now)
+
+    def sweep(self, now=None):
+        """Aplica el TTL y el límite de memoria. Devuelve cuántas corridas se eliminaron."""
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            self._last_sweep = now
+            for key, entry in list(self._entries.items()):
+                ttl = self.ttl if entry.finished_at is not None else self.idle_ttl
+                if now - entry.last_activity > ttl:
+                    del self._entries[key]
+                    self.evicted['ttl'] += 1
+                    removed += 1
+
+            total = sum(entry.bytes for entry in self._entries.values())
+            if total > self.max_bytes:
+                # Primero las terminadas, luego el resto; de la más antigua a la más reciente
+                order = sorted(self._entries.items(),
+                               key=lambda item: (item[1].finished_at is None, item[1].last_activity))
+                for key, entry in order:
+                    if total <= self.max_bytes:
+                        break
+                    total -= entry.bytes
+                    del self._entries[key]
+                    self.evicted['memoria'] += 1
+                    removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            return {
+                'backend': 'memory',
+                'entries': len(entries),
+                'running': sum(1 for e in entries if e.finished_at is None),
+                'finished': sum(1 for e in entries if e.finished_at is not None),
+                'results': sum(1 for e in entries if e.result is not None),
+                'log_lines': sum(len(e.log) for e in entries if e.log is not None),
+                'approx_bytes': sum(e.bytes for e in entries),
+                'max_bytes': self.max_bytes,
+                'max_lines': self.max_lines,
+                'ttl': self.ttl,
+                'idle_ttl': self.idle_ttl,
+                'evicted': dict(self.evicted),
+            }
+
+
+def create_run_store(backend='memory', database_url=None, max_lines=2000, ttl=3600, idle_ttl=86400,
+                     max_bytes=64 * 1024 * 1024):
+    """
+    Crea el almacén de corridas.
+
+    Args:
+        backend (str): 'memory' (en este proceso), 'database' (tablas en
+            `database_url`) o una URL de SQLAlchemy (p. ej. 'sqlite:///runs.db').
+            Con varios procesos web se necesita uno compartido.
+        max_bytes (int): Tope de memoria; solo aplica a 'memory'.
+
+    Returns:
+        RunStore | SqlRunStore
+    """
+    if backend in (None, '', 'memory'):
+        return RunStore(max_lines=max_lines, ttl=ttl, idle_ttl=idle_ttl, max_bytes=max_bytes)
+    url = database_url if backend == 'database' else backend
+    return SqlRunStore(url, max_lines=max_lines, ttl=ttl, idle_ttl=idle_ttl)
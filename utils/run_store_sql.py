@@ -0,0 +1,339 @@
+import json
+import threading
+import time
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, create_engine, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from utils.job_queue import FINISHED_STATES
+from utils.progress import RUN_QUEUED, RUN_STARTED, STATE_PAUSED, Event, gallery_progress, next_state, render
+
+# Cada cuántas líneas escritas se borran las que ya no entran en `max_lines`
+_TRIM_EVERY = 50
+
+metadata = MetaData()
+
+runs_table = Table(
+    'run_store_runs', metadata,
+    Column('key', String(200), primary_key=True),
+    Column('state', String(20)),
+    Column('progress', Text, nullable=False, default='{}'),     # JSON {galería: campos}
+    Column('progress_version', Integer, nullable=False, default=0),
+    Column('result', Text),                                     # JSON
+    Column('log_total', Integer, nullable=False, default=0),
+    Column('created_at', Float, nullable=False),
+    Column('updated_at', Float, nullable=False),
+    Column('finished_at', Float),
+)
+
+lines_table = Table(
+    'run_store_lines', metadata,
+    Column('key', String(200), primary_key=True),
+    Column('idx', Integer, primary_key=True, autoincrement=False),
+    Column('kind', String(40)),         # tipo de evento; None para las líneas de texto
+    Column('time', Float),
+    Column('payload', Text, nullable=False),
+)
+
+
+def _dumps(value):
+    # Los resultados del GA pueden traer escalares y arreglos de numpy
+    return json.dumps(value, default=lambda o: o.tolist() if hasattr(o, 'tolist') else str(o))
+
+
+def _line_row(key, idx, line):
+    if isinstance(line, Event):
+        return {'key': key, 'idx': idx, 'kind': line.kind, 'time': line.time, 'payload': _dumps(line.data)}
+    return {'key': key, 'idx': idx, 'kind': None, 'time': None, 'payload': str(line)}
+
+
+def _line_from_row(row):
+    if row.kind is None:
+        return row.payload
+    return Event(row.kind, row.time, json.loads(row.payload))
+
+
+class SqlRunLog:
+    """
+    Logs de una corrida guardados en la tabla `run_store_lines`, con la misma
+    interfaz que `utils.run_store.RunLog` (cursor sobre la cuenta total escrita).
+    """
+
+    def __init__(self, store, key):
+        self._store = store
+        self.key = key
+
+    def append(self, line):
+        self._store._append(self.key, [line])
+
+    def extend(self, lines):
+        self._store._append(self.key, list(lines))
+
+    @property
+    def total(self):
+        return self._store._log_total(self.key)
+
+    @property
+    def first_index(self):
+        return max(0, self.total - self._store.max_lines)
+
+    def __len__(self):
+        return min(self.total, self._store.max_lines)
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def snapshot(self):
+        return self.since(0)[0]
+
+    def since(self, cursor):
+        """Ver `RunLog.since`."""
+        return self._store._since(self.key, cursor)
+
+    def wait(self, cursor, timeout):
+        """Consulta la tabla cada `poll_interval` segundos hasta que haya líneas después de `cursor`."""
+        limit = time.time() + timeout
+        while True:
+            if self.total > cursor:
+                return True
+            remaining = limit - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self._store.poll_interval, remaining))
+
+
+class SqlRunStore:
+    """
+    Estado de las corridas (logs, eventos, progreso y resultados) en una base de
+    datos, compartido entre procesos: cualquier worker web puede atender los
+    logs y el progreso de una corrida que se ejecuta en otro.
+
+    Misma interfaz que `utils.run_store.RunStore`. Sirve cualquier URL de
+    SQLAlchemy: la base de la app (Postgres) o un archivo SQLite para probar
+    localmente con varios procesos. Las tablas se crean si no existen.
+
+    - Cada corrida conserva sus últimas `max_lines` líneas.
+    - Las corridas terminadas se eliminan `ttl` segundos después de su última
+      actividad; las abandonadas sin terminar, después de `idle_ttl`.
+    - `RunLog.wait` se resuelve consultando la tabla cada `poll_interval` s.
+    """
+
+    def __init__(self, url, max_lines=2000, ttl=3600, idle_ttl=86400, sweep_interval=60,
+                 poll_interval=0.5, engine=None):
+        if engine is None:
+            options = {'pool_pre_ping': True}
+            if url.startswith('sqlite'):
+                options['connect_args'] = {'check_same_thread': False, 'timeout': 30}
+            engine = create_engine(url, **options)
+        self._engine = engine
+        self.max_lines = max(1, int(max_lines))
+        self.ttl = ttl
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.poll_interval = poll_interval
+        # Serializa las escrituras de este proceso (lectura y escritura del progreso)
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.evicted = {'ttl': 0}
+        metadata.create_all(engine)
+
+    # -----------------------------------------------------------
+    # Acceso a las tablas
+    # -----------------------------------------------------------
+    def _ensure(self, conn, key, now):
+        """Crea la fila de la corrida si no existe."""
+        values = {'key': key, 'progress': '{}', 'progress_version': 0, 'log_total': 0,
+                  'created_at': now, 'updated_at': now}
+        dialect = conn.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            conn.execute(insert(runs_table).values(**values).on_conflict_do_nothing(index_elements=['key']))
+        elif conn.execute(select(runs_table.c.key).where(runs_table.c.key == key)).first() is None:
+            conn.execute(runs_table.insert().values(**values))
+
+    def _append_rows(self, conn, key, lines, now):
+        if not lines:
+            return
+        count = len(lines)
+        conn.execute(update(runs_table).where(runs_table.c.key == key)
+                     .values(log_total=runs_table.c.log_total + count, updated_at=now))
+        total = conn.execute(select(runs_table.c.log_total).where(runs_table.c.key == key)).scalar_one()
+        first = total - count
+        conn.execute(lines_table.insert(), [_line_row(key, first + i, line) for i, line in enumerate(lines)])
+        if total > self.max_lines and first // _TRIM_EVERY != total // _TRIM_EVERY:
+            conn.execute(delete(lines_table).where(lines_table.c.key == key,
+                                                   lines_table.c.idx < total - self.max_lines))
+
+    def _append(self, key, lines):
+        now = time.time()
+        with self._lock, self._engine.begin() as conn:
+            self._ensure(conn, key, now)
+            self._append_rows(conn, key, lines, now)
+        self._maybe_sweep()
+
+    def _log_total(self, key):
+        with self._engine.connect() as conn:
+            total = conn.execute(select(runs_table.c.log_total).where(runs_table.c.key == key)).scalar()
+        return total or 0
+
+    def _since(self, key, cursor):
+        with self._engine.connect() as conn:
+            total = conn.execute(select(runs_table.c.log_total).where(runs_table.c.key == key)).scalar() or 0
+            start = max(int(cursor or 0), total - self.max_lines, 0)
+            rows = conn.execute(select(lines_table.c.kind, lines_table.c.time, lines_table.c.payload)
+                                .where(lines_table.c.key == key,
+                                       lines_table.c.idx >= start, lines_table.c.idx < total)
+                                .order_by(lines_table.c.idx)).all()
+        return [_line_from_row(row) for row in rows], start, total
+
+    def _row(self, key, *columns):
+        with self._engine.connect() as conn:
+            return conn.execute(select(*columns).where(runs_table.c.key == key)).first()
+
+    # -----------------------------------------------------------
+    # Logs
+    # -----------------------------------------------------------
+    def log(self, key):
+        now = time.time()
+        with self._lock, self._engine.begin() as conn:
+            self._ensure(conn, key, now)
+        self._maybe_sweep()
+        return SqlRunLog(self, key)
+
+    def reset_log(self, key, lines=()):
+        now = time.time()
+        with self._lock, self._engine.begin() as conn:
+            self._ensure(conn, key, now)
+            conn.execute(delete(lines_table).where(lines_table.c.key == key))
+            conn.execute(update(runs_table).where(runs_table.c.key == key)
+                         .values(log_total=0, finished_at=None, updated_at=now))
+            self._append_rows(conn, key, list(lines), now)
+        self._maybe_sweep()
+        return SqlRunLog(self, key)
+
+    def get_log(self, key):
+        return SqlRunLog(self, key) if key in self else None
+
+    def lines(self, key):
+        return [render(line) for line in self._since(key, 0)[0]]
+
+    # -----------------------------------------------------------
+    # Eventos, estado y progreso por galería
+    # -----------------------------------------------------------
+    def emit(self, key, kind, record=True, **data):
+        """Ver `RunStore.emit`."""
+        event = Event.create(kind, **data)
+        now = event.time
+        with self._lock, self._engine.begin() as conn:
+            self._ensure(conn, key, now)
+            row = conn.execute(select(runs_table.c.state, runs_table.c.progress, runs_table.c.finished_at)
+                               .where(runs_table.c.key == key).with_for_update()).one()
+            state = next_state(row.state, kind)
+            values = {'state': state, 'updated_at': now}
+            if kind in (RUN_QUEUED, RUN_STARTED):
+                values['finished_at'] = None
+            elif state in FINISHED_STATES or state == STATE_PAUSED:
+                values['finished_at'] = row.finished_at or now
+            gallery = data.get('gallery')
+            if gallery is not None:
+                # Las claves de JSON son texto: se guardan como {'1': {...}} y
+                # `get_progress` las devuelve como enteros, igual que `RunStore`
+                progress = json.loads(row.progress)
+                progress[str(gallery)] = gallery_progress(progress.get(str(gallery)), kind, data)
+                values['progress'] = _dumps(progress)
+                values['progress_version'] = runs_table.c.progress_version + 1
+            conn.execute(update(runs_table).where(runs_table.c.key == key).values(**values))
+            if record:
+                self._append_rows(conn, key, [event], now)
+        self._maybe_sweep()
+
+    def state(self, key):
+        row = self._row(key, runs_table.c.state)
+        return row.state if row is not None else None
+
+    def get_progress(self, key):
+        row = self._row(key, runs_table.c.progress_version, runs_table.c.progress)
+        if row is None:
+            return 0, {}
+        return row.progress_version, {int(g) if g.isdigit() else g: p
+                                      for g, p in json.loads(row.progress).items()}
+
+    # -----------------------------------------------------------
+    # Resultados
+    # -----------------------------------------------------------
+    def set_result(self, key, result):
+        now = time.time()
+        with self._lock, self._engine.begin() as conn:
+            self._ensure(conn, key, now)
+            conn.execute(update(runs_table).where(runs_table.c.key == key)
+                         .values(result=_dumps(result), finished_at=now, updated_at=now))
+        self._maybe_sweep()
+
+    def get_result(self, key):
+        row = self._row(key, runs_table.c.result)
+        return json.loads(row.result) if row is not None and row.result is not None else None
+
+    def has_result(self, key):
+        with self._engine.connect() as conn:
+            return conn.execute(select(runs_table.c.key)
+                                .where(runs_table.c.key == key, runs_table.c.result.is_not(None))).first() is not None
+
+    def result_keys(self):
+        with self._engine.connect() as conn:
+            return list(conn.execute(select(runs_table.c.key).where(runs_table.c.result.is_not(None))).scalars())
+
+    # -----------------------------------------------------------
+    # Ciclo de vida
+    # -----------------------------------------------------------
+    def discard(self, key):
+        with self._lock, self._engine.begin() as conn:
+            conn.execute(delete(lines_table).where(lines_table.c.key == key))
+            conn.execute(delete(runs_table).where(runs_table.c.key == key))
+
+    def keys(self):
+        with self._engine.connect() as conn:
+            return list(conn.execute(select(runs_table.c.key)).scalars())
+
+    def __contains__(self, key):
+        return self._row(key, runs_table.c.key) is not None
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep(now)
+
+    def sweep(self, now=None):
+        """Aplica el TTL. Devuelve cuántas corridas se eliminaron."""
+        now = time.time() if now is None else now
+        self._last_sweep = now
+        expired = (((runs_table.c.finished_at.is_not(None)) & (runs_table.c.updated_at < now - self.ttl)) |
+                   ((runs_table.c.finished_at.is_(None)) & (runs_table.c.updated_at < now - self.idle_ttl)))
+        with self._lock, self._engine.begin() as conn:
+            keys = list(conn.execute(select(runs_table.c.key).where(expired)).scalars())
+            if keys:
+                conn.execute(delete(lines_table).where(lines_table.c.key.in_(keys)))
+                conn.execute(delete(runs_table).where(runs_table.c.key.in_(keys)))
+        self.evicted['ttl'] += len(keys)
+        return len(keys)
+
+    def stats(self):
+        with self._engine.connect() as conn:
+            runs = conn.execute(select(
+                func.count(),
+                func.count(runs_table.c.finished_at),
+                func.count(runs_table.c.result),
+            ).select_from(runs_table)).one()
+            log_lines = conn.execute(select(func.count()).select_from(lines_table)).scalar()
+        entries, finished, results = runs
+        return {
+            'backend': f"sql ({self._engine.dialect.name})",
+            'entries': entries,
+            'running': entries - finished,
+            'finished': finished,
+            'results': results,
+            'log_lines': log_lines,
+            'max_lines': self.max_lines,
+            'ttl': self.ttl,
+            'idle_ttl': self.idle_ttl,
+            'evicted': dict(self.evicted),
+        }
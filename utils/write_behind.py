@@ -0,0 +1,326 @@
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # Windows: el journal solo se protege dentro del proceso
+    fcntl = None
+
+
+def _json_default(value):
+    # Los resultados del GA pueden traer escalares y arreglos de numpy
+    return value.tolist() if hasattr(value, 'tolist') else str(value)
+
+
+class WriteBehindWriter:
+    """
+    Escritor en segundo plano: quien produce un resultado lo entrega con
+    `submit` y sigue trabajando; un hilo lo escribe con `write`.
+
+    - Los elementos en cola se escriben en lotes de hasta `batch_size` (una
+      llamada a `write`, p. ej. una transacción).
+    - Si `write` falla con un error transitorio (`is_transient`, p. ej. la BD no
+      responde) se reintenta con espera exponencial, `retries` veces; si sigue
+      fallando, el lote se guarda en el journal (un archivo JSON por línea) y
+      se vuelve a intentar cada `replay_interval` segundos, también tras
+      reiniciar el proceso.
+    - Si falla con otro error, el lote se reintenta de a un elemento y el que
+      vuelve a fallar se descarta llamando a su `on_error`.
+
+    Los elementos deben ser serializables a JSON (para el journal). Varios
+    procesos pueden compartir el mismo journal (se bloquea con `fcntl`).
+    """
+
+    def __init__(self, write, journal_path=None, batch_size=20, retries=4, backoff=0.5,
+                 max_backoff=30, replay_interval=30, is_transient=None, name='write-behind'):
+        self._write = write
+        self.journal_path = journal_path
+        self.batch_size = max(1, int(batch_size))
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.replay_interval = replay_interval
+        self._is_transient = is_transient or (lambda exc: True)
+        self.name = name
+        self._queue = queue.Queue()
+        # Callbacks de los elementos en cola o en el journal: id -> (on_done, on_error, on_spill)
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_replay = 0.0
+        self.counters = {'submitted': 0, 'written': 0, 'batches': 0, 'retries': 0,
+                         'journaled': 0, 'replayed': 0, 'failed': 0}
+
+    # -----------------------------------------------------------
+    # API
+    # -----------------------------------------------------------
+    def submit(self, item, on_done=None, on_error=None, on_spill=None):
+        """
+        Encola `item` para escribirlo y retorna de inmediato.
+
+        Los callbacks se llaman desde el hilo del escritor.
+
+        Args:
+            on_done: Sin argumentos, cuando `item` quedó escrito.
+            on_error: Con la excepción, si `item` no se pudo escribir por un
+                error no transitorio.
+            on_spill: Con la excepción, si `item` pasó al journal tras agotar
+                los reintentos (luego se llamará `on_done` u `on_error`).
+        """
+        entry_id = uuid.uuid4().hex
+        with self._lock:
+            self._callbacks[entry_id] = (on_done, on_error, on_spill)
+            self._pending += 1
+            self.counters['submitted'] += 1
+            self._ensure_thread()
+        self._queue.put((entry_id, item))
+        return entry_id
+
+    def flush(self, timeout=None):
+        """Espera a que se procese todo lo encolado (escrito, en el journal o descartado)."""
+        limit = None if timeout is None else time.time() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = None if limit is None else limit - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        """Intenta escribir lo encolado y deja en el journal lo que no alcance."""
+        self.flush(timeout)
+        self._stop.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        leftover = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                leftover.append(entry)
+        if leftover:
+            self._spill(leftover)
+
+    def journal_size(self):
+        with self._journal():
+            return len(self._read_journal())
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            pending = self._pending
+        return {
+            **counters,
+            'pending': pending,
+            'journal': self.journal_path,
+            'journal_entries': self.journal_size(),
+        }
+
+    # -----------------------------------------------------------
+    # Hilo del escritor
+    # -----------------------------------------------------------
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        # Lo que quedó en el journal de un proceso anterior se intenta primero
+        self.replay()
+        while not self._stop.is_set():
+            try:
+                entry = self._queue.get(timeout=self.replay_interval)
+            except queue.Empty:
+                self.replay()
+                continue
+            if entry is None:
+                break
+            batch = [entry]
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._stop.set()
+                    break
+                batch.append(entry)
+            try:
+                self._write_batch(batch)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._done(len(batch))
+            if time.time() - self._last_replay >= self.replay_interval:
+                self.replay()
+
+    def _done(self, count):
+        with self._idle:
+            self._pending -= count
+            self._idle.notify_all()
+
+    def _write_batch(self, batch):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                self._write([item for _, item in batch])
+            except Exception as exc:
+                if not self._is_transient(exc):
+                    self._write_each(batch, exc)
+                    return
+                if attempt == self.retries:
+                    error = exc
+                    break
+                with self._lock:
+                    self.counters['retries'] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+            else:
+                self._succeeded(batch)
+                return
+        # La BD sigue sin responder: al journal, se reintenta más tarde
+        self._spill(batch, error)
+
+    def _write_each(self, batch, exc):
+        if len(batch) > 1:
+            for entry in batch:
+                self._write_batch([entry])
+            return
+        entry_id, _ = batch[0]
+        with self._lock:
+            self.counters['failed'] += 1
+            _, on_error, _ = self._callbacks.pop(entry_id, (None, None, None))
+        if on_error is not None:
+            on_error(exc)
+
+    def _succeeded(self, batch, replayed=False):
+        with self._lock:
+            self.counters['written'] += len(batch)
+            self.counters['batches'] += 1
+            if replayed:
+                self.counters['replayed'] += len(batch)
+            callbacks = [self._callbacks.pop(entry_id, (None, None, None)) for entry_id, _ in batch]
+        for on_done, _, _ in callbacks:
+            if on_done is not None:
+                on_done()
+
+    # -----------------------------------------------------------
+    # Journal
+    # -----------------------------------------------------------
+    @contextmanager
+    def _journal(self):
+        """Acceso exclusivo al journal, entre hilos y entre procesos."""
+        with self._journal_lock:
+            if fcntl is None or not self.journal_path:
+                yield
+                return
+            with open(self.journal_path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _spill(self, batch, error=None):
+        if not self.journal_path:
+            # Sin journal no hay dónde conservarlo: se informa como error
+            for entry_id, _ in batch:
+                with self._lock:
+                    self.counters['failed'] += 1
+                    _, on_error, _ = self._callbacks.pop(entry_id, (None, None, None))
+                if on_error is not None:
+                    on_error(error or RuntimeError("No se pudo escribir y no hay journal configurado"))
+            return
+        with self._journal():
+            with open(self.journal_path, 'a', encoding='utf-8') as journal:
+                for entry_id, item in batch:
+                    journal.write(json.dumps({'id': entry_id, 'item': item}, default=_json_default) + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
+        with self._lock:
+            self.counters['journaled'] += len(batch)
+            spilled = [self._callbacks.get(entry_id, (None, None, None))[2] for entry_id, _ in batch]
+        for on_spill in spilled:
+            if on_spill is not None:
+                on_spill(error)
+
+    def _read_journal(self):
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return []
+        entries = []
+        with open(self.journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                line = line.strip()
+                if line:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue    # línea incompleta (p. ej. el proceso terminó escribiéndola)
+                    entries.append((record['id'], record['item']))
+        return entries
+
+    def _rewrite_journal(self, entries):
+        if not entries:
+            os.remove(self.journal_path)
+            return
+        temporary = self.journal_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as journal:
+            for entry_id, item in entries:
+                journal.write(json.dumps({'id': entry_id, 'item': item}, default=_json_default) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary, self.journal_path)
+
+    def replay(self):
+        """
+        Reintenta escribir lo que está en el journal.
+
+        Returns:
+            int: Elementos escritos.
+        """
+        self._last_replay = time.time()
+        with self._journal():
+            entries = self._read_journal()
+            written = 0
+            while entries:
+                batch = entries[:self.batch_size]
+                try:
+                    self._write([item for _, item in batch])
+                except Exception as exc:
+                    if self._is_transient(exc):
+                        break
+                    # Un elemento que no se puede escribir no debe bloquear al resto
+                    for entry in batch:
+                        try:
+                            self._write([entry[1]])
+                        except Exception as item_exc:
+                            if self._is_transient(item_exc):
+                                self._rewrite_journal(entries)
+                                return written
+                            self._write_each([entry], item_exc)
+                        else:
+                            self._succeeded([entry], replayed=True)
+                            written += 1
+                        entries = entries[1:]
+                    continue
+                self._succeeded(batch, replayed=True)
+                written += len(batch)
+                entries = entries[len(batch):]
+            if self.journal_path and os.path.exists(self.journal_path):
+                self._rewrite_journal(entries)
+        return written